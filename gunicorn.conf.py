@@ -0,0 +1,49 @@
+# Configuração do gunicorn (lida automaticamente do diretório de trabalho: basta rodar `gunicorn`)
+#
+# SERVIDOR=wsgi  workers síncronos (padrão): uma requisição por worker de cada vez
+# SERVIDOR=asgi  workers uvicorn (membertruck_api.asgi): as views assíncronas esperam
+#                I/O sem prender o worker, então cada um atende várias requisições ao mesmo tempo
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+SERVIDOR = os.environ.get('SERVIDOR', 'wsgi')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Threads por worker WSGI (> 1 usa o worker gthread); com DB_POOL=True elas dividem o pool do processo
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')  # '-' para stdout
+
+if SERVIDOR == 'asgi':
+    wsgi_app = 'membertruck_api.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif SERVIDOR == 'wsgi':
+    wsgi_app = 'membertruck_api.wsgi:application'
+else:
+    raise ValueError(f"SERVIDOR deve ser 'wsgi' ou 'asgi' (recebido: {SERVIDOR!r})")
+
+# Métricas (/metrics): cada worker grava os seus valores nesta pasta e a coleta
+# soma todos os processos. Precisa estar definida antes de a aplicação carregar
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), f'membertruck-metricas-{os.getpid()}'),
+)
+
+
+def on_starting(server):
+    # Valores de uma execução anterior não podem entrar na soma
+    pasta = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(pasta, ignore_errors=True)
+    os.makedirs(pasta)
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+
+def child_exit(server, worker):
+    # Gauges do worker que saiu deixam de contar; contadores e histogramas continuam somados
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,79 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+from membertruck_app import conexoes
+
+# Com vários workers (gunicorn) cada processo grava os seus valores em
+# PROMETHEUS_MULTIPROC_DIR (definido no gunicorn.conf.py) e a coleta soma
+# todos; sem a variável, vale só o processo atual (runserver, testes)
+
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+DURACAO = Histogram(
+    'membertruck_http_request_duration_seconds', 'Duração das requisições por rota',
+    ['method', 'route'], buckets=BUCKETS_DURACAO,
+)
+RESPOSTAS = Counter(
+    'membertruck_http_responses_total', 'Respostas por rota e status',
+    ['method', 'route', 'status'],
+)
+TAMANHO = Histogram(
+    'membertruck_http_response_size_bytes', 'Tamanho do corpo das respostas (sem streaming)',
+    ['route'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+CONSULTAS = Histogram(
+    'membertruck_db_queries_per_request', 'Consultas SQL por requisição',
+    ['route'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+TEMPO_SQL = Histogram(
+    'membertruck_db_time_seconds', 'Tempo em SQL por requisição',
+    ['route'], buckets=BUCKETS_DURACAO,
+)
+# O pool é por processo e é lido só na coleta (metricas_view), não a cada requisição: com
+# vários workers, cada um atualiza a sua parte quando atende uma coleta, então a soma mistura
+# leituras de coletas diferentes (os workers vivos; os que saíram deixam de contar)
+POOL = Gauge(
+    'membertruck_db_pool_connections', 'Conexões do pool (DB_POOL) por estado, somadas entre os workers',
+    ['database', 'state'], multiprocess_mode='livesum',
+)
+
+
+def registrar_pool(estatisticas):
+    """Atualiza os gauges do pool deste processo a partir de conexoes.estatisticas()"""
+    for alias, dados in estatisticas.items():
+        pool = dados['pool']
+        if pool is None:
+            continue
+        for estado, chave in (('in_use', 'em_uso'), ('idle', 'livres'), ('waiting', 'aguardando'), ('max', 'maximo')):
+            POOL.labels(alias, estado).set(pool[chave])
+
+
+def _autorizado(request):
+    """
+    Com METRICAS_TOKEN, exige `Authorization: Bearer <token>`; sem ele, só
+    aceita coletas da própria máquina
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+
+
+def metricas_view(request):
+    """Métricas no formato texto do Prometheus"""
+    if not _autorizado(request):
+        return HttpResponseForbidden()
+    if settings.DB_POOL:
+        registrar_pool(conexoes.estatisticas())
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
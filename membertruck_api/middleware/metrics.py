@@ -1,23 +1,137 @@
 # middleware/metrics.py
-import time
 import logging
-from django.utils.deprecation import MiddlewareMixin
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from membertruck_api import metricas, perfil
+from membertruck_api.tempos import Tempos, observar_sql
 
 logger = logging.getLogger('membertruck_app')
 
-class PerformanceMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        request.start_time = time.time()
+METODOS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class ContadorSQL:
+    """execute_wrapper que conta as consultas e soma o tempo gasto nelas"""
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.total += 1
+
+
+class PerformanceMiddleware:
+    """
+    Métricas das requisições para o /metrics (Prometheus): duração, status,
+    tamanho da resposta e consultas/tempo de SQL, por rota (nome da URL
+    resolvida, não o caminho: /api/associados/1/ e /2/ são a mesma rota).
+
+    Respostas em streaming (exportações) contam até o início do envio.
+
+    Para staff, também emite o header Server-Timing (auth, db, serialize,
+    render) e, com ?profile=1 em GET/HEAD, troca o corpo pelo relatório de
+    SQL e cProfile.
+
+    Síncrono no WSGI e assíncrono no ASGI, para não quebrar a cadeia
+    assíncrona com uma ida e volta de thread por requisição.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            # Hooks assíncronos também, senão o handler ASGI passa cada um por uma thread
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if perfil.pedido(request) and perfil.autorizado(request):
+            return perfil.perfilar(request, self.get_response)
+
+        sql = ContadorSQL()
+        request.tempos = Tempos(sql)
+        inicio = time.perf_counter()
+        with observar_sql(sql):
+            response = self.get_response(request)
+        return self._registrar(request, response, sql, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        # A autenticação pode consultar o banco; só vai para a thread quando há ?profile=1
+        if perfil.pedido(request) and await sync_to_async(perfil.autorizado)(request):
+            return await perfil.aperfilar(request, self.get_response)
+
+        sql = ContadorSQL()
+        request.tempos = Tempos(sql)
+        inicio = time.perf_counter()
+        with observar_sql(sql):
+            response = await self.get_response(request)
+        return self._registrar(request, response, sql, time.perf_counter() - inicio)
+
+    def _registrar(self, request, response, sql, duracao):
+        rota = self._rota(request)
+        metodo = request.method if request.method in METODOS else 'OUTRO'
+        metricas.DURACAO.labels(metodo, rota).observe(duracao)
+        metricas.RESPOSTAS.labels(metodo, rota, str(response.status_code)).inc()
+        metricas.CONSULTAS.labels(rota).observe(sql.total)
+        metricas.TEMPO_SQL.labels(rota).observe(sql.tempo)
+        if not response.streaming:
+            metricas.TAMANHO.labels(rota).observe(len(response.content))
+
+        # Log requisições lentas (> 1 segundo)
+        if duracao > 1.0:
+            logger.warning(
+                f"Requisição lenta: {request.method} {request.path} - {duracao:.2f}s "
+                f"({sql.total} consultas, {sql.tempo:.2f}s em SQL)"
+            )
+
+        # Adicionar header de tempo de resposta
+        response['X-Response-Time'] = f"{duracao:.3f}s"
+        # Tempos do backend não são públicos: só para staff autenticado
+        if settings.SERVER_TIMING and request.tempos.staff:
+            response['Server-Timing'] = request.tempos.cabecalho(duracao)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        tempos = getattr(request, 'tempos', None)  # None no modo profile
+        if tempos is not None:
+            tempos.iniciar_view()
+
+    def process_template_response(self, request, response):
+        tempos = getattr(request, 'tempos', None)
+        if tempos is None:
+            return response
+        # Respostas DRF são renderizadas logo depois deste hook
+        inicio = time.perf_counter()
+
+        def renderizada(response):
+            tempos.etapas['render'] = tempos.etapas.get('render', 0.0) + time.perf_counter() - inicio
+
+        response.add_post_render_callback(renderizada)
+        return response
 
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return PerformanceMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
 
-            # Log requisições lentas (> 1 segundo)
-            if duration > 1.0:
-                logger.warning(f"Requisição lenta: {request.method} {request.path} - {duration:.2f}s")
+    async def _aprocess_template_response(self, request, response):
+        return PerformanceMiddleware.process_template_response(self, request, response)
 
-            # Adicionar header de tempo de resposta
-            response['X-Response-Time'] = f"{duration:.3f}s"
-            
-        return response
\ No newline at end of file
+    def _rota(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'nao_encontrada'
+        return match.view_name or match.route
@@ -0,0 +1,100 @@
+# middleware/replicas.py
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from membertruck_api import roteador
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+COOKIE = 'primario_ate'
+HEADER = 'X-Primario-Ate'
+
+
+class ReplicaMiddleware:
+    """
+    Escolhe a réplica de leitura da requisição (RoteadorReplicas).
+
+    Read-your-writes: depois de uma escrita bem-sucedida a resposta traz o
+    cookie `primario_ate` e o header `X-Primario-Ate` (timestamp até quando
+    ler do primário, DB_PRIMARIO_APOS_ESCRITA segundos). Enquanto o cliente
+    devolver um dos dois, as leituras dele ficam no primário; clientes sem
+    cookie (apps) reenviam o header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        replica = self._replica(request)
+        token = roteador.usar_replica(replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            roteador.restaurar(token)
+        return self._finalizar(request, response, replica)
+
+    async def __acall__(self, request):
+        replica = self._replica(request)
+        token = roteador.usar_replica(replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            roteador.restaurar(token)
+        return self._finalizar(request, response, replica)
+
+    def _replica(self, request):
+        if settings.DB_REPLICAS and request.method in METODOS_SEGUROS and not self._fixado_no_primario(request):
+            return roteador.escolher_replica()
+        return None
+
+    def _finalizar(self, request, response, replica):
+        if replica is not None and response.streaming:
+            # O corpo é gerado depois que a requisição sai do middleware: a réplica
+            # vale de novo enquanto ele é consumido e é desfeita quando termina
+            if response.is_async:
+                response.streaming_content = self._streaming_async(response.streaming_content, replica)
+            else:
+                response.streaming_content = self._streaming(response.streaming_content, replica)
+
+        if settings.DB_REPLICAS and request.method not in METODOS_SEGUROS and response.status_code < 400:
+            janela = settings.DB_PRIMARIO_APOS_ESCRITA
+            ate = str(int(time.time()) + janela)
+            response.set_cookie(COOKIE, ate, max_age=janela, httponly=True, samesite='Lax')
+            response[HEADER] = ate
+        return response
+
+    @staticmethod
+    def _streaming(conteudo, replica):
+        token = roteador.usar_replica(replica)
+        try:
+            yield from conteudo
+        finally:
+            roteador.restaurar(token)
+
+    @staticmethod
+    async def _streaming_async(conteudo, replica):
+        token = roteador.usar_replica(replica)
+        try:
+            async for parte in conteudo:
+                yield parte
+        finally:
+            roteador.restaurar(token)
+
+    def _fixado_no_primario(self, request):
+        valor = request.COOKIES.get(COOKIE) or request.headers.get(HEADER)
+        try:
+            ate = int(valor)
+        except (TypeError, ValueError):
+            return False
+        agora = time.time()
+        # Valores além da janela são ignorados: o cliente não se fixa no primário para sempre
+        return agora < ate <= agora + settings.DB_PRIMARIO_APOS_ESCRITA
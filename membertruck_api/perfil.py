@@ -0,0 +1,149 @@
+import cProfile
+import pstats
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+
+from membertruck_api.tempos import observar_sql
+from membertruck_app.autenticacao import ClaimsJWTAuthentication
+
+
+METODOS = ('GET', 'HEAD')
+
+
+def pedido(request):
+    """
+    ?profile=1, só em GET/HEAD: numa escrita a view rodaria de verdade e a
+    resposta seria trocada pelo relatório. A checagem barata vem antes, para
+    não custar nada nas outras requisições.
+    """
+    return (
+        'profile=' in request.META.get('QUERY_STRING', '')
+        and request.method in METODOS
+        and request.GET.get('profile') == '1'
+    )
+
+
+def autorizado(request):
+    """Só staff, pelo token JWT da requisição (o middleware roda antes da autenticação das views)"""
+    try:
+        resultado = ClaimsJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return resultado is not None and resultado[0].is_staff
+
+
+class RegistroSQL:
+    """execute_wrapper que guarda cada consulta com parâmetros e duração"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'banco': context['connection'].alias,
+                'sql': sql,
+                'params': params,
+                'tempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            })
+
+
+def duplicadas(consultas):
+    """
+    Consultas repetidas com o mesmo SQL (típico de N+1): vezes, parâmetros
+    distintos (1 = a mesma consulta repetida) e o tempo somado, das mais
+    repetidas para as menos
+    """
+    grupos = defaultdict(list)
+    for consulta in consultas:
+        grupos[consulta['sql']].append(consulta)
+    resultado = []
+    for sql, repeticoes in grupos.items():
+        if len(repeticoes) > 1:
+            resultado.append({
+                'sql': sql,
+                'vezes': len(repeticoes),
+                'parametros_distintos': len({repr(consulta['params']) for consulta in repeticoes}),
+                'tempo_ms': round(sum(consulta['tempo_ms'] for consulta in repeticoes), 3),
+            })
+    return sorted(resultado, key=lambda grupo: (-grupo['vezes'], -grupo['tempo_ms']))
+
+
+def funcoes_mais_lentas(profiler, quantidade):
+    estatisticas = pstats.Stats(profiler)
+    linhas = []
+    for (arquivo, linha, funcao), (_, chamadas, proprio, acumulado, _) in estatisticas.stats.items():
+        linhas.append({
+            'funcao': f'{arquivo}:{linha}({funcao})',
+            'chamadas': chamadas,
+            'tempo_proprio_ms': round(proprio * 1000, 3),
+            'tempo_acumulado_ms': round(acumulado * 1000, 3),
+        })
+    linhas.sort(key=lambda linha: linha['tempo_acumulado_ms'], reverse=True)
+    return linhas[:quantidade]
+
+
+def perfilar(request, get_response):
+    """
+    Executa a requisição com cProfile e registro de SQL e devolve o relatório
+    no lugar do corpo. Nas views assíncronas só o trecho síncrono (ORM nas
+    threads) aparece no cProfile.
+    """
+    registro = RegistroSQL()
+    profiler = cProfile.Profile()
+    inicio = time.perf_counter()
+    with observar_sql(registro):
+        profiler.enable()
+        try:
+            response = get_response(request)
+            if response.streaming:
+                # O corpo é gerado ao ser consumido: sem isso o tempo e o SQL dele ficariam de fora
+                for _ in response:
+                    pass
+        finally:
+            profiler.disable()
+    return relatorio(response, registro, profiler, time.perf_counter() - inicio)
+
+
+async def aperfilar(request, get_response):
+    """
+    perfilar na cadeia assíncrona (ASGI). O cProfile vê só a thread do event
+    loop: o ORM, nas threads do sync_to_async, aparece no SQL mas não no
+    perfil, e o que outras requisições fizerem no loop durante a medição entra
+    junto.
+    """
+    registro = RegistroSQL()
+    profiler = cProfile.Profile()
+    inicio = time.perf_counter()
+    with observar_sql(registro):
+        profiler.enable()
+        try:
+            response = await get_response(request)
+            if response.streaming:
+                async for _ in response:
+                    pass
+        finally:
+            profiler.disable()
+    return relatorio(response, registro, profiler, time.perf_counter() - inicio)
+
+
+def relatorio(response, registro, profiler, total):
+    consultas = [{**consulta, 'params': repr(consulta['params'])} for consulta in registro.consultas]
+    return JsonResponse({
+        'status': response.status_code,
+        'tempo_total_ms': round(total * 1000, 3),
+        'sql': {
+            'total': len(consultas),
+            'tempo_ms': round(sum(consulta['tempo_ms'] for consulta in consultas), 3),
+            'duplicadas': duplicadas(registro.consultas),
+            'consultas': consultas,
+        },
+        'perfil': funcoes_mais_lentas(profiler, settings.PROFILE_TOP),
+    })
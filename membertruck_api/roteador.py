@@ -0,0 +1,58 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Réplica escolhida para a requisição atual (None: tudo no primário).
+# Definida pelo ReplicaMiddleware; ContextVar segue a requisição também nas views assíncronas
+_replica = ContextVar('replica', default=None)
+
+
+def escolher_replica():
+    replicas = settings.DB_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+def replica_atual():
+    return _replica.get()
+
+
+def usar_replica(alias):
+    """Define a réplica das leituras do contexto atual; devolve o token para restaurar"""
+    return _replica.set(alias)
+
+
+def restaurar(token):
+    _replica.reset(token)
+
+
+class RoteadorReplicas:
+    """
+    Leituras de requisições seguras (GET/HEAD/OPTIONS) vão para a réplica
+    escolhida pelo ReplicaMiddleware; escritas, e leituras dentro de uma
+    transação no primário, ficam no primário. Fora de requisição (comandos,
+    jobs) tudo usa o primário.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primário e réplicas têm os mesmos dados
+        bancos = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o schema pela replicação
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
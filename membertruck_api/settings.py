@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv # Não esqueça desta linha no topo!
@@ -83,6 +84,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -91,8 +93,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'membertruck_api.middleware.metrics.PerformanceMiddleware',  # Métricas do /metrics (mede todo o restante)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'membertruck_api.middleware.replicas.ReplicaMiddleware',  # Leituras nas réplicas (DB_REPLICAS)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -111,7 +115,7 @@ CORS_ALLOWED_ORIGINS = [
 
 # Adicionar configurações específicas
 CORS_ALLOW_CREDENTIALS = True
-CORS_ALLOWED_HEADERS = [
+CORS_ALLOW_HEADERS = [
     'accept',
     'accept-encoding',
     'authorization',
@@ -121,7 +125,9 @@ CORS_ALLOWED_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-primario-ate',
 ]
+CORS_EXPOSE_HEADERS = ['x-primario-ate']  # Read-your-writes das réplicas (ReplicaMiddleware)
 
 
 ROOT_URLCONF = 'membertruck_api.urls'
@@ -147,6 +153,19 @@ WSGI_APPLICATION = 'membertruck_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Conexões com o PostgreSQL
+# DB_CONN_MAX_AGE: segundos que cada worker mantém a conexão aberta entre requisições
+# (0 = abre e fecha uma por requisição; o ASGI roda cada requisição numa thread e não
+# reaproveita a conexão, então lá o padrão é 0: use o pool)
+# DB_POOL=True: pool compartilhado pelas threads do processo (psycopg_pool); os
+# workers somam até GUNICORN_WORKERS * DB_POOL_MAX conexões no PostgreSQL
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0' if os.environ.get('SERVIDOR') == 'asgi' else '60'))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'  # Testa a conexão reaproveitada antes de usar
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # Espera máxima (s) por uma conexão livre
+
 # Configuração para o PostgreSQL no seu VPS
 DATABASES = {
     'default': {
@@ -156,9 +175,72 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'), # <--- MUDANÇA AQUI
         'HOST': os.environ.get('POSTGRES_HOST'), # <--- MUDANÇA AQUI
         'PORT': os.environ.get('POSTGRES_PORT', '5432'), # <--- MUDANÇA AQUI
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,  # O pool não aceita conexões persistentes
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'OPTIONS': {
+            'pool': {
+                'min_size': DB_POOL_MIN,
+                'max_size': DB_POOL_MAX,
+                'timeout': DB_POOL_TIMEOUT,
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Réplicas de leitura: POSTGRES_REPLICA_HOSTS='host1,host2:5433' (mesmo banco, usuário e senha
+# do primário). Leituras de GET vão para uma réplica; depois de uma escrita o cliente lê do
+# primário por DB_PRIMARIO_APOS_ESCRITA segundos (deve cobrir o atraso da replicação)
+DB_REPLICAS = []
+_replica_hosts = [h.strip() for h in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if h.strip()]
+for numero, endereco in enumerate(_replica_hosts, 1):
+    host, _, porta = endereco.partition(':')
+    DATABASES[f'replica{numero}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': porta or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},  # Nos testes a réplica é o próprio banco de teste
+    }
+    DB_REPLICAS.append(f'replica{numero}')
+DATABASE_ROUTERS = ['membertruck_api.roteador.RoteadorReplicas']
+DB_PRIMARIO_APOS_ESCRITA = int(os.environ.get('DB_PRIMARIO_APOS_ESCRITA', '5'))
+
+# Header Server-Timing (auth, db, serialize, render) nas respostas a staff autenticado (JWT)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True') == 'True'
+# ?profile=1 (staff): funções listadas no resumo do cProfile
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', '30'))
+
+# Token exigido pelo /metrics (Authorization: Bearer <token>); sem ele, só coletas locais
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Cache (Redis)
+# Compartilhado entre os workers; usado pelo dashboard e pelas tabelas de referência
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'membertruck',
+        'OPTIONS': {
+            'socket_connect_timeout': 1,  # Redis fora não pode travar as requisições
+            'socket_timeout': 1,
+        },
+    }
+}
+
+# manage.py test usa cache em memória: a suíte não depende de um Redis em 127.0.0.1:6379 e o
+# cache.clear() dos testes não apaga o cache de verdade. TEST_REDIS=True testa contra o REDIS_URL.
+if sys.argv[1:2] == ['test'] and os.environ.get('TEST_REDIS', 'False') != 'True':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'membertruck-testes',
+            'KEY_PREFIX': 'membertruck',
+        }
+    }
+
+# Tempo (segundos) que Plano, Cargo e Departamento ficam em cache (invalidados a cada escrita)
+REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', '3600'))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -210,13 +292,92 @@ AUTH_USER_MODEL = 'membertruck_app.Pessoa' # Seu modelo de usuário customizado
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'membertruck_app.autenticacao.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', # Padrão: exige autenticação para todas as views
     ),
+    # Paginação keyset (cursor) sobre a PK: sem OFFSET, custo constante por página
+    'DEFAULT_PAGINATION_CLASS': 'membertruck_app.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
 }
 
+# Leitura rápida via .values() nas listas/detalhes de Associado e Veículo (?fast=1 força por requisição)
+API_FAST_READ = os.environ.get('API_FAST_READ', 'False') == 'True'
+
+# Tempo (segundos) que os totais do dashboard ficam em cache
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '30'))
+
+# Importação em lote de associados: linhas por transação/bulk_create, limite por arquivo
+# e processos para o hash das senhas (0 = um por CPU, até 4)
+IMPORTACAO_LOTE = int(os.environ.get('IMPORTACAO_LOTE', '500'))
+# O limite por arquivo vale só para a API e depende do GUNICORN_TIMEOUT (30 s): cada senha custa
+# ~0,3 s de CPU no hasher padrão, então 200 linhas levam ~15 s com 4 processos. Arquivos
+# maiores: manage.py importar_associados, sem timeout
+IMPORTACAO_MAX_LINHAS = int(os.environ.get('IMPORTACAO_MAX_LINHAS', '200'))
+IMPORTACAO_WORKERS = int(os.environ.get('IMPORTACAO_WORKERS', '0'))
+
+# Hierarquia (GET /gestores/<id>/hierarquia/): profundidade máxima da árvore e TTL do cache,
+# que de resto é invalidado a cada alteração em funcionários, associados e veículos
+HIERARQUIA_MAX_NIVEIS = int(os.environ.get('HIERARQUIA_MAX_NIVEIS', '20'))
+HIERARQUIA_CACHE_TTL = int(os.environ.get('HIERARQUIA_CACHE_TTL', '3600'))
+
+# Atualização em lote (PATCH .../lote/): máximo de IDs na lista; acima disso, usar filtro
+ATUALIZACAO_LOTE_MAX_IDS = int(os.environ.get('ATUALIZACAO_LOTE_MAX_IDS', '50000'))
+
+# last_login do login JWT gravado em lote: a cada N usuários ou a cada X segundos (1 = imediato)
+ULTIMO_LOGIN_LOTE = int(os.environ.get('ULTIMO_LOGIN_LOTE', '100'))
+ULTIMO_LOGIN_INTERVALO = int(os.environ.get('ULTIMO_LOGIN_INTERVALO', '10'))
+
+# Autenticação JWT sem banco: o usuário da requisição vem dos claims de papel do token.
+# is_active e o papel são conferidos pelo cache de usuários abaixo: desativar ou trocar o
+# papel troca a versão no Redis e os tokens já emitidos são recusados na próxima requisição.
+JWT_STATELESS = os.environ.get('JWT_STATELESS', 'False') == 'True'
+
+# Cache por processo da Pessoa completa (modo JWT_STATELESS): máximo de usuários e validade
+# (segundos). Com o Redis fora, a validade é a janela em que um usuário desativado ainda passa.
+USUARIO_CACHE_TAMANHO = int(os.environ.get('USUARIO_CACHE_TAMANHO', '1000'))
+USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', '60'))
+
+# Envio de WhatsApp: implementação do remetente (padrão: WhatsApp Cloud API; em desenvolvimento
+# e nos testes, WHATSAPP_REMETENTE=membertruck_app.whatsapp.RemetenteFake), credenciais do
+# provedor e DDI acrescentado aos telefones cadastrados só com DDD
+WHATSAPP_REMETENTE = os.environ.get('WHATSAPP_REMETENTE', 'membertruck_app.whatsapp.RemetenteCloudAPI')
+WHATSAPP_API_URL = os.environ.get('WHATSAPP_API_URL', 'https://graph.facebook.com/v20.0')
+WHATSAPP_NUMERO_ID = os.environ.get('WHATSAPP_NUMERO_ID', '')
+WHATSAPP_TOKEN = os.environ.get('WHATSAPP_TOKEN', '')
+WHATSAPP_TIMEOUT = float(os.environ.get('WHATSAPP_TIMEOUT', '10'))
+WHATSAPP_DDI = os.environ.get('WHATSAPP_DDI', '55')
+# Limite de mensagens por segundo da aplicação inteira (todos os processos, contado no Redis;
+# 0 = sem limite). Sem o Redis, cada processo aplica o limite sozinho.
+WHATSAPP_TAXA = float(os.environ.get('WHATSAPP_TAXA', '20'))
+
+# Campanhas: threads de envio por campanha no processo web (0 = deixa as pendentes para o
+# manage.py processar_mensagens) e mensagens reservadas por lote
+CAMPANHA_WORKERS = int(os.environ.get('CAMPANHA_WORKERS', '4'))
+CAMPANHA_LOTE = int(os.environ.get('CAMPANHA_LOTE', '100'))
+
+# Fila de envio: tentativas até 'erro', backoff exponencial (segundos, base e teto) e tempo
+# de visibilidade de uma reserva (se o worker cair, a mensagem volta à fila depois dele)
+WHATSAPP_MAX_TENTATIVAS = int(os.environ.get('WHATSAPP_MAX_TENTATIVAS', '5'))
+WHATSAPP_BACKOFF = int(os.environ.get('WHATSAPP_BACKOFF', '30'))
+WHATSAPP_BACKOFF_MAX = int(os.environ.get('WHATSAPP_BACKOFF_MAX', '3600'))
+WHATSAPP_VISIBILIDADE = int(os.environ.get('WHATSAPP_VISIBILIDADE', '300'))
+
+# Cobrança automática (manage.py gerar_cobrancas): dias de antecedência do aviso e textos
+COBRANCA_ANTECEDENCIA = int(os.environ.get('COBRANCA_ANTECEDENCIA', '3'))
+COBRANCA_TEMPLATE_AVISO = os.environ.get(
+    'COBRANCA_TEMPLATE_AVISO', 'Olá {nome}, a mensalidade do plano {plano} vence em {vencimento}.'
+)
+COBRANCA_TEMPLATE_VENCIDO = os.environ.get(
+    'COBRANCA_TEMPLATE_VENCIDO', 'Olá {nome}, a mensalidade do plano {plano} venceu em {vencimento}. Regularize para manter sua proteção.'
+)
+
+# Mensagem comemorativa (manage.py enviar_aniversarios)
+ANIVERSARIO_TEMPLATE = os.environ.get(
+    'ANIVERSARIO_TEMPLATE', 'Feliz aniversário, {nome}! A equipe MemberTruck deseja um ótimo dia e boas estradas.'
+)
+
 # Django REST Framework Simple JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60), # Aumentei um pouco para testes
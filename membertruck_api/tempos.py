@@ -0,0 +1,99 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Etapas do header Server-Timing: (nome, descrição)
+ETAPAS = (
+    ('auth', 'Autenticação'),
+    ('db', 'SQL'),
+    ('serialize', 'Serialização e código da view (sem SQL)'),
+    ('render', 'Renderização'),
+)
+
+# execute_wrapper da requisição atual (contador do PerformanceMiddleware ou
+# registro do ?profile=1). As conexões são por thread e, no ASGI, o ORM roda
+# nas threads do sync_to_async: o wrapper fixo de cada conexão (instalar) lê
+# este ContextVar, que acompanha a requisição até essas threads
+_sql = ContextVar('sql', default=None)
+
+
+def _executar(execute, sql, params, many, context):
+    wrapper = _sql.get()
+    if wrapper is None:
+        return execute(sql, params, many, context)
+    return wrapper(execute, sql, params, many, context)
+
+
+def instalar(conexao):
+    """
+    Chamado no connection_created; entra no início da lista para não
+    atrapalhar o pop dos execute_wrapper temporários
+    """
+    if _executar not in conexao.execute_wrappers:
+        conexao.execute_wrappers.insert(0, _executar)
+
+
+@contextmanager
+def observar_sql(wrapper):
+    """Passa as consultas do contexto atual (e das threads que ele chamar) pelo wrapper"""
+    token = _sql.set(wrapper)
+    try:
+        yield wrapper
+    finally:
+        _sql.reset(token)
+
+
+class Tempos:
+    """
+    Tempos da requisição (criado pelo PerformanceMiddleware em request.tempos).
+
+    `medir` soma as etapas instrumentadas (auth, render); o SQL vem do
+    contador de consultas e `serialize` é o que sobra do tempo da view
+    depois de descontar as etapas medidas e o SQL feito fora delas.
+
+    `staff` é marcado pela autenticação JWT: o header só vai para staff.
+    """
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.staff = False
+        self.etapas = {}
+        self.sql_nas_etapas = 0.0
+        self.inicio_view = None
+        self.sql_antes_view = 0.0
+
+    def iniciar_view(self):
+        self.inicio_view = time.perf_counter()
+        self.sql_antes_view = self.sql.tempo
+
+    def cabecalho(self, total):
+        duracoes = dict(self.etapas)
+        duracoes['db'] = self.sql.tempo
+        if self.inicio_view is not None:
+            view = time.perf_counter() - self.inicio_view
+            sql_na_view = self.sql.tempo - self.sql_antes_view
+            duracoes['serialize'] = max(0.0, view - sum(self.etapas.values()) - (sql_na_view - self.sql_nas_etapas))
+
+        partes = []
+        for nome, descricao in ETAPAS:
+            if nome in duracoes:
+                if nome == 'db':
+                    descricao = f'{descricao} ({self.sql.total} consultas)'
+                partes.append(f'{nome};dur={duracoes[nome] * 1000:.2f};desc="{descricao}"')
+        partes.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(partes)
+
+
+@contextmanager
+def medir(request, etapa):
+    """Soma a duração do bloco na etapa; sem request.tempos (fora do middleware), não faz nada"""
+    tempos = getattr(request, 'tempos', None)
+    if tempos is None:
+        yield
+        return
+    inicio, sql_inicio = time.perf_counter(), tempos.sql.tempo
+    try:
+        yield
+    finally:
+        tempos.etapas[etapa] = tempos.etapas.get(etapa, 0.0) + time.perf_counter() - inicio
+        tempos.sql_nas_etapas += tempos.sql.tempo - sql_inicio
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Value
+from django.utils import timezone
+
+from .campanhas import associados_do_segmento, filtro_aniversario, inserir_mensagens, validar_template
+from .models import Associado, Campanha
+
+
+def aniversariantes(data):
+    """
+    Associados ativos que fazem aniversário em `data`, já com os dados de
+    contato. Busca pelo índice de (mês, dia) do nascimento e chega ao
+    Associado pela chave única de idPessAsso: o custo depende só de quantos
+    fazem aniversário no dia, não do tamanho da tabela.
+    """
+    return Associado.objects.filter(
+        filtro_aniversario(data), idPessAsso__is_active=True
+    ).order_by('idPessAsso__nomePess', 'idAsso').values(
+        'idAsso',
+        nome=F('idPessAsso__nomePess'),
+        telefone=F('idPessAsso__telefonePess'),
+        nascimento=F('idPessAsso__nascimentoPess'),
+        plano=F('idPlanAsso__nomePlan'),
+    )
+
+
+def gerar_comemorativas(hoje=None):
+    """
+    Enfileira a mensagem comemorativa de cada aniversariante do dia (com
+    telefone) num único INSERT ... SELECT. A referência 'aniversario:<ano>'
+    garante uma mensagem por associado por ano: rodar o job de novo no mesmo
+    dia não repete nada. Devolve quantas mensagens foram criadas.
+
+    O envio fica com o processar_mensagens, como na cobrança automática.
+    """
+    hoje = hoje or timezone.localdate()
+    template = settings.ANIVERSARIO_TEMPLATE
+    validar_template(template)
+
+    with transaction.atomic():
+        campanha = Campanha.objects.create(
+            nome=f'Aniversariantes {hoje:%d/%m/%Y}', tipoMensagem='comemorativa',
+            template=template, segmento={'aniversariantes': True},
+        )
+        total = inserir_mensagens(
+            associados_do_segmento({'aniversariantes': True}, hoje), 'comemorativa', template,
+            campanha.pk, Value(f'aniversario:{hoje.year}', output_field=CharField()),
+        )
+        if total:
+            Campanha.objects.filter(pk=campanha.pk).update(total=total)
+        else:
+            campanha.delete()
+    return total
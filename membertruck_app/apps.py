@@ -4,5 +4,6 @@ from django.apps import AppConfig
 class MembertruckAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'membertruck_app'
-    
-   
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registra os receivers
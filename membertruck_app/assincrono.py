@@ -0,0 +1,110 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from membertruck_api.tempos import medir
+
+
+class AsyncAPIView(View):
+    """
+    Base das views assíncronas (async def get/post/...).
+
+    O DRF é síncrono: aqui a negociação de conteúdo, a autenticação, as
+    permissões e o throttling do DRF (na ordem de APIView.initial) rodam em
+    um único salto para thread (sync_to_async) e o restante da view roda
+    no event loop, com o ORM e o cache assíncronos do Django. Respostas e
+    erros saem no mesmo formato JSON das views DRF.
+
+    Só renderizadores que não dependem do Response do DRF (JSON): o
+    navegável não está disponível e Accept sem JSON recebe 406.
+
+    Métodos que a view não implementa são repassados para `sync_view` (a
+    view DRF equivalente), quando houver. No ASGI (uvicorn) a requisição não
+    prende um worker enquanto espera I/O; no WSGI o Django executa a view
+    com async_to_sync, então as mesmas URLs funcionam nos dois modos.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    renderer_classes = [JSONRenderer]
+    content_negotiation_class = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS
+    renderer = JSONRenderer()  # Trocado pelo negociado em verificar_acesso
+    sync_view = None
+
+    # Mesmas implementações das views DRF (dependem só dos atributos acima)
+    get_renderers = APIView.get_renderers
+    get_content_negotiator = APIView.get_content_negotiator
+    perform_content_negotiation = APIView.perform_content_negotiation
+    get_throttles = APIView.get_throttles
+    check_throttles = APIView.check_throttles
+    throttled = APIView.throttled
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Autenticação por token, sem CSRF (como APIView.as_view)
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        metodo = request.method.lower()
+        handler = getattr(self, metodo, None) if metodo in self.http_method_names else None
+        if handler is None:
+            if self.sync_view is not None:
+                return await sync_to_async(self.sync_view.as_view())(request, *args, **kwargs)
+            return self.erro(exceptions.MethodNotAllowed(request.method))
+
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[autenticador() for autenticador in self.authentication_classes],
+        )
+        self.request = request
+        self.format_kwarg = kwargs.get(api_settings.FORMAT_SUFFIX_KWARG)
+        try:
+            await sync_to_async(self.verificar_acesso)(request)
+            return await handler(request, *args, **kwargs)
+        except Http404:
+            return self.erro(exceptions.NotFound(), request)  # ?format= desconhecido, como no DRF
+        except exceptions.APIException as e:
+            return self.erro(e, request)
+
+    def verificar_acesso(self, request):
+        """Negociação, autenticação, permission_classes e throttle_classes, como APIView.initial()"""
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        self.renderer = request.accepted_renderer
+        request.user  # Dispara a autenticação (AuthenticationFailed sobe daqui)
+        for permissao in (classe() for classe in self.permission_classes):
+            if not permissao.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permissao, 'message', None))
+        self.check_throttles(request)
+
+    def responder(self, dados, status=200, headers=None):
+        with medir(self.request, 'render'):
+            corpo = self.renderer.render(dados)
+        return HttpResponse(corpo, status=status, headers=headers, content_type=self.renderer.media_type)
+
+    def erro(self, exc, request=None):
+        """Mesmo corpo e status de APIView.handle_exception (401 com WWW-Authenticate ou 403)"""
+        headers = {}
+        status = exc.status_code
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            cabecalho = request.authenticators[0].authenticate_header(request) if request and request.authenticators else None
+            if cabecalho:
+                headers['WWW-Authenticate'] = cabecalho
+            else:
+                status = 403
+        if isinstance(exc, exceptions.MethodNotAllowed):
+            headers['Allow'] = ', '.join(m.upper() for m in self._allowed_methods())
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = '%d' % exc.wait
+        dados = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.responder(dados, status, headers)
@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from membertruck_api.tempos import medir
+
+from .models import Pessoa, Funcionario, Associado
+
+logger = logging.getLogger('membertruck_app')
+
+# Claims de papel gravados no token no login (ver MyTokenObtainPairSerializer.get_token)
+CLAIMS_PAPEL = ('is_staff', 'is_superuser', 'tipo_usuario', 'funcionario_id', 'associado_id', 'is_gestor')
+
+
+def papel_do_usuario(user):
+    """
+    tipo_usuario e IDs do papel a partir das relações já carregadas junto
+    com a Pessoa (PessoaManager.get_by_natural_key), sem consultas extras.
+    """
+    try:
+        funcionario = user.funcionario
+    except Funcionario.DoesNotExist:
+        pass
+    else:
+        return {
+            'tipo_usuario': 'funcionario',
+            'is_gestor': funcionario.is_gestor,
+            'funcionario_id': funcionario.idFunc,
+        }
+    try:
+        return {'tipo_usuario': 'associado', 'associado_id': user.associado.idAsso}
+    except Associado.DoesNotExist:
+        return {'tipo_usuario': 'admin'}  # Ou outro tipo padrão se não for nenhum dos dois
+
+
+def claims_do_usuario(user):
+    """Dados de autorização que vão no token: dispensam o SELECT da Pessoa a cada requisição"""
+    claims = {'is_staff': user.is_staff, 'is_superuser': user.is_superuser}
+    claims.update(papel_do_usuario(user))
+    return claims
+
+
+# =================== CACHE DE USUÁRIOS POR PROCESSO ===================
+
+def _chave_versao(pk):
+    return f'auth:pessoa:{pk}'
+
+
+# Versão desconhecida (Redis fora): não dá para saber se o usuário mudou
+_INDISPONIVEL = object()
+
+
+def _versao(pk):
+    """Versão compartilhada (Redis) do usuário: muda a cada alteração, em qualquer worker"""
+    try:
+        return cache.get(_chave_versao(pk))
+    except Exception as e:
+        logger.warning(f"Cache indisponível para versão do usuário {pk}: {e}")
+        return _INDISPONIVEL
+
+
+class CacheUsuarios:
+    """
+    LRU limitado (USUARIO_CACHE_TAMANHO) de Pessoas já com funcionário/associado.
+
+    Cada entrada guarda a versão compartilhada do usuário no momento da
+    leitura; se outro worker alterou a Pessoa, a versão muda e a entrada é
+    relida. USUARIO_CACHE_TTL limita o tempo de uma entrada. Sem Redis a
+    versão é desconhecida e a Pessoa vem sempre do banco (primário).
+    """
+
+    def __init__(self):
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, pk):
+        versao, agora = _versao(pk), time.monotonic()
+        if versao is _INDISPONIVEL:
+            return self._ler(pk, primario=True)
+        with self._lock:
+            entrada = self._entradas.get(pk)
+            if entrada and entrada[1] == versao and agora - entrada[2] < settings.USUARIO_CACHE_TTL:
+                self._entradas.move_to_end(pk)
+                return entrada[0]
+
+        # A versão é o time_ns da invalidação: logo depois dela a réplica pode ainda não ter a
+        # alteração, e a Pessoa antiga ficaria guardada com a versão nova
+        recente = versao is not None and time.time_ns() - versao < settings.DB_PRIMARIO_APOS_ESCRITA * 10 ** 9
+        pessoa = self._ler(pk, primario=recente)
+        with self._lock:
+            self._entradas[pk] = (pessoa, versao, agora)
+            self._entradas.move_to_end(pk)
+            while len(self._entradas) > settings.USUARIO_CACHE_TAMANHO:
+                self._entradas.popitem(last=False)
+        return pessoa
+
+    def _ler(self, pk, primario):
+        pessoas = Pessoa.objects.select_related('funcionario', 'associado')
+        if primario:
+            pessoas = pessoas.using(DEFAULT_DB_ALIAS)
+        return pessoas.get(pk=pk)
+
+    def descartar(self, pk):
+        """Remove o usuário deste processo e troca a versão compartilhada (os demais releem)"""
+        with self._lock:
+            self._entradas.pop(pk, None)
+        try:
+            cache.set(_chave_versao(pk), time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"Falha ao invalidar usuário {pk} no cache: {e}")
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+usuarios = CacheUsuarios()
+
+
+# =================== AUTENTICAÇÃO ===================
+
+class UsuarioToken(TokenUser):
+    """
+    Usuário montado só com os claims do token (sem consulta). Atributos que
+    não estão no token (nomePess, emailPess, ...) vêm da Pessoa completa,
+    carregada sob demanda pelo cache de usuários.
+    """
+
+    @cached_property
+    def pessoa(self):
+        try:
+            pessoa = usuarios.obter(self.pk)
+        except Pessoa.DoesNotExist:
+            raise AuthenticationFailed('Usuário não encontrado', code='user_not_found')
+        if not pessoa.is_active:
+            raise AuthenticationFailed('Usuário inativo', code='user_inactive')
+        return pessoa
+
+    @cached_property
+    def username(self):
+        return self.pessoa.usuarioPess
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in CLAIMS_PAPEL or attr in self.token:
+            return self.token.get(attr)
+        return getattr(self.pessoa, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication com modo sem banco (JWT_STATELESS=True): o usuário da
+    requisição vem dos claims do token. Tokens emitidos antes dos claims de
+    papel seguem pelo caminho padrão (SELECT da Pessoa).
+
+    A Pessoa ainda é conferida pelo cache de usuários (versão no Redis, sem
+    SELECT enquanto não muda): usuário desativado ou com papel diferente do
+    token é recusado na hora, não só quando o token expira.
+    """
+
+    def authenticate(self, request):
+        with medir(request, 'auth'):
+            resultado = super().authenticate(request)
+        tempos = getattr(request, 'tempos', None)
+        if tempos is not None and resultado is not None:
+            tempos.staff = resultado[0].is_staff  # Server-Timing só para staff
+        return resultado
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS and 'tipo_usuario' in validated_token:
+            user = UsuarioToken(validated_token)
+            claims = claims_do_usuario(user.pessoa)  # Recusa usuário removido ou inativo
+            if any(validated_token.get(claim) != valor for claim, valor in claims.items()):
+                raise AuthenticationFailed('Papel do usuário alterado, faça login novamente', code='user_changed')
+            return user
+        return super().get_user(validated_token)
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = logging.getLogger('membertruck_app')
+
+# Acertos/erros deste processo, por modelo (ex.: {'plano': {'hits': 10, 'misses': 1}})
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_stats_lock = threading.Lock()
+
+
+def _registrar(nome, resultado):
+    with _stats_lock:
+        _stats[nome][resultado] += 1
+
+
+def estatisticas():
+    """Hits, misses e taxa de acerto deste processo por tabela de referência"""
+    with _stats_lock:
+        resultado = {}
+        for nome, valores in _stats.items():
+            total = valores['hits'] + valores['misses']
+            resultado[nome] = {**valores, 'hit_rate': round(valores['hits'] / total, 4) if total else None}
+        return resultado
+
+
+def _chave_versao(model):
+    return f'ref:versao:{model._meta.model_name}'
+
+
+def versao(model):
+    """
+    Versão atual do namespace do modelo. As chaves dos dados incluem a versão,
+    então invalidar é só trocar a versão (todas as páginas e detalhes de uma vez).
+    """
+    chave = _chave_versao(model)
+    atual = cache.get(chave)
+    if atual is None:
+        # Se a versão foi despejada, começa num namespace novo (nunca reaproveita um antigo)
+        cache.add(chave, time.time_ns(), None)
+        atual = cache.get(chave)
+    return atual
+
+
+def invalidar(model):
+    """Descarta tudo que está em cache para o modelo"""
+    chave = _chave_versao(model)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, time.time_ns(), None)
+    except Exception as e:
+        logger.warning(f"Falha ao invalidar cache de {model._meta.model_name}: {e}")
+
+
+def _chave_dados(model, versao_atual, url):
+    return f'ref:{model._meta.model_name}:{versao_atual}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+async def aobter(model, url):
+    """
+    Resposta em cache da URL pelo cache assíncrono, ou None. Só lê: sem
+    versão ou sem a entrada, quem calcula (e grava) é a view síncrona.
+    """
+    try:
+        versao_atual = await cache.aget(_chave_versao(model))
+        data = await cache.aget(_chave_dados(model, versao_atual, url)) if versao_atual is not None else None
+    except Exception as e:
+        logger.warning(f"Cache indisponível para {model._meta.model_name}: {e}")
+        return None
+    if data is not None:
+        _registrar(model._meta.model_name, 'hits')
+    return data
+
+
+class ReferenceCacheMixin:
+    """
+    Cache das respostas GET de lista/detalhe das tabelas de referência
+    (Plano, Cargo, Departamento), com TTL de REFERENCE_CACHE_TTL segundos.
+    Criação, alteração e exclusão (pela API ou pelo admin) invalidam via signals.
+    Se o Redis estiver fora, a view responde direto do banco.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, super().retrieve, *args, **kwargs)
+
+    def _cached(self, request, handler, *args, **kwargs):
+        model = self.queryset.model
+        nome = model._meta.model_name
+        try:
+            chave = _chave_dados(model, versao(model), request.build_absolute_uri())
+            data = cache.get(chave)
+        except Exception as e:
+            logger.warning(f"Cache indisponível para {nome}: {e}")
+            return handler(request, *args, **kwargs)
+
+        if data is not None:
+            _registrar(nome, 'hits')
+            return Response(data)
+
+        _registrar(nome, 'misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            try:
+                cache.set(chave, response.data, settings.REFERENCE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Falha ao gravar cache de {nome}: {e}")
+        return response
@@ -0,0 +1,182 @@
+import calendar
+import logging
+import string
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import CharField, DateTimeField, F, Func, IntegerField, Q, TextField, Value
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce, Replace
+from django.utils import timezone
+
+from . import fila
+from .models import Associado, Campanha, MensagemWhatsApp
+
+logger = logging.getLogger('membertruck_app')
+
+
+class DataBR(Func):
+    """Data formatada como DD/MM/AAAA no próprio banco"""
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="TO_CHAR(%(expressions)s, 'DD/MM/YYYY')", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="STRFTIME('%%%%d/%%%%m/%%%%Y', %(expressions)s)", **extra_context)
+
+
+# Variáveis aceitas no template e a expressão (relativa ao Associado) de cada uma
+VARIAVEIS = {
+    'nome': F('idPessAsso__nomePess'),
+    'plano': F('idPlanAsso__nomePlan'),
+    'vencimento': DataBR('dataPagamentoAsso'),
+}
+
+
+class ErroCampanha(Exception):
+    """Template ou segmento inválido"""
+
+
+# =================== SEGMENTO E TEMPLATE ===================
+
+def variaveis_do_template(template):
+    """Nomes entre chaves usados no template ({nome}, {plano}, ...)"""
+    try:
+        return {campo for _, campo, _, _ in string.Formatter().parse(template) if campo is not None}
+    except ValueError as e:
+        raise ErroCampanha(f'Template inválido: {e}')
+
+
+def validar_template(template):
+    desconhecidas = variaveis_do_template(template) - set(VARIAVEIS)
+    if desconhecidas:
+        raise ErroCampanha(
+            f'Variáveis desconhecidas no template: {", ".join(sorted(desconhecidas))}. '
+            f'Disponíveis: {", ".join("{%s}" % nome for nome in VARIAVEIS)}'
+        )
+
+
+def filtro_aniversario(data, campo='idPessAsso__nascimentoPess'):
+    """
+    Nascidos no dia/mês de `data`, pelo índice de (mês, dia) do nascimento.
+    Em ano não bissexto quem nasceu em 29/02 comemora em 28/02.
+    """
+    dias = [data.day]
+    if (data.month, data.day) == (2, 28) and not calendar.isleap(data.year):
+        dias.append(29)
+    return Q(**{f'{campo}__month': data.month, f'{campo}__day__in': dias})
+
+
+def associados_do_segmento(segmento, hoje=None):
+    """
+    Associados ativos e com telefone que atendem a todos os filtros do
+    segmento: plano, consultor, inadimplente (pagamento vencido) e
+    aniversariantes (nascidos no dia/mês de hoje).
+    """
+    hoje = hoje or timezone.localdate()
+    filtros = Q(idPessAsso__is_active=True, idPessAsso__telefonePess__isnull=False) & ~Q(idPessAsso__telefonePess='')
+    if segmento.get('plano') is not None:
+        filtros &= Q(idPlanAsso_id=segmento['plano'])
+    if segmento.get('consultor') is not None:
+        filtros &= Q(consultor_id=segmento['consultor'])
+    if segmento.get('inadimplente'):
+        filtros &= Q(dataPagamentoAsso__lt=hoje)
+    if segmento.get('aniversariantes'):
+        filtros &= filtro_aniversario(hoje)
+    return Associado.objects.filter(filtros)
+
+
+def _conteudo(template):
+    """Template renderizado em SQL: um REPLACE por variável usada"""
+    conteudo = Value(template, output_field=TextField())
+    for nome in sorted(variaveis_do_template(template)):
+        valor = Coalesce(VARIAVEIS[nome], Value(''), output_field=TextField())
+        conteudo = Replace(conteudo, Value('{%s}' % nome, output_field=TextField()), valor)
+    return conteudo
+
+
+# =================== CRIAÇÃO ===================
+
+def inserir_mensagens(associados, tipo_mensagem, template, campanha_id=None, referencia=None):
+    """
+    Cria uma mensagem 'pendente' por associado do queryset com um único
+    INSERT ... SELECT: as linhas (e o texto já personalizado) são geradas
+    no banco, sem trazer os associados para o Python.
+
+    Com `referencia` (expressão sobre o Associado, ex.: 'vencido:2025-01-10'),
+    linhas que repetem (associado, referencia) são ignoradas pela constraint
+    única (ON CONFLICT DO NOTHING): a mesma cobrança nunca sai duas vezes.
+    Devolve quantas mensagens foram criadas.
+    """
+    agora = timezone.now()
+    colunas = {
+        'associado': F('idAsso'),
+        'tipoMensagem': Value(tipo_mensagem, output_field=CharField()),
+        'conteudo': _conteudo(template),
+        'dataEnvio': Value(agora, output_field=DateTimeField()),
+        'status': Value('pendente', output_field=CharField()),
+        'updated_at': Value(agora, output_field=DateTimeField()),
+        'campanha': Value(campanha_id, output_field=IntegerField()),
+        'proximaTentativa': Value(agora, output_field=DateTimeField()),
+        'tentativas': Value(0, output_field=IntegerField()),
+    }
+    if referencia is not None:
+        colunas['referencia'] = referencia
+
+    aliases = {f'_{nome}': expressao for nome, expressao in colunas.items()}
+    sql, params = associados.order_by().annotate(**aliases).values_list(*aliases).query.sql_with_params()
+
+    ops, on_conflict = connection.ops, OnConflict.IGNORE if referencia is not None else None
+    campos = [MensagemWhatsApp._meta.get_field(nome) for nome in colunas]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(on_conflict=on_conflict)} {ops.quote_name(MensagemWhatsApp._meta.db_table)} '
+            f'({", ".join(ops.quote_name(campo.column) for campo in campos)}) {sql} '
+            f'{ops.on_conflict_suffix_sql(campos, on_conflict, None, None) or ""}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def criar_campanha(nome, tipo_mensagem, template, segmento):
+    """
+    Cria a campanha e todas as suas mensagens 'pendente' de uma vez
+    (inserir_mensagens). O envio fica para os workers (iniciar_envio),
+    então a criação volta na hora mesmo com 50 mil mensagens.
+    """
+    validar_template(template)
+    with transaction.atomic():
+        campanha = Campanha.objects.create(
+            nome=nome, tipoMensagem=tipo_mensagem, template=template, segmento=segmento
+        )
+        campanha.total = inserir_mensagens(associados_do_segmento(segmento), tipo_mensagem, template, campanha.pk)
+        Campanha.objects.filter(pk=campanha.pk).update(total=campanha.total)
+        transaction.on_commit(lambda: iniciar_envio(campanha.pk))
+    return campanha
+
+
+# =================== ENVIO ===================
+
+def _worker(campanha_id):
+    try:
+        enviadas, erros = fila.drenar(campanha_id)
+        logger.info(f"Campanha {campanha_id}: {enviadas} enviadas, {erros} erros")
+    except Exception:
+        logger.exception(f"Falha no envio da campanha {campanha_id}")
+    finally:
+        connection.close()  # cada thread tem a sua conexão
+
+
+def iniciar_envio(campanha_id):
+    """
+    Dispara CAMPANHA_WORKERS threads em segundo plano para a campanha; elas
+    dividem as mensagens pela reserva com SKIP LOCKED (fila.reservar).
+    Com 0, nada é enviado aqui: as pendentes ficam para o processar_mensagens.
+    """
+    for numero in range(settings.CAMPANHA_WORKERS):
+        threading.Thread(
+            target=_worker, args=(campanha_id,),
+            name=f'campanha-{campanha_id}-{numero}', daemon=True,
+        ).start()
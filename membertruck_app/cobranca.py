@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from .campanhas import associados_do_segmento, inserir_mensagens, validar_template
+from .models import Campanha, Checkpoint
+
+
+def _referencia(tipo):
+    """Chave da cobrança: tipo + vencimento ('vencido:2025-01-10'). Novo vencimento, nova cobrança"""
+    return Concat(Value(f'{tipo}:'), Cast('dataPagamentoAsso', CharField()), output_field=CharField())
+
+
+def gerar_cobrancas(hoje=None, completo=False):
+    """
+    Gera as mensagens de cobrança do dia: aviso para quem vence nos próximos
+    COBRANCA_ANTECEDENCIA dias e cobrança para quem já venceu (com plano).
+
+    É incremental: a partir do checkpoint só entram os associados cujo estado
+    mudou desde a última execução (entraram na janela de aviso, venceram,
+    ou foram alterados depois dela), por faixas no índice de dataPagamentoAsso
+    e de updated_at. Cada tipo é um INSERT ... SELECT com ON CONFLICT DO
+    NOTHING na referência (tipo + vencimento), então reprocessar um dia, ou
+    rodar com completo=True, não repete cobrança.
+
+    Só enfileira: quem envia é o processar_mensagens (reserva com SKIP
+    LOCKED). O cron não abre threads de envio, que morreriam com ele.
+    """
+    hoje = hoje or timezone.localdate()
+    inicio = timezone.now()
+    antecedencia = timedelta(days=settings.COBRANCA_ANTECEDENCIA)
+    for template in (settings.COBRANCA_TEMPLATE_AVISO, settings.COBRANCA_TEMPLATE_VENCIDO):
+        validar_template(template)
+
+    with transaction.atomic():
+        # Trava o checkpoint: duas execuções simultâneas não processam o mesmo intervalo
+        checkpoint, _ = Checkpoint.objects.select_for_update().get_or_create(nome='cobranca')
+
+        base = associados_do_segmento({}).filter(idPlanAsso__isnull=False)
+        a_vencer = base.filter(dataPagamentoAsso__gte=hoje, dataPagamentoAsso__lte=hoje + antecedencia)
+        vencidos = base.filter(dataPagamentoAsso__lt=hoje)
+        if checkpoint.dataReferencia and not completo:
+            ultima = checkpoint.dataReferencia
+            alterados = Q(updated_at__gt=checkpoint.executadoEm)
+            # Entraram na janela de aviso / venceram desde a última execução
+            a_vencer = a_vencer.filter(Q(dataPagamentoAsso__gt=ultima + antecedencia) | alterados)
+            vencidos = vencidos.filter(Q(dataPagamentoAsso__gte=ultima) | alterados)
+
+        resultado = {}
+        for tipo, associados, template, nome, segmento in (
+            ('aviso', a_vencer, settings.COBRANCA_TEMPLATE_AVISO, 'a vencer', {}),
+            ('vencido', vencidos, settings.COBRANCA_TEMPLATE_VENCIDO, 'vencidos', {'inadimplente': True}),
+        ):
+            campanha = Campanha.objects.create(
+                nome=f'Cobrança automática {hoje:%d/%m/%Y}: {nome}',
+                tipoMensagem='cobranca', template=template, segmento=segmento,
+            )
+            total = inserir_mensagens(associados, 'cobranca', template, campanha.pk, _referencia(tipo))
+            if total:
+                Campanha.objects.filter(pk=campanha.pk).update(total=total)
+            else:
+                campanha.delete()
+            resultado[tipo] = total
+
+        checkpoint.dataReferencia = hoje
+        checkpoint.executadoEm = inicio
+        checkpoint.save()
+    return resultado
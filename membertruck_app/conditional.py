@@ -0,0 +1,125 @@
+import hashlib
+import time
+
+from django.db.models import Count, Max
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .serializers import _query_paths
+
+CAMPO_VERSAO = 'updated_at'
+
+
+def _model_do_caminho(model, path):
+    for attr in path.split(LOOKUP_SEP):
+        model = model._meta.get_field(attr).related_model
+    return model
+
+
+def _tem_versao(model):
+    return any(field.name == CAMPO_VERSAO for field in model._meta.concrete_fields)
+
+
+def caminhos_de_versao(serializer, model):
+    """
+    Lookups de updated_at de todas as tabelas que aparecem na resposta do
+    serializer (a própria, as relações do select_related e os prefetches).
+    """
+    caminhos = [CAMPO_VERSAO] if _tem_versao(model) else []
+    _, select, prefetch = _query_paths(serializer, model)
+    for path in sorted(select) + sorted(prefetch):
+        if _tem_versao(_model_do_caminho(model, path)):
+            caminhos.append(f'{path}{LOOKUP_SEP}{CAMPO_VERSAO}')
+    return caminhos
+
+
+def _agregados(caminhos):
+    return {'_total': Count('pk', distinct=True), **{f'_v{i}': Max(path) for i, path in enumerate(caminhos)}}
+
+
+def _total_e_data(valores):
+    total = valores.pop('_total')
+    datas = [data for data in valores.values() if data is not None]
+    return total, max(datas) if datas else None
+
+
+def versao(queryset, caminhos):
+    """
+    (quantidade, última alteração) das linhas do queryset em uma consulta de
+    agregação: nenhuma linha é carregada nem serializada.
+    """
+    return _total_e_data(queryset.order_by().aggregate(**_agregados(caminhos)))
+
+
+async def aversao(queryset, caminhos):
+    """versao() pelo ORM assíncrono"""
+    return _total_e_data(await queryset.order_by().aaggregate(**_agregados(caminhos)))
+
+
+def validadores(url, formato, total, modificado, with_last_modified=True):
+    """
+    ETag e Last-Modified (timestamp ou None) de uma resposta com essa versão.
+
+    O ETag usa o Max(updated_at) com microssegundos e a quantidade de linhas.
+    O Last-Modified só tem resolução de segundo: se a última alteração é do
+    segundo corrente, outra edição no mesmo segundo não o mudaria e um
+    If-Modified-Since devolveria 304 com o dado antigo, então ele é omitido
+    até o segundo virar (o ETag continua valendo).
+    """
+    # A URL (com ?fields=, cursor, ...) e o formato também mudam o corpo
+    chave = '|'.join([url, formato, str(total), modificado.isoformat(timespec='microseconds') if modificado else ''])
+    etag = quote_etag(hashlib.sha1(chave.encode()).hexdigest())
+    last_modified = None
+    if modificado and with_last_modified:
+        last_modified = int(modificado.timestamp())
+        if last_modified >= int(time.time()):
+            last_modified = None
+    return etag, last_modified
+
+
+def aplicar_validadores(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag forte + Last-Modified, 304 Not Modified).
+
+    A versão vem de um aggregate sobre os updated_at das linhas que compõem
+    a resposta; se o cliente já tem essa versão, responde 304 sem carregar
+    a linha inteira nem serializar. Listas só recebem ETag: uma exclusão
+    muda a quantidade, mas não necessariamente a data mais recente.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        total, modificado = versao(queryset, self._caminhos_de_versao())
+        if not total:
+            return super().retrieve(request, *args, **kwargs)  # 404 padrão
+        return self._condicional(request, total, modificado, super().retrieve, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        total, modificado = versao(queryset, self._caminhos_de_versao())
+        return self._condicional(request, total, modificado, super().list, *args, with_last_modified=False, **kwargs)
+
+    def _caminhos_de_versao(self):
+        return caminhos_de_versao(self.get_serializer(), self.get_queryset().model)
+
+    def _condicional(self, request, total, modificado, handler, *args, with_last_modified=True, **kwargs):
+        etag, last_modified = validadores(
+            request.build_absolute_uri(), request.accepted_renderer.format, total, modificado, with_last_modified
+        )
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return aplicar_validadores(response, etag, last_modified)
@@ -0,0 +1,69 @@
+import threading
+from collections import defaultdict
+
+from django.db import connections
+
+# Conexões abertas por este processo, por alias. Com conexões persistentes ou
+# pool o número estabiliza; crescendo junto com as requisições, não há reuso
+_abertas = defaultdict(int)
+_abertas_lock = threading.Lock()
+
+
+def registrar_abertura(alias):
+    with _abertas_lock:
+        _abertas[alias] += 1
+
+
+def resumo_pool(stats, aberto=True):
+    """
+    Saturação e espera do pool a partir de ConnectionPool.get_stats() (contadores
+    acumulados desde o início do processo). O pool só abre na primeira consulta
+    do processo; antes disso o tamanho informado é o mínimo, sem conexões em uso.
+    """
+    maximo = stats.get('pool_max', 0)
+    em_uso = stats.get('pool_size', 0) - stats.get('pool_available', 0) if aberto else 0
+    enfileiradas = stats.get('requests_queued', 0)
+    espera_ms = stats.get('requests_wait_ms', 0)
+    return {
+        'aberto': aberto,
+        'minimo': stats.get('pool_min', 0),
+        'maximo': maximo,
+        'abertas': stats.get('pool_size', 0) if aberto else 0,
+        'livres': stats.get('pool_available', 0),
+        'em_uso': em_uso,
+        'saturacao': round(em_uso / maximo, 4) if maximo else None,
+        'aguardando': stats.get('requests_waiting', 0),
+        'requisicoes': stats.get('requests_num', 0),
+        'enfileiradas': enfileiradas,
+        'espera_total_ms': espera_ms,
+        'espera_media_ms': round(espera_ms / enfileiradas, 2) if enfileiradas else 0,
+        'timeouts': stats.get('requests_errors', 0),
+    }
+
+
+def estatisticas():
+    """Modo de conexão de cada banco neste processo e, no modo pool, saturação e espera"""
+    resultado = {}
+    for alias in connections:
+        conexao = connections[alias]
+        config = conexao.settings_dict
+        # Só o backend PostgreSQL tem pool; é None quando OPTIONS não define 'pool'
+        pool = getattr(conexao, 'pool', None)
+        conn_max_age = config.get('CONN_MAX_AGE', 0)
+        if pool is not None:
+            modo = 'pool'
+        elif conn_max_age is None or conn_max_age > 0:
+            modo = 'persistente'
+        else:
+            modo = 'por_requisicao'
+
+        with _abertas_lock:
+            abertas = _abertas[alias]
+        resultado[alias] = {
+            'modo': modo,
+            'conn_max_age': conn_max_age,
+            'health_checks': config.get('CONN_HEALTH_CHECKS', False),
+            'conexoes_abertas': abertas,
+            'pool': resumo_pool(pool.get_stats(), not pool.closed) if pool is not None else None,
+        }
+    return resultado
@@ -0,0 +1,66 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Associado, Contador, Funcionario, Veiculo
+
+CONTADORES = ('associados', 'funcionarios', 'gestores', 'consultores', 'veiculos')
+
+
+def calcular():
+    """Conta as tabelas de verdade: um aggregate com Count(filter=...) por tabela"""
+    totais = Funcionario.objects.aggregate(
+        funcionarios=Count('pk'),
+        gestores=Count('pk', filter=Q(is_gestor=True)),
+        consultores=Count('pk', filter=Q(is_gestor=False)),
+    )
+    totais['associados'] = Associado.objects.count()
+    totais['veiculos'] = Veiculo.objects.count()
+    return totais
+
+
+def recalcular():
+    """Regrava todos os contadores a partir das tabelas (carga inicial ou correção de desvio)"""
+    totais = calcular()
+    Contador.objects.bulk_create(
+        [Contador(nome=nome, valor=valor) for nome, valor in totais.items()],
+        update_conflicts=True,
+        unique_fields=['nome'],
+        update_fields=['valor'],
+    )
+    return totais
+
+
+def incrementar(**deltas):
+    """
+    Soma os deltas aos contadores (ex.: incrementar(associados=1)) no commit
+    da transação atual; no rollback não soma nada.
+
+    Os UPDATEs ficam fora da transação de quem chamou: senão a linha de cada
+    contador ficaria travada até o commit, enfileirando todas as escritas
+    concorrentes de associados/veículos/funcionários, e caminhos que tocam os
+    contadores em ordens diferentes (importação: associados e veículos;
+    exclusão em cascata: veículos e depois associados) poderiam se travar
+    (deadlock). Cada contador é um UPDATE atômico de uma linha, em ordem de
+    nome. Se o processo cair entre o commit e o UPDATE, o recalcular_contadores corrige.
+    """
+    deltas = {nome: delta for nome, delta in sorted(deltas.items()) if delta}
+    if deltas:
+        transaction.on_commit(partial(_aplicar, deltas))
+
+
+def _aplicar(deltas):
+    """Se algum contador ainda não existe, recalcula todos, o que já inclui a mudança"""
+    for nome, delta in deltas.items():
+        if not Contador.objects.filter(nome=nome).update(valor=F('valor') + delta):
+            recalcular()
+            return
+
+
+def ler():
+    """Lê todos os contadores em uma única consulta pela PK"""
+    valores = dict(Contador.objects.filter(nome__in=CONTADORES).values_list('nome', 'valor'))
+    if len(valores) < len(CONTADORES):
+        return recalcular()
+    return valores
@@ -0,0 +1,96 @@
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DesempenhoConsultor, Funcionario
+
+METRICAS = ('associados', 'em_dia', 'vencidos', 'novos', 'comissao')
+
+
+def calcular(inicio, fim, gestor_id=None, hoje=None):
+    """
+    Desempenho atual dos consultores em um único SELECT ... GROUP BY:
+    indicados ativos, em dia e vencidos (pagamento em relação a `hoje`),
+    novos (ativados entre inicio e fim) e comissão devida.
+
+    A comissão é comissaoFunc por associado em dia (o plano não tem valor).
+    """
+    hoje = hoje or timezone.localdate()
+    ativos = Q(associados_indicados__idPessAsso__is_active=True)
+    consultores = Funcionario.objects.filter(is_gestor=False)
+    if gestor_id is not None:
+        consultores = consultores.filter(gestor_id=gestor_id)
+
+    linhas = consultores.values(
+        'idFunc', 'comissaoFunc', nome=F('idPessFunc__nomePess'), idGestor=F('gestor'),
+    ).annotate(
+        associados=Count('associados_indicados', filter=ativos),
+        em_dia=Count('associados_indicados', filter=ativos & Q(associados_indicados__dataPagamentoAsso__gte=hoje)),
+        vencidos=Count('associados_indicados', filter=ativos & Q(associados_indicados__dataPagamentoAsso__lt=hoje)),
+        novos=Count('associados_indicados', filter=Q(associados_indicados__dataAtivacaoAsso__range=(inicio, fim))),
+    ).order_by('idFunc')
+
+    resultado = []
+    for linha in linhas:
+        comissao_unitaria = linha.pop('comissaoFunc') or 0
+        resultado.append({**linha, 'comissao': round(comissao_unitaria * linha['em_dia'], 2)})
+    return resultado
+
+
+def historico(inicio, fim, gestor_id=None):
+    """
+    O mesmo relatório lido das fotos diárias, também num GROUP BY: a posição
+    (indicados, em dia, vencidos, comissão) é a do dia `fim` e os novos
+    somam as fotos do período.
+    """
+    fotos = DesempenhoConsultor.objects.filter(data__range=(inicio, fim))
+    if gestor_id is not None:
+        fotos = fotos.filter(gestor_id=gestor_id)
+
+    no_fim = Q(data=fim)
+    return list(fotos.values(
+        idFunc=F('consultor'), nome=F('consultor__idPessFunc__nomePess'),
+    ).annotate(
+        idGestor=Max('gestor', filter=no_fim),
+        associados=Coalesce(Sum('associados', filter=no_fim), 0),
+        em_dia=Coalesce(Sum('em_dia', filter=no_fim), 0),
+        vencidos=Coalesce(Sum('vencidos', filter=no_fim), 0),
+        novos=Sum('novos'),
+        comissao=Coalesce(Sum('comissao', filter=no_fim), 0.0),
+    ).order_by('idFunc'))
+
+
+def ranking(linhas):
+    """Ordena pelos novos no período (depois indicados ativos) e numera as posições"""
+    linhas = sorted(linhas, key=lambda linha: (-linha['novos'], -linha['associados'], linha['idFunc']))
+    for posicao, linha in enumerate(linhas, 1):
+        linha['posicao'] = posicao
+    return linhas
+
+
+def totais(linhas):
+    soma = {metrica: sum(linha[metrica] for linha in linhas) for metrica in METRICAS}
+    soma['comissao'] = round(soma['comissao'], 2)
+    return soma
+
+
+def gravar_snapshot(data=None):
+    """
+    Grava (ou regrava) a foto do dia: um INSERT ... ON CONFLICT DO UPDATE por
+    consultor. Reflete o estado atual, então deve rodar no fim do dia.
+    """
+    data = data or timezone.localdate()
+    fotos = [
+        DesempenhoConsultor(
+            data=data, consultor_id=linha['idFunc'], gestor_id=linha['idGestor'],
+            **{metrica: linha[metrica] for metrica in METRICAS},
+        )
+        for linha in calcular(data, data, hoje=data)
+    ]
+    DesempenhoConsultor.objects.bulk_create(
+        fotos,
+        update_conflicts=True,
+        unique_fields=['data', 'consultor'],
+        update_fields=['gestor', *METRICAS],
+    )
+    return len(fotos)
@@ -0,0 +1,145 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import MensagemWhatsApp
+from .whatsapp import ErroEnvio, limite, obter_remetente
+
+logger = logging.getLogger('membertruck_app')
+
+
+def reservar(quantidade, campanha_id=None):
+    """
+    Reserva até `quantidade` mensagens prontas para envio.
+
+    SELECT ... FOR UPDATE SKIP LOCKED pelo índice parcial das pendentes:
+    workers em paralelo pegam lotes diferentes sem esperar uns pelos outros.
+    Na mesma transação a proximaTentativa avança WHATSAPP_VISIBILIDADE
+    segundos, então a reserva sobrevive ao commit e, se o worker morrer, a
+    mensagem volta para a fila sozinha quando esse prazo vence.
+    """
+    agora = timezone.now()
+    prontas = MensagemWhatsApp.objects.filter(status='pendente', proximaTentativa__lte=agora)
+    if campanha_id is not None:
+        prontas = prontas.filter(campanha_id=campanha_id)
+
+    with transaction.atomic():
+        ids = list(
+            prontas.order_by('proximaTentativa')
+            .select_for_update(skip_locked=True)
+            .values_list('idMensagem', flat=True)[:quantidade]
+        )
+        if not ids:
+            return []
+        MensagemWhatsApp.objects.filter(pk__in=ids).update(
+            proximaTentativa=agora + timedelta(seconds=settings.WHATSAPP_VISIBILIDADE),
+            tentativas=F('tentativas') + 1,
+        )
+
+    return list(
+        MensagemWhatsApp.objects.filter(pk__in=ids).order_by('idMensagem')
+        .values_list('idMensagem', 'associado__idPessAsso__telefonePess', 'conteudo', 'tentativas')
+    )
+
+
+def espera_retentativa(tentativas):
+    """Backoff exponencial: WHATSAPP_BACKOFF, 2x, 4x, ... até WHATSAPP_BACKOFF_MAX segundos"""
+    return min(settings.WHATSAPP_BACKOFF * 2 ** (tentativas - 1), settings.WHATSAPP_BACKOFF_MAX)
+
+
+def processar(lote, remetente):
+    """
+    Envia um lote reservado e grava o resultado: enviadas num UPDATE, falhas
+    definitivas (ou na última tentativa) em 'erro' e as demais de volta à fila
+    com backoff (um UPDATE por número de tentativas). Devolve (enviadas, erros).
+
+    Erros inesperados (bug no remetente, rede, Redis) contam como falha
+    temporária da mensagem e o lote segue; o que já foi enviado é gravado
+    mesmo se o lote for interrompido, para não ser reenviado quando a
+    reserva vencer.
+    """
+    enviadas, falhas = [], []
+    try:
+        for id_mensagem, telefone, conteudo, tentativas in lote:
+            try:
+                limite.aguardar()
+                remetente.enviar(telefone, conteudo)
+            except ErroEnvio as e:
+                definitiva = e.permanente or tentativas >= settings.WHATSAPP_MAX_TENTATIVAS
+                falhas.append((id_mensagem, tentativas, str(e), definitiva))
+            except Exception as e:
+                logger.exception(f"Erro inesperado ao enviar a mensagem {id_mensagem}")
+                definitiva = tentativas >= settings.WHATSAPP_MAX_TENTATIVAS
+                falhas.append((id_mensagem, tentativas, f'Erro inesperado: {e}', definitiva))
+            else:
+                enviadas.append(id_mensagem)
+    finally:
+        erros = _gravar(enviadas, falhas)
+    return len(enviadas), erros
+
+
+def _gravar(enviadas, falhas):
+    """Grava o resultado do lote; devolve quantas mensagens foram para 'erro'"""
+    # dataEnvio passa a ser o momento do envio (é o que o dashboard conta como "enviadas hoje")
+    agora = timezone.now()
+    if enviadas:
+        MensagemWhatsApp.objects.filter(pk__in=enviadas).update(
+            status='enviada', dataEnvio=agora, updated_at=agora, ultimoErro=None
+        )
+
+    grupos = {}
+    for id_mensagem, tentativas, erro, definitiva in falhas:
+        grupos.setdefault((definitiva, tentativas, erro), []).append(id_mensagem)
+
+    erros = 0
+    for (definitiva, tentativas, erro), ids in grupos.items():
+        if definitiva:
+            erros += len(ids)
+            logger.warning(f"Mensagens {ids} em erro após {tentativas} tentativa(s): {erro}")
+            MensagemWhatsApp.objects.filter(pk__in=ids).update(status='erro', ultimoErro=erro, updated_at=agora)
+        else:
+            MensagemWhatsApp.objects.filter(pk__in=ids).update(
+                proximaTentativa=agora + timedelta(seconds=espera_retentativa(tentativas)),
+                ultimoErro=erro, updated_at=agora,
+            )
+    return erros
+
+
+def drenar(campanha_id=None, quantidade=None, remetente=None):
+    """Processa lotes até não haver mensagens prontas. Devolve (enviadas, erros)"""
+    remetente = remetente or obter_remetente()
+    quantidade = quantidade or settings.CAMPANHA_LOTE
+    total_enviadas = total_erros = 0
+    while lote := reservar(quantidade, campanha_id):
+        enviadas, erros = processar(lote, remetente)
+        total_enviadas += enviadas
+        total_erros += erros
+    return total_enviadas, total_erros
+
+
+def metricas(janela=60):
+    """
+    Estado da fila: profundidade (pendentes, das quais prontas e aguardando
+    reserva vencer ou backoff), idade da pendente mais antiga e vazão em mensagens/segundo
+    na última `janela` de segundos (enviadas por dataEnvio, via índice).
+    """
+    agora = timezone.now()
+    fila = MensagemWhatsApp.objects.filter(status='pendente').aggregate(
+        pendentes=Count('pk'),
+        prontas=Count('pk', filter=Q(proximaTentativa__lte=agora)),
+        aguardando=Count('pk', filter=Q(proximaTentativa__gt=agora)),
+        mais_antiga=Min('dataEnvio'),
+    )
+    enviadas = MensagemWhatsApp.objects.filter(
+        status='enviada', dataEnvio__gte=agora - timedelta(seconds=janela), dataEnvio__lte=agora
+    ).count()
+    mais_antiga = fila.pop('mais_antiga')
+    return {
+        **fila,
+        'idade_mais_antiga_segundos': round((agora - mais_antiga).total_seconds(), 1) if mais_antiga else None,
+        'mensagens_por_segundo': round(enviadas / janela, 2),
+    }
@@ -0,0 +1,139 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Associado, Funcionario, Pessoa, Veiculo
+
+logger = logging.getLogger('membertruck_app')
+
+CHAVE_VERSAO = 'hierarquia:versao'
+
+
+def _sql():
+    """
+    Uma consulta só: o CTE recursivo desce pela relação gestor -> subordinados
+    (índice de Funcionario.gestor) e os dois CTEs de agregação contam, por
+    funcionário da árvore, associados indicados e os veículos deles.
+    """
+    qn = connection.ops.quote_name
+
+    def coluna(model, campo):
+        return qn(model._meta.get_field(campo).column)
+
+    tabela = {model: qn(model._meta.db_table) for model in (Funcionario, Associado, Veiculo, Pessoa)}
+    func_id, func_gestor = coluna(Funcionario, 'idFunc'), coluna(Funcionario, 'gestor')
+    consultor = coluna(Associado, 'consultor')
+    return f"""
+        WITH RECURSIVE arvore (id, gestor, nivel) AS (
+            SELECT {func_id}, {func_gestor}, 0 FROM {tabela[Funcionario]} WHERE {func_id} = %s
+            UNION ALL
+            SELECT f.{func_id}, f.{func_gestor}, arvore.nivel + 1
+            FROM {tabela[Funcionario]} f INNER JOIN arvore ON f.{func_gestor} = arvore.id
+            WHERE arvore.nivel < %s
+        ),
+        associados (id, total) AS (
+            SELECT a.{consultor}, COUNT(*)
+            FROM {tabela[Associado]} a
+            WHERE a.{consultor} IN (SELECT id FROM arvore)
+            GROUP BY a.{consultor}
+        ),
+        veiculos (id, total) AS (
+            SELECT a.{consultor}, COUNT(*)
+            FROM {tabela[Veiculo]} v
+            INNER JOIN {tabela[Associado]} a ON v.{coluna(Veiculo, 'associado')} = a.{coluna(Associado, 'idAsso')}
+            WHERE a.{consultor} IN (SELECT id FROM arvore)
+            GROUP BY a.{consultor}
+        )
+        SELECT arvore.id, arvore.gestor, arvore.nivel, p.{coluna(Pessoa, 'nomePess')},
+               f.{coluna(Funcionario, 'is_gestor')}, COALESCE(associados.total, 0), COALESCE(veiculos.total, 0)
+        FROM arvore
+        INNER JOIN {tabela[Funcionario]} f ON f.{func_id} = arvore.id
+        INNER JOIN {tabela[Pessoa]} p ON p.{coluna(Pessoa, 'idPess')} = f.{coluna(Funcionario, 'idPessFunc')}
+        LEFT JOIN associados ON associados.id = arvore.id
+        LEFT JOIN veiculos ON veiculos.id = arvore.id
+        ORDER BY arvore.nivel, p.{coluna(Pessoa, 'nomePess')}, arvore.id
+    """
+
+
+def calcular(gestor_id):
+    """
+    Árvore completa abaixo do funcionário (None se ele não existe). Cada nó
+    traz os associados/veículos próprios e os totais da sua subárvore.
+    HIERARQUIA_MAX_NIVEIS limita a profundidade (protege contra ciclos).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(), [gestor_id, settings.HIERARQUIA_MAX_NIVEIS])
+        linhas = cursor.fetchall()
+
+    nos = {}
+    for id_func, gestor, nivel, nome, is_gestor, associados, veiculos in linhas:
+        if id_func in nos or (nivel and nos.get(gestor, {}).get('nivel') != nivel - 1):
+            continue  # ciclo na relação gestor: o funcionário (ou seu gestor) já está na árvore
+        nos[id_func] = {
+            'idFunc': id_func, 'nome': nome, 'is_gestor': bool(is_gestor), 'nivel': nivel,
+            'associados': associados, 'veiculos': veiculos,
+            'total_associados': associados, 'total_veiculos': veiculos,
+            'subordinados': [],
+        }
+        if nivel:
+            nos[gestor]['subordinados'].append(nos[id_func])
+
+    # Linhas em ordem de nível: de trás para frente, os filhos somam antes dos pais
+    for no in reversed(list(nos.values())):
+        for filho in no['subordinados']:
+            no['total_associados'] += filho['total_associados']
+            no['total_veiculos'] += filho['total_veiculos']
+    return nos.get(gestor_id)
+
+
+def contem(no, funcionario_id):
+    """Se o funcionário é o nó ou está em algum nível abaixo dele"""
+    if no is None:
+        return False
+    return no['idFunc'] == funcionario_id or any(contem(filho, funcionario_id) for filho in no['subordinados'])
+
+
+# =================== CACHE ===================
+
+def _versao():
+    atual = cache.get(CHAVE_VERSAO)
+    if atual is None:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+        atual = cache.get(CHAVE_VERSAO)
+    return atual
+
+
+def invalidar():
+    """Descarta todas as árvores em cache (trocando a versão)"""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, time.time_ns(), None)
+    except Exception as e:
+        logger.warning(f"Falha ao invalidar cache da hierarquia: {e}")
+
+
+def arvore(gestor_id):
+    """
+    calcular() com cache até a hierarquia mudar: alterações em Funcionario,
+    Associado ou Veiculo (signals e operações em lote) trocam a versão.
+    HIERARQUIA_CACHE_TTL cobre o que não passa por elas (ex.: nome da Pessoa).
+    Sem Redis, calcula direto do banco.
+    """
+    try:
+        chave = f'hierarquia:{_versao()}:{gestor_id}'
+        dados = cache.get(chave)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para a hierarquia: {e}")
+        return calcular(gestor_id)
+
+    if dados is None:
+        dados = calcular(gestor_id)
+        try:
+            cache.set(chave, dados, settings.HIERARQUIA_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar hierarquia no cache: {e}")
+    return dados
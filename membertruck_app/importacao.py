@@ -0,0 +1,266 @@
+import csv
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import IntegrityError, transaction
+
+from . import contadores, hierarquia
+from .models import Pessoa, Plano, Funcionario, Associado, Veiculo
+from .placas import chave_mercosul
+from .serializers import AssociadoImportacaoSerializer
+
+# Colunas do CSV que descrevem o veículo (um por linha; o JSON aceita a lista 'veiculos')
+COLUNAS_VEICULO = ('nomeVeic', 'anoVeic', 'placaVeic')
+
+# Campos únicos de Pessoa conferidos contra o banco e dentro do próprio arquivo
+CAMPOS_UNICOS = ('usuarioPess', 'emailPess', 'documentoPess')
+
+
+class ErroImportacao(Exception):
+    """Arquivo/corpo que não pode ser lido como lista de associados"""
+
+
+# =================== LEITURA ===================
+
+def ler_csv(arquivo):
+    """
+    Lê o CSV enviado (UTF-8, separador ',' ou ';') em uma lista de dicts.
+    Células vazias são omitidas para valerem como campo não informado.
+    """
+    try:
+        texto = arquivo.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ErroImportacao('O CSV deve estar em UTF-8')
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+
+    linhas = []
+    for registro in csv.DictReader(io.StringIO(texto), dialect=dialeto):
+        linha = {campo.strip(): valor.strip() for campo, valor in registro.items() if campo and valor and valor.strip()}
+        veiculo = {campo: linha.pop(campo) for campo in COLUNAS_VEICULO if campo in linha}
+        if veiculo:
+            linha['veiculos'] = [veiculo]
+        linhas.append(linha)
+    return linhas
+
+
+def ler_linhas(request):
+    """
+    Linhas da importação: arquivo CSV em 'arquivo' (multipart) ou lista JSON
+    no corpo. Devolve (linhas, número da primeira): no CSV a 1ª é o cabeçalho.
+    """
+    primeira = 1
+    if 'arquivo' in request.FILES:
+        linhas, primeira = ler_csv(request.FILES['arquivo']), 2
+    else:
+        linhas = request.data
+        if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+            raise ErroImportacao('Envie uma lista JSON de associados ou um CSV no campo "arquivo"')
+
+    if not linhas:
+        raise ErroImportacao('Nenhuma linha para importar')
+    if len(linhas) > settings.IMPORTACAO_MAX_LINHAS:
+        raise ErroImportacao(
+            f'Máximo de {settings.IMPORTACAO_MAX_LINHAS} linhas por importação pela API; '
+            'arquivos maiores: manage.py importar_associados'
+        )
+    return linhas, primeira
+
+
+# =================== VALIDAÇÃO ===================
+
+def _existentes(model, campo, valores):
+    """Valores de `campo` que já existem no banco (IN em lotes, uma consulta por lote)"""
+    valores, existentes, lote = list(valores), set(), settings.IMPORTACAO_LOTE
+    for inicio in range(0, len(valores), lote):
+        existentes.update(
+            model.objects.filter(**{f'{campo}__in': valores[inicio:inicio + lote]}).values_list(campo, flat=True)
+        )
+    return existentes
+
+
+def _marcar_duplicados(validas, erros, chave, campo, mensagem_banco, existentes):
+    """Registra o erro em `campo` nas linhas cuja chave já existe no banco ou se repete no arquivo"""
+    vistos = {}
+    for numero, dados in validas.items():
+        for valor in chave(dados):
+            if valor in existentes:
+                erros.setdefault(numero, {}).setdefault(campo, []).append(mensagem_banco)
+            elif valor in vistos:
+                erros.setdefault(numero, {}).setdefault(campo, []).append(
+                    f'Repetido no arquivo (linha {vistos[valor]})'
+                )
+            else:
+                vistos[valor] = numero
+
+
+def validar(linhas, primeira_linha=1):
+    """
+    Valida todas as linhas antes de gravar qualquer uma.
+
+    Devolve (validas, erros): validas é {número da linha: validated_data}
+    e erros é {número da linha: erros por campo}. Planos, consultores e
+    unicidade (usuário, e-mail, documento, placa) são conferidos com
+    poucas consultas para o arquivo inteiro, não uma por linha.
+    """
+    contexto = {
+        'planos': set(Plano.objects.values_list('pk', flat=True)),
+        'consultores': set(Funcionario.objects.filter(is_gestor=False).values_list('pk', flat=True)),
+    }
+
+    validas, erros = {}, {}
+    for numero, linha in enumerate(linhas, start=primeira_linha):
+        serializer = AssociadoImportacaoSerializer(data=linha, context=contexto)
+        if serializer.is_valid():
+            validas[numero] = serializer.validated_data
+        else:
+            erros[numero] = serializer.errors
+
+    for campo in CAMPOS_UNICOS:
+        valores = {dados[campo] for dados in validas.values() if dados.get(campo)}
+        _marcar_duplicados(
+            validas, erros, lambda dados: [dados[campo]] if dados.get(campo) else [],
+            campo, 'Já cadastrado', _existentes(Pessoa, campo, valores),
+        )
+
+    def placas(dados):
+        return [chave_mercosul(veiculo['placaVeic']) for veiculo in dados.get('veiculos', [])]
+
+    chaves = {chave for dados in validas.values() for chave in placas(dados)}
+    _marcar_duplicados(
+        validas, erros, placas, 'veiculos', 'Já existe um veículo com esta placa',
+        _existentes(Veiculo, 'placaMercosulVeic', chaves),
+    )
+
+    for numero in erros:
+        validas.pop(numero, None)
+    return validas, erros
+
+
+# =================== GRAVAÇÃO ===================
+
+# Pool do hash das senhas: criado na primeira importação grande e reaproveitado nas
+# seguintes, então cada processo do gunicorn sobe os seus processos de hash uma vez só
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    return settings.IMPORTACAO_WORKERS or min(os.cpu_count() or 1, 4)
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': um fork do worker copiaria conexões abertas com o banco/Redis e locks de outras threads
+            _pool = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _descartar_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def hash_senhas(senhas):
+    """
+    Hash das senhas iniciais com o hasher padrão (PASSWORD_HASHERS). O PBKDF2
+    é CPU puro, então com várias senhas o trabalho é dividido entre os
+    IMPORTACAO_WORKERS processos do pool. O hasher vai pronto para eles: não
+    rodam o django.setup() e usam o mesmo do processo que chamou.
+    """
+    gerar = partial(make_password, hasher=get_hasher('default'))
+    workers = _workers()
+    if workers <= 1 or len(senhas) < 2 * workers:
+        return [gerar(senha) for senha in senhas]
+    pool = _obter_pool()
+    try:
+        return list(pool.map(gerar, senhas, chunksize=max(1, len(senhas) // (workers * 4))))
+    except BrokenProcessPool:
+        # Um processo do pool morreu (ex.: falta de memória): a próxima importação cria outro
+        _descartar_pool(pool)
+        raise
+
+
+def _gravar_lote(lote):
+    """
+    Grava um lote (já validado e com senha em hash) numa transação:
+    um bulk_create por tabela. Devolve {número da linha: idAsso}.
+    """
+    with transaction.atomic():
+        pessoas = Pessoa.objects.bulk_create([
+            Pessoa(
+                nomePess=dados['nomePess'],
+                telefonePess=dados.get('telefonePess'),
+                documentoPess=dados.get('documentoPess'),
+                nascimentoPess=dados.get('nascimentoPess'),
+                emailPess=dados.get('emailPess'),
+                usuarioPess=dados['usuarioPess'],
+                password=senha,
+                is_staff=False,  # Associados não são staff
+            )
+            for _, dados, senha in lote
+        ])
+        associados = Associado.objects.bulk_create([
+            Associado(
+                idPessAsso=pessoa,
+                dataAtivacaoAsso=dados.get('dataAtivacaoAsso'),
+                dataPagamentoAsso=dados.get('dataPagamentoAsso'),
+                idPlanAsso_id=dados.get('idPlanAsso'),
+                consultor_id=dados.get('consultor'),
+            )
+            for pessoa, (_, dados, _) in zip(pessoas, lote)
+        ])
+        # bulk_create não chama save(): a chave Mercosul é preenchida aqui
+        veiculos = Veiculo.objects.bulk_create([
+            Veiculo(
+                associado=associado,
+                nomeVeic=veiculo['nomeVeic'],
+                anoVeic=veiculo.get('anoVeic'),
+                placaVeic=veiculo['placaVeic'],
+                placaMercosulVeic=chave_mercosul(veiculo['placaVeic']),
+            )
+            for associado, (_, dados, _) in zip(associados, lote)
+            for veiculo in dados.get('veiculos', [])
+        ])
+        # Nem os signals: os contadores do dashboard são ajustados aqui (aplicados no commit)
+        contadores.incrementar(associados=len(associados), veiculos=len(veiculos))
+        transaction.on_commit(hierarquia.invalidar)
+
+    return {numero: associado.pk for (numero, _, _), associado in zip(lote, associados)}
+
+
+def importar_associados(validas):
+    """
+    Grava as linhas validadas em lotes de IMPORTACAO_LOTE, cada um em sua
+    transação. Se um lote falhar (ex.: usuário criado por outra requisição
+    no meio do caminho), as linhas dele voltam como erro e os demais seguem.
+    Devolve (criados, erros).
+    """
+    numeros = list(validas)
+    senhas = hash_senhas([validas[numero]['password'] for numero in numeros])
+    itens = [(numero, validas[numero], senha) for numero, senha in zip(numeros, senhas)]
+
+    criados, erros = {}, {}
+    tamanho = settings.IMPORTACAO_LOTE
+    for inicio in range(0, len(itens), tamanho):
+        lote = itens[inicio:inicio + tamanho]
+        try:
+            criados.update(_gravar_lote(lote))
+        except IntegrityError as e:
+            for numero, _, _ in lote:
+                erros[numero] = {'non_field_errors': [f'Lote não gravado: {e}']}
+    return criados, erros
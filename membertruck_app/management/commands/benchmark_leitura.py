@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from membertruck_app.models import Pessoa, Plano, Associado, Veiculo
+from membertruck_app.readers import ValuesReader
+from membertruck_app.serializers import AssociadoSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compara linhas/segundo do AssociadoSerializer com a leitura rápida via .values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=500, help='Associados lidos por rodada (tamanho da página)')
+        parser.add_argument('--rodadas', type=int, default=5)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Cria N associados de exemplo numa transação desfeita ao final'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self._seed(options['seed'])
+
+            linhas, rodadas = options['linhas'], options['rodadas']
+            queryset = Associado.objects.order_by('idAsso')[:linhas]
+
+            def serializer():
+                page = queryset.select_related(
+                    'idPessAsso', 'idPlanAsso', 'consultor__idPessFunc'
+                ).prefetch_related('veiculos')
+                return AssociadoSerializer(page, many=True).data
+
+            def values():
+                reader = ValuesReader(AssociadoSerializer(), Associado)
+                return reader.rows(reader.values(queryset))
+
+            resultados = {}
+            for nome, funcao in (('serializer', serializer), ('values', values)):
+                funcao()  # aquecimento
+                inicio = time.perf_counter()
+                total = sum(len(funcao()) for _ in range(rodadas))
+                duracao = time.perf_counter() - inicio
+                resultados[nome] = total / duracao if duracao else 0
+                self.stdout.write(f'{nome:>10}: {resultados[nome]:>10.0f} linhas/s ({total} linhas em {duracao:.3f}s)')
+
+            if resultados['serializer']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Ganho: {resultados["values"] / resultados["serializer"]:.1f}x'
+                ))
+            transaction.set_rollback(True)
+
+    def _seed(self, quantidade):
+        plano = Plano.objects.create(nomePlan='Plano Benchmark')
+        pessoas = Pessoa.objects.bulk_create([
+            Pessoa(usuarioPess=f'bench{i}', nomePess=f'Benchmark {i}', emailPess=f'bench{i}@exemplo.com')
+            for i in range(quantidade)
+        ])
+        associados = Associado.objects.bulk_create([
+            Associado(idPessAsso=pessoa, idPlanAsso=plano) for pessoa in pessoas
+        ])
+        # bulk_create não passa pelo save(): a chave Mercosul é preenchida aqui
+        Veiculo.objects.bulk_create([
+            Veiculo(
+                associado=associado, nomeVeic='Caminhão',
+                placaVeic=f'BEN{i:07d}', placaMercosulVeic=f'BEN{i:07d}',
+            )
+            for i, associado in enumerate(associados)
+        ])
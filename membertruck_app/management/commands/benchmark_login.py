@@ -0,0 +1,81 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from membertruck_app import ultimo_login
+from membertruck_app.models import Pessoa, Funcionario, Associado
+from membertruck_app.serializers import MyTokenObtainPairSerializer
+
+SENHA = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Compara logins/segundo e consultas por login do fluxo anterior com o atual (JWT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200, help='Usuários criados (transação desfeita ao final)')
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument(
+            '--hash-rapido', action='store_true',
+            help='Usa MD5 no lugar do PBKDF2 para medir só o custo de banco'
+        )
+
+    def handle(self, *args, **options):
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if options['hash_rapido'] else None
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})), transaction.atomic():
+            usuarios = self._seed(options['usuarios'])
+            logins = [usuarios[i % len(usuarios)] for i in range(options['logins'])]
+
+            resultados = {}
+            for nome, funcao in (('anterior', self._login_anterior), ('atual', self._login_atual)):
+                funcao(logins[0])  # aquecimento
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    for usuario in logins:
+                        funcao(usuario)
+                    ultimo_login.descarregar()  # o que ficou no buffer também conta
+                    duracao = time.perf_counter() - inicio
+                resultados[nome] = len(logins) / duracao if duracao else 0
+                self.stdout.write(
+                    f'{nome:>9}: {resultados[nome]:>8.1f} logins/s, '
+                    f'{len(consultas) / len(logins):.2f} consultas/login'
+                )
+
+            if resultados['anterior']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Ganho: {resultados["atual"] / resultados["anterior"]:.1f}x'
+                ))
+            transaction.set_rollback(True)
+
+    def _login_anterior(self, usuario):
+        """Reproduz o fluxo antigo: authenticate duas vezes, papel em duas consultas e UPDATE síncrono"""
+        for _ in range(2):  # no serializer e de novo dentro do super().validate()
+            user = Pessoa.objects.get(usuarioPess=usuario)
+            user.check_password(SENHA)
+        try:
+            Funcionario.objects.get(idPessFunc=user)
+        except Funcionario.DoesNotExist:
+            try:
+                Associado.objects.get(idPessAsso=user)
+            except Associado.DoesNotExist:
+                pass
+        update_last_login(None, user)
+
+    def _login_atual(self, usuario):
+        serializer = MyTokenObtainPairSerializer(data={'usuarioPess': usuario, 'password': SENHA})
+        serializer.is_valid(raise_exception=True)
+
+    def _seed(self, quantidade):
+        senha = make_password(SENHA)
+        pessoas = Pessoa.objects.bulk_create([
+            Pessoa(usuarioPess=f'benchlogin{i}', nomePess=f'Login {i}', password=senha)
+            for i in range(quantidade)
+        ])
+        # Um terço funcionários, um terço associados, o resto sem papel (admin)
+        Funcionario.objects.bulk_create([Funcionario(idPessFunc=pessoa) for pessoa in pessoas[0::3]])
+        Associado.objects.bulk_create([Associado(idPessAsso=pessoa) for pessoa in pessoas[1::3]])
+        return [pessoa.usuarioPess for pessoa in pessoas]
@@ -0,0 +1,159 @@
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from statistics import quantiles
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CAMINHOS = ['/api/health/', '/api/dashboard/']
+PORTAS = {'wsgi': 8101, 'asgi': 8102}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara vazão (req/s) e latência (p50/p95/p99) do gunicorn em modo WSGI e ASGI (uvicorn) '
+        'nas mesmas URLs. Sobe os dois servidores com o gunicorn.conf.py, ou usa --wsgi-url/--asgi-url.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--caminhos', nargs='+', default=CAMINHOS)
+        parser.add_argument('--concorrencia', type=int, default=50, help='Clientes simultâneos (keep-alive)')
+        parser.add_argument('--requisicoes', type=int, default=2000, help='Requisições por caminho e modo')
+        parser.add_argument('--workers', type=int, default=2, help='Workers de cada servidor iniciado aqui')
+        parser.add_argument('--usuario', help='Login usado para obter o token JWT (POST /api/login/)')
+        parser.add_argument('--senha')
+        parser.add_argument('--token', help='Token JWT já emitido (no lugar de --usuario/--senha)')
+        parser.add_argument('--wsgi-url', help='Servidor WSGI já em execução (ex.: http://localhost:8000)')
+        parser.add_argument('--asgi-url', help='Servidor ASGI já em execução')
+
+    def handle(self, *args, **options):
+        processos = []
+        try:
+            urls = {}
+            for modo in ('wsgi', 'asgi'):
+                urls[modo] = options[f'{modo}_url']
+                if not urls[modo]:
+                    processos.append(self._iniciar(modo, options['workers']))
+                    urls[modo] = f'http://127.0.0.1:{PORTAS[modo]}'
+            for url in urls.values():
+                self._aguardar(url)
+
+            token = options['token']
+            if not token and options['usuario']:
+                token = self._login(urls['wsgi'], options['usuario'], options['senha'])
+            cabecalhos = {'Authorization': f'Bearer {token}'} if token else {}
+
+            for caminho in options['caminhos']:
+                resultados = {}
+                for modo, url in urls.items():
+                    self._carga(url, caminho, cabecalhos, options['concorrencia'], options['concorrencia'])  # aquecimento
+                    resultados[modo] = self._carga(
+                        url, caminho, cabecalhos, options['requisicoes'], options['concorrencia'],
+                    )
+                    self._exibir(modo, caminho, resultados[modo])
+                if resultados['wsgi']['vazao']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{caminho}: ASGI/WSGI {resultados["asgi"]["vazao"] / resultados["wsgi"]["vazao"]:.2f}x'
+                    ))
+        finally:
+            for processo in processos:
+                processo.terminate()
+                processo.wait(timeout=10)
+
+    def _iniciar(self, modo, workers):
+        ambiente = {
+            **os.environ, 'SERVIDOR': modo, 'GUNICORN_WORKERS': str(workers),
+            'GUNICORN_BIND': f'127.0.0.1:{PORTAS[modo]}',
+        }
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn'], cwd=Path(settings.BASE_DIR), env=ambiente,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def _aguardar(self, url, limite=30):
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            try:
+                status, _ = self._requisitar(url, 'GET', '/api/health/')
+                if status < 500:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'Servidor {url} não respondeu em {limite}s')
+
+    def _login(self, url, usuario, senha):
+        status, corpo = self._requisitar(
+            url, 'POST', '/api/login/', json.dumps({'usuarioPess': usuario, 'password': senha}),
+            {'Content-Type': 'application/json'},
+        )
+        if status != 200:
+            raise CommandError(f'Login falhou ({status}): {corpo[:200]!r}')
+        return json.loads(corpo)['access']
+
+    def _requisitar(self, url, metodo, caminho, corpo=None, cabecalhos=None):
+        partes = urlsplit(url)
+        conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=10)
+        try:
+            conexao.request(metodo, caminho, corpo, cabecalhos or {})
+            resposta = conexao.getresponse()
+            return resposta.status, resposta.read()
+        finally:
+            conexao.close()
+
+    def _carga(self, url, caminho, cabecalhos, total, concorrencia):
+        """Dispara `total` GETs com `concorrencia` clientes, cada um com a sua conexão keep-alive"""
+        partes = urlsplit(url)
+        latencias, erros = [], []
+        restantes = iter(range(total))
+        trava = threading.Lock()
+
+        def cliente():
+            conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+            while True:
+                with trava:
+                    if next(restantes, None) is None:
+                        break
+                inicio = time.perf_counter()
+                try:
+                    conexao.request('GET', caminho, headers=cabecalhos)
+                    resposta = conexao.getresponse()
+                    resposta.read()
+                    ok = resposta.status < 400
+                except (OSError, http.client.HTTPException):
+                    conexao.close()
+                    conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+                    ok = False
+                duracao = time.perf_counter() - inicio
+                with trava:
+                    (latencias if ok else erros).append(duracao)
+            conexao.close()
+
+        clientes = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+        inicio = time.perf_counter()
+        for thread in clientes:
+            thread.start()
+        for thread in clientes:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        percentis = quantiles(latencias, n=100) if len(latencias) > 1 else [0] * 99
+        return {
+            'vazao': len(latencias) / duracao if duracao else 0,
+            'p50': percentis[49] * 1000, 'p95': percentis[94] * 1000, 'p99': percentis[98] * 1000,
+            'erros': len(erros),
+        }
+
+    def _exibir(self, modo, caminho, resultado):
+        self.stdout.write(
+            f'{modo} {caminho:<24} {resultado["vazao"]:>8.0f} req/s  '
+            f'p50 {resultado["p50"]:>7.1f}ms  p95 {resultado["p95"]:>7.1f}ms  p99 {resultado["p99"]:>7.1f}ms'
+            + (f'  ({resultado["erros"]} erros)' if resultado['erros'] else '')
+        )
@@ -0,0 +1,23 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from membertruck_app.aniversarios import gerar_comemorativas
+
+
+class Command(BaseCommand):
+    help = (
+        'Enfileira as mensagens comemorativas dos aniversariantes do dia. '
+        'Rodar diariamente (cron); o envio é feito pelo processar_mensagens.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, help='Dia de referência (AAAA-MM-DD); padrão: hoje')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = gerar_comemorativas(options['data'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} mensagens comemorativas enfileiradas em {time.perf_counter() - inicio:.2f}s'
+        ))
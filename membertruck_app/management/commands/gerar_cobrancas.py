@@ -0,0 +1,28 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from membertruck_app.cobranca import gerar_cobrancas
+
+
+class Command(BaseCommand):
+    help = (
+        'Enfileira as mensagens de cobrança (a vencer e vencidos) desde a última execução. '
+        'Rodar diariamente (cron); o envio é feito pelo processar_mensagens.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, help='Dia de referência (AAAA-MM-DD); padrão: hoje')
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Ignora o checkpoint e avalia todos os associados (as cobranças já geradas não se repetem)'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resultado = gerar_cobrancas(options['data'], options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['aviso']} avisos de vencimento e {resultado['vencido']} cobranças de vencidos "
+            f"em {time.perf_counter() - inicio:.2f}s"
+        ))
@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from membertruck_app import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa associados de um CSV (ou lista JSON) sem o limite de linhas da API: para arquivos '
+        'grandes, cujo hash das senhas não cabe no timeout de uma requisição.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do .csv (UTF-8, separador , ou ;) ou .json')
+        parser.add_argument('--parcial', action='store_true', help='Importa as linhas válidas mesmo havendo erros')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                if options['arquivo'].endswith('.json'):
+                    linhas, primeira = json.load(arquivo), 1
+                else:
+                    linhas, primeira = importacao.ler_csv(arquivo), 2
+        except (OSError, ValueError, importacao.ErroImportacao) as e:
+            raise CommandError(f'Arquivo inválido: {e}')
+        if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+            raise CommandError('O JSON deve ser uma lista de associados')
+
+        validas, erros = importacao.validar(linhas, primeira)
+        criados = {}
+        if validas and (options['parcial'] or not erros):
+            criados, erros_gravacao = importacao.importar_associados(validas)
+            erros.update(erros_gravacao)
+
+        for numero in sorted(erros):
+            self.stderr.write(f'linha {numero}: {json.dumps(erros[numero], ensure_ascii=False)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(criados)} de {len(linhas)} associados importados em {time.perf_counter() - inicio:.1f}s'
+        ))
@@ -0,0 +1,76 @@
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from membertruck_app import fila
+from membertruck_app.whatsapp import obter_remetente
+
+logger = logging.getLogger('membertruck_app')
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker da fila de WhatsApp: reserva lotes de mensagens pendentes com '
+        'FOR UPDATE SKIP LOCKED e envia. Vários processos podem rodar em paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=settings.CAMPANHA_LOTE, help='Mensagens reservadas por vez')
+        parser.add_argument('--campanha', type=int, help='Processa só as mensagens desta campanha')
+        parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila e sai (sem ficar esperando)')
+        parser.add_argument('--ocioso', type=float, default=1.0, help='Segundos de espera quando a fila está vazia')
+        parser.add_argument('--metricas', type=float, default=30.0, help='Intervalo (segundos) do log de métricas')
+
+    def handle(self, *args, **options):
+        self._parar = False
+        signal.signal(signal.SIGTERM, self._sinal)
+        signal.signal(signal.SIGINT, self._sinal)
+
+        remetente = obter_remetente()
+        inicio = ultimo_log = time.monotonic()
+        enviadas = erros = enviadas_intervalo = 0
+
+        while not self._parar:
+            close_old_connections()  # processo longo: descarta conexões quebradas ou vencidas
+            try:
+                lote = fila.reservar(options['lote'], options['campanha'])
+                if lote:
+                    ok, falhas = fila.processar(lote, remetente)
+                    enviadas, erros, enviadas_intervalo = enviadas + ok, erros + falhas, enviadas_intervalo + ok
+            except Exception:
+                # Um lote com problema (banco fora, bug) não derruba o worker: o que
+                # não foi gravado volta para a fila quando a reserva vencer
+                logger.exception('Falha ao processar lote da fila de WhatsApp')
+                lote = None
+            if not lote:
+                if options['uma_vez']:
+                    break
+                time.sleep(options['ocioso'])
+
+            agora = time.monotonic()
+            if agora - ultimo_log >= options['metricas']:
+                self._log_metricas(enviadas_intervalo / (agora - ultimo_log))
+                ultimo_log, enviadas_intervalo = agora, 0
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{enviadas} enviadas, {erros} em erro em {duracao:.1f}s '
+            f'({enviadas / duracao if duracao else 0:.1f} msg/s)'
+        ))
+
+    def _log_metricas(self, taxa_worker):
+        dados = fila.metricas()
+        idade = dados['idade_mais_antiga_segundos']
+        self.stdout.write(
+            f"worker: {taxa_worker:.1f} msg/s | todos: {dados['mensagens_por_segundo']} msg/s | "
+            f"fila: {dados['pendentes']} pendentes ({dados['prontas']} prontas) | "
+            f"mais antiga: {f'{idade}s' if idade is not None else '-'}"
+        )
+
+    def _sinal(self, signum, frame):
+        # Termina o lote atual (as mensagens já reservadas são gravadas) e sai
+        self._parar = True
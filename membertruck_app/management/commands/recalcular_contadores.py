@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from membertruck_app import contadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores do dashboard a partir das tabelas (corrige desvios)'
+
+    def handle(self, *args, **options):
+        for nome, valor in sorted(contadores.recalcular().items()):
+            self.stdout.write(f'{nome}: {valor}')
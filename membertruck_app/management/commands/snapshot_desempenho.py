@@ -0,0 +1,23 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from membertruck_app.desempenho import gravar_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava a foto diária do desempenho dos consultores (lida pelo relatório de períodos passados). '
+        'Rodar no fim do dia (cron): a foto reflete o estado no momento da execução.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, help='Dia da foto (AAAA-MM-DD); padrão: hoje')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = gravar_snapshot(options['data'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Desempenho de {total} consultores gravado em {time.perf_counter() - inicio:.2f}s'
+        ))
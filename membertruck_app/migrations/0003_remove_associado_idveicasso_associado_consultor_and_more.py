@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0002_veiculo_associado_alter_associado_idveicasso'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='associado',
+            name='idVeicAsso',
+        ),
+        migrations.AddField(
+            model_name='associado',
+            name='consultor',
+            field=models.ForeignKey(blank=True, limit_choices_to={'is_gestor': False}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='associados_indicados', to='membertruck_app.funcionario'),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='gestor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consultores', to='membertruck_app.funcionario'),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='is_gestor',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='veiculo',
+            name='associado',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='veiculos', to='membertruck_app.associado'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='MensagemWhatsApp',
+            fields=[
+                ('idMensagem', models.AutoField(primary_key=True, serialize=False)),
+                ('tipoMensagem', models.CharField(choices=[('cobranca', 'Cobrança'), ('comemorativa', 'Comemorativa'), ('promocional', 'Promocional')], max_length=20)),
+                ('conteudo', models.TextField()),
+                ('dataEnvio', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviada', 'Enviada'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('associado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mensagens', to='membertruck_app.associado')),
+            ],
+            options={
+                'verbose_name': 'Mensagem WhatsApp',
+                'verbose_name_plural': 'Mensagens WhatsApp',
+                'db_table': 'MensagemWhatsApp',
+            },
+        ),
+    ]
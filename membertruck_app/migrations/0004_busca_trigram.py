@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:30
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('membertruck_app', '0003_remove_associado_idveicasso_associado_consultor_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='pessoa',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nomePess'), name='gin_trgm_ops'), name='pessoa_nome_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='pessoa',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('documentoPess'), name='gin_trgm_ops'), name='pessoa_documento_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='pessoa',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('emailPess'), name='gin_trgm_ops'), name='pessoa_email_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='veiculo',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('placaVeic'), name='gin_trgm_ops'), name='veiculo_placa_trgm'),
+        ),
+    ]
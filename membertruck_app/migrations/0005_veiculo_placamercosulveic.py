@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:10
+
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def normalizar_placas(apps, schema_editor):
+    """
+    Grava placaVeic na forma canônica (ABC1234 / ABC1D23) e preenche a chave
+    Mercosul. Se duas linhas caírem na mesma chave (ex.: 'ABC-1234' e
+    'ABC1C34') a migração para sem alterar nada e lista os ids para que os
+    cadastros sejam unificados manualmente.
+    """
+    Veiculo = apps.get_model('membertruck_app', 'Veiculo')
+    letras = 'ABCDEFGHIJ'
+
+    def chave(placa):
+        if re.match(r'^[A-Z]{3}\d{4}$', placa):
+            return placa[:4] + letras[int(placa[4])] + placa[5:]
+        return placa
+
+    veiculos = []
+    por_chave = defaultdict(list)
+    for veiculo in Veiculo.objects.only('idVeic', 'placaVeic').iterator(chunk_size=2000):
+        veiculo.placaVeic = re.sub(r'[\s-]', '', veiculo.placaVeic or '').upper()
+        veiculo.placaMercosulVeic = chave(veiculo.placaVeic)
+        por_chave[veiculo.placaMercosulVeic].append(veiculo.idVeic)
+        veiculos.append(veiculo)
+
+    duplicadas = {placa: ids for placa, ids in por_chave.items() if len(ids) > 1}
+    if duplicadas:
+        raise RuntimeError(f'Placas duplicadas após normalização (chave: ids): {duplicadas}')
+
+    Veiculo.objects.bulk_update(veiculos, ['placaVeic', 'placaMercosulVeic'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0004_busca_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='veiculo',
+            name='placaMercosulVeic',
+            field=models.CharField(editable=False, max_length=10, null=True),
+        ),
+        migrations.RunPython(normalizar_placas, migrations.RunPython.noop),
+    ]
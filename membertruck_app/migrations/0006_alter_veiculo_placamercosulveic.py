@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0005_veiculo_placamercosulveic'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='veiculo',
+            name='placaMercosulVeic',
+            field=models.CharField(editable=False, max_length=10, unique=True),
+        ),
+    ]
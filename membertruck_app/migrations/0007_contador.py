@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:40
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def carregar_contadores(apps, schema_editor):
+    """Carga inicial dos contadores a partir das tabelas existentes"""
+    Contador = apps.get_model('membertruck_app', 'Contador')
+    Funcionario = apps.get_model('membertruck_app', 'Funcionario')
+    Associado = apps.get_model('membertruck_app', 'Associado')
+    Veiculo = apps.get_model('membertruck_app', 'Veiculo')
+
+    totais = Funcionario.objects.aggregate(
+        funcionarios=Count('pk'),
+        gestores=Count('pk', filter=Q(is_gestor=True)),
+        consultores=Count('pk', filter=Q(is_gestor=False)),
+    )
+    totais['associados'] = Associado.objects.count()
+    totais['veiculos'] = Veiculo.objects.count()
+    Contador.objects.bulk_create([Contador(nome=nome, valor=valor) for nome, valor in totais.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0006_alter_veiculo_placamercosulveic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contador',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'Contador',
+            },
+        ),
+        migrations.RunPython(carregar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 16:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('membertruck_app', '0008_associado_updated_at_cargo_updated_at_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='associado',
+            index=models.Index(fields=['consultor', 'dataPagamentoAsso'], name='associado_consultor_pgto_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='associado',
+            index=models.Index(fields=['dataPagamentoAsso'], name='associado_pagamento_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='funcionario',
+            index=models.Index(fields=['gestor', 'is_gestor'], name='funcionario_gestor_papel_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='funcionario',
+            index=models.Index(condition=models.Q(('is_gestor', True)), fields=['idFunc'], name='funcionario_gestores_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='mensagemwhatsapp',
+            index=models.Index(fields=['status', 'dataEnvio'], name='mensagem_status_envio_idx'),
+        ),
+    ]
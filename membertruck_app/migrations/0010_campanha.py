@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0009_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campanha',
+            fields=[
+                ('idCampanha', models.AutoField(primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=100)),
+                ('tipoMensagem', models.CharField(choices=[('cobranca', 'Cobrança'), ('comemorativa', 'Comemorativa'), ('promocional', 'Promocional')], max_length=20)),
+                ('template', models.TextField()),
+                ('segmento', models.JSONField(default=dict)),
+                ('total', models.IntegerField(default=0)),
+                ('dataCriacao', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'Campanha',
+            },
+        ),
+        migrations.AddField(
+            model_name='mensagemwhatsapp',
+            name='campanha',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mensagens', to='membertruck_app.campanha'),
+        ),
+    ]
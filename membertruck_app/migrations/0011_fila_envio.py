@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0010_campanha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mensagemwhatsapp',
+            name='proximaTentativa',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='mensagemwhatsapp',
+            name='tentativas',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mensagemwhatsapp',
+            name='ultimoErro',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
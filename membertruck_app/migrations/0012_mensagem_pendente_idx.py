@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('membertruck_app', '0011_fila_envio'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='mensagemwhatsapp',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['proximaTentativa'], name='mensagem_pendente_idx'),
+        ),
+    ]
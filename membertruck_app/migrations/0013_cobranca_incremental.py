@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0012_mensagem_pendente_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('dataReferencia', models.DateField(blank=True, null=True)),
+                ('executadoEm', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'Checkpoint',
+            },
+        ),
+        migrations.AddField(
+            model_name='mensagemwhatsapp',
+            name='referencia',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        # A coluna acabou de ser criada (toda nula): o índice parcial da constraint nasce vazio
+        migrations.AddConstraint(
+            model_name='mensagemwhatsapp',
+            constraint=models.UniqueConstraint(condition=models.Q(('referencia__isnull', False)), fields=('associado', 'referencia'), name='mensagem_referencia_unica'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('membertruck_app', '0013_cobranca_incremental'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='associado',
+            index=models.Index(fields=['updated_at'], name='associado_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:45
+
+import django.db.models.functions.datetime
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('membertruck_app', '0014_associado_updated_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='pessoa',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('nascimentoPess'), django.db.models.functions.datetime.ExtractDay('nascimentoPess'), name='pessoa_aniversario_idx'),
+        ),
+    ]
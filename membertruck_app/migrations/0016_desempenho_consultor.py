@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membertruck_app', '0015_pessoa_aniversario_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DesempenhoConsultor',
+            fields=[
+                ('idDesempenho', models.AutoField(primary_key=True, serialize=False)),
+                ('data', models.DateField()),
+                ('associados', models.PositiveIntegerField(default=0)),
+                ('em_dia', models.PositiveIntegerField(default=0)),
+                ('vencidos', models.PositiveIntegerField(default=0)),
+                ('novos', models.PositiveIntegerField(default=0)),
+                ('comissao', models.FloatField(default=0)),
+                ('consultor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='desempenho', to='membertruck_app.funcionario')),
+                ('gestor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='membertruck_app.funcionario')),
+            ],
+            options={
+                'db_table': 'DesempenhoConsultor',
+                'constraints': [models.UniqueConstraint(fields=('data', 'consultor'), name='desempenho_data_consultor_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:40
+
+from django.db import migrations
+
+INDICE = 'mensagem_referencia_unica'
+CRIAR = (
+    f'CREATE UNIQUE INDEX CONCURRENTLY "{INDICE}" '
+    'ON "MensagemWhatsApp" ("associado_id", "referencia") WHERE "referencia" IS NOT NULL'
+)
+
+
+def garantir_indice(apps, schema_editor):
+    """
+    A constraint vem da 0013_cobranca_incremental. Bancos em que o índice dela
+    ficou INVALID (CREATE INDEX CONCURRENTLY interrompido) ou faltando têm o
+    índice recriado CONCURRENTLY, sem bloquear escritas na MensagemWhatsApp;
+    nos demais não faz nada.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [INDICE],
+        )
+        linha = cursor.fetchone()
+        if linha is not None and linha[0]:
+            return
+        if linha is not None:
+            cursor.execute(f'DROP INDEX CONCURRENTLY "{INDICE}"')
+        cursor.execute(CRIAR)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('membertruck_app', '0016_desempenho_consultor'),
+    ]
+
+    operations = [
+        migrations.RunPython(garantir_indice, migrations.RunPython.noop),
+    ]
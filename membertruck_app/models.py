@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth, Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
 
+from .placas import normalizar_placa, chave_mercosul
+
 # --- Manager para o Modelo Pessoa (agora seu USER MODEL) ---
 class PessoaManager(BaseUserManager):
     def create_user(self, usuarioPess, password=None, **extra_fields):
@@ -24,6 +28,10 @@ class PessoaManager(BaseUserManager):
 
         return self.create_user(usuarioPess, password, **extra_fields)
 
+    def get_by_natural_key(self, usuarioPess):
+        # Usado pelo authenticate() no login: já traz funcionário/associado no mesmo SELECT
+        return self.select_related('funcionario', 'associado').get(**{self.model.USERNAME_FIELD: usuarioPess})
+
 
 # --- Modelo Pessoa (Seu AUTH_USER_MODEL) ---
 class Pessoa(AbstractBaseUser, PermissionsMixin):
@@ -42,6 +50,9 @@ class Pessoa(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(default=timezone.now)
     last_login = models.DateTimeField(null=True, blank=True)
 
+    # Última alteração: base do ETag/Last-Modified (presente em todos os modelos)
+    updated_at = models.DateTimeField(auto_now=True)
+
     # Relacionamento com Endereco
     idEndePess = models.OneToOneField(
         'Endereco', 
@@ -62,6 +73,14 @@ class Pessoa(AbstractBaseUser, PermissionsMixin):
     class Meta:
         db_table = 'Pessoa'
         verbose_name_plural = "Pessoas"
+        indexes = [
+            # Índices trigram (pg_trgm) para a busca parcial sem diferenciar maiúsculas (icontains)
+            GinIndex(OpClass(Upper('nomePess'), name='gin_trgm_ops'), name='pessoa_nome_trgm'),
+            GinIndex(OpClass(Upper('documentoPess'), name='gin_trgm_ops'), name='pessoa_documento_trgm'),
+            GinIndex(OpClass(Upper('emailPess'), name='gin_trgm_ops'), name='pessoa_email_trgm'),
+            # Aniversariantes do dia: (mês, dia) do nascimento, mesma expressão de nascimentoPess__month/__day
+            models.Index(ExtractMonth('nascimentoPess'), ExtractDay('nascimentoPess'), name='pessoa_aniversario_idx'),
+        ]
 
 
 class Endereco(models.Model):
@@ -73,6 +92,8 @@ class Endereco(models.Model):
     bairroEnde = models.TextField()
     cidadeEnde = models.TextField()
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"{self.logadouroEnde}, {self.numeroEnde} - {self.cidadeEnde}"
 
@@ -84,6 +105,8 @@ class Departamento(models.Model):
     idDepa = models.AutoField(primary_key=True)
     nomeDepa = models.TextField(unique=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.nomeDepa
 
@@ -95,6 +118,8 @@ class Cargo(models.Model):
     idCarg = models.AutoField(primary_key=True)
     nomeCarg = models.TextField(unique=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.nomeCarg
 
@@ -106,6 +131,8 @@ class Plano(models.Model):
     idPlan = models.AutoField(primary_key=True)
     nomePlan = models.TextField(unique=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.nomePlan
 
@@ -150,11 +177,27 @@ class Funcionario(models.Model):
     # Identificar se é gestor
     is_gestor = models.BooleanField(default=False)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Funcionário: {self.idPessFunc.nomePess}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valor gravado no banco, usado pelos contadores ao detectar mudança de papel
+        if 'is_gestor' in field_names:
+            instance._is_gestor_db = instance.is_gestor
+        return instance
+
     class Meta:
         db_table = 'Funcionario'
+        indexes = [
+            # ConsultoresPorGestorView: WHERE gestor_id = ? AND is_gestor = false
+            models.Index(fields=['gestor', 'is_gestor'], name='funcionario_gestor_papel_idx'),
+            # GestoresListView: só os gestores, já na ordem da paginação (PK)
+            models.Index(fields=['idFunc'], condition=models.Q(is_gestor=True), name='funcionario_gestores_idx'),
+        ]
 
 
 class Associado(models.Model):
@@ -184,11 +227,21 @@ class Associado(models.Model):
         limit_choices_to={'is_gestor': False}  # Apenas consultores, não gestores
     )
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Associado: {self.idPessAsso.nomePess}"
 
     class Meta:
         db_table = 'Associado'
+        indexes = [
+            # AssociadosPorConsultorView e cobrança por consultor
+            models.Index(fields=['consultor', 'dataPagamentoAsso'], name='associado_consultor_pgto_idx'),
+            # Cobrança geral: vencidos / a vencer
+            models.Index(fields=['dataPagamentoAsso'], name='associado_pagamento_idx'),
+            # Cobrança incremental: associados alterados desde a última execução
+            models.Index(fields=['updated_at'], name='associado_updated_idx'),
+        ]
 
 
 # CORREÇÃO: Veiculo pertence a Associado (1 para muitos)
@@ -196,7 +249,9 @@ class Veiculo(models.Model):
     idVeic = models.AutoField(primary_key=True)
     nomeVeic = models.CharField(max_length=100)
     anoVeic = models.SmallIntegerField(null=True, blank=True)
-    placaVeic = models.CharField(max_length=10, unique=True)
+    placaVeic = models.CharField(max_length=10, unique=True)  # Forma canônica: ABC1234 / ABC1D23
+    # Chave no padrão Mercosul (ABC1234 -> ABC1C34): mesma chave para a placa antiga e a convertida
+    placaMercosulVeic = models.CharField(max_length=10, unique=True, editable=False)
     
     # Um veículo pertence a um associado, um associado pode ter vários veículos
     associado = models.ForeignKey(
@@ -205,11 +260,47 @@ class Veiculo(models.Model):
         related_name='veiculos'  # associado.veiculos.all()
     )
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"{self.placaVeic} ({self.nomeVeic})"
 
+    def save(self, *args, **kwargs):
+        self.placaVeic = normalizar_placa(self.placaVeic)
+        self.placaMercosulVeic = chave_mercosul(self.placaVeic)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'placaVeic' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'placaMercosulVeic'}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'Veiculo'
+        indexes = [
+            GinIndex(OpClass(Upper('placaVeic'), name='gin_trgm_ops'), name='veiculo_placa_trgm'),
+        ]
+
+
+# Campanha de mensagens: um template enviado a um segmento de associados
+class Campanha(models.Model):
+    idCampanha = models.AutoField(primary_key=True)
+    nome = models.CharField(max_length=100)
+    tipoMensagem = models.CharField(max_length=20, choices=[
+        ('cobranca', 'Cobrança'),
+        ('comemorativa', 'Comemorativa'),
+        ('promocional', 'Promocional'),
+    ])
+    template = models.TextField()  # Ex.: "Olá {nome}, seu plano {plano} vence em {vencimento}"
+    segmento = models.JSONField(default=dict)  # Filtros usados: plano, consultor, inadimplente, aniversariantes
+    total = models.IntegerField(default=0)  # Mensagens geradas na criação
+    dataCriacao = models.DateTimeField(auto_now_add=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Campanha {self.nome} ({self.total} mensagens)"
+
+    class Meta:
+        db_table = 'Campanha'
 
 
 # Modelo para histórico de mensagens WhatsApp (adicional)
@@ -236,11 +327,95 @@ class MensagemWhatsApp(models.Model):
     conteudo = models.TextField()
     dataEnvio = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    campanha = models.ForeignKey(
+        Campanha,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='mensagens'
+    )
+
+    # Fila de envio: quando a mensagem pode ser (re)tentada. Ao ser reservada por
+    # um worker, avança pelo tempo de visibilidade; se o worker cair, ela volta sozinha
+    proximaTentativa = models.DateTimeField(default=timezone.now)
+    tentativas = models.SmallIntegerField(default=0)
+    ultimoErro = models.TextField(null=True, blank=True)
+    # Mensagens automáticas: o que esta mensagem cobre (ex.: 'vencido:2025-01-10'); única por associado
+    referencia = models.CharField(max_length=50, null=True, blank=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Mensagem {self.tipoMensagem} para {self.associado.idPessAsso.nomePess}"
     
     class Meta:
         db_table = 'MensagemWhatsApp'
         verbose_name = "Mensagem WhatsApp"
-        verbose_name_plural = "Mensagens WhatsApp"
\ No newline at end of file
+        verbose_name_plural = "Mensagens WhatsApp"
+        indexes = [
+            # Dashboard: enviadas hoje (status = ? AND dataEnvio no intervalo do dia)
+            models.Index(fields=['status', 'dataEnvio'], name='mensagem_status_envio_idx'),
+            # Fila: só as pendentes, na ordem em que ficam disponíveis (SELECT ... FOR UPDATE SKIP LOCKED)
+            models.Index(
+                fields=['proximaTentativa'], name='mensagem_pendente_idx',
+                condition=models.Q(status='pendente'),
+            ),
+        ]
+        constraints = [
+            # A mesma cobrança/felicitação automática nunca é gerada duas vezes
+            models.UniqueConstraint(
+                fields=['associado', 'referencia'], name='mensagem_referencia_unica',
+                condition=models.Q(referencia__isnull=False),
+            ),
+        ]
+
+
+# Ponto de parada dos jobs incrementais (cobrança)
+class Checkpoint(models.Model):
+    nome = models.CharField(max_length=50, primary_key=True)
+    dataReferencia = models.DateField(null=True, blank=True)  # Último dia processado
+    executadoEm = models.DateTimeField(null=True, blank=True)  # Início da última execução
+
+    def __str__(self):
+        return f"{self.nome}: {self.dataReferencia}"
+
+    class Meta:
+        db_table = 'Checkpoint'
+
+
+# Foto diária do relatório de consultores (manage.py snapshot_desempenho): períodos passados
+# são lidos daqui em vez de recalculados
+class DesempenhoConsultor(models.Model):
+    idDesempenho = models.AutoField(primary_key=True)
+    data = models.DateField()
+    consultor = models.ForeignKey(Funcionario, on_delete=models.CASCADE, related_name='desempenho')
+    gestor = models.ForeignKey(  # Gestor do consultor naquele dia
+        Funcionario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    associados = models.PositiveIntegerField(default=0)  # Indicados ativos
+    em_dia = models.PositiveIntegerField(default=0)
+    vencidos = models.PositiveIntegerField(default=0)
+    novos = models.PositiveIntegerField(default=0)  # Ativados no dia
+    comissao = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.consultor_id} em {self.data}"
+
+    class Meta:
+        db_table = 'DesempenhoConsultor'
+        constraints = [
+            # Também é o índice das consultas por período
+            models.UniqueConstraint(fields=['data', 'consultor'], name='desempenho_data_consultor_unico'),
+        ]
+
+
+# Totais pré-calculados para o dashboard (mantidos pelos signals em signals.py)
+class Contador(models.Model):
+    nome = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nome}: {self.valor}"
+
+    class Meta:
+        db_table = 'Contador'
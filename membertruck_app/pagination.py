@@ -0,0 +1,47 @@
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) sobre a chave primária do modelo.
+
+    Cada página é buscada com ``WHERE pk > cursor ORDER BY pk LIMIT n``,
+    sem OFFSET, então a página 500 custa o mesmo que a página 1.
+    O cursor é opaco (base64) e continua estável mesmo com inserções.
+
+    Parâmetros aceitos:
+        ?cursor=<opaco>         posição retornada em 'next'/'previous'
+        ?page_size=<n>          tamanho da página (limitado a max_page_size)
+        ?ordering=<pk>|-<pk>    ordem crescente ou decrescente pela PK
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        self.pk_field = queryset.model._meta.pk
+        pk_name = self.pk_field.name
+
+        # Ordem padrão da view (ex.: mensagens mais recentes primeiro)
+        default = getattr(view, 'ordering', None) or pk_name
+        if isinstance(default, (list, tuple)):
+            default = default[0]
+
+        # Apenas a PK é aceita: é única, indexada e garante cursor estável
+        requested = request.query_params.get(self.ordering_query_param)
+        if requested in (pk_name, f'-{pk_name}'):
+            return (requested,)
+        return (default,)
+
+    def decode_cursor(self, request):
+        # A posição vai direto para o WHERE: cursor adulterado com valor que
+        # não é uma PK válida vira 404 (como um cursor mal formado), não 500
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                self.pk_field.to_python(cursor.position)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
@@ -0,0 +1,32 @@
+import re
+
+# Padrão antigo: ABC1234 / Mercosul: ABC1D23 (já sem hífen)
+PLACA_ANTIGA = re.compile(r'^[A-Z]{3}\d{4}$')
+PLACA_MERCOSUL = re.compile(r'^[A-Z]{3}\d[A-Z]\d{2}$')
+
+# Na conversão para Mercosul o 2º dígito vira letra: 0=A, 1=B, ..., 9=J
+LETRAS_MERCOSUL = 'ABCDEFGHIJ'
+
+
+def normalizar_placa(valor):
+    """Forma canônica de armazenamento: maiúsculas, sem hífen nem espaços ('abc-1234' -> 'ABC1234')"""
+    return re.sub(r'[\s-]', '', valor or '').upper()
+
+
+def placa_valida(placa):
+    """Confere se a placa (já normalizada) está no padrão antigo ou Mercosul"""
+    return bool(PLACA_ANTIGA.match(placa) or PLACA_MERCOSUL.match(placa))
+
+
+def chave_mercosul(placa):
+    """
+    Chave única da placa no padrão Mercosul ('ABC1234' -> 'ABC1C34').
+
+    O mesmo caminhão com a placa antiga e com a convertida gera a mesma
+    chave, o que impede o cadastro duplicado e permite a busca exata por
+    qualquer uma das duas grafias.
+    """
+    placa = normalizar_placa(placa)
+    if PLACA_ANTIGA.match(placa):
+        return placa[:4] + LETRAS_MERCOSUL[int(placa[4])] + placa[5:]
+    return placa
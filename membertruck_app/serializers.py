@@ -1,12 +1,138 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
 from .models import (
     Pessoa, Endereco, Departamento, Cargo, Plano, 
-    Veiculo, Funcionario, Associado, MensagemWhatsApp
+    Veiculo, Funcionario, Associado, MensagemWhatsApp, Campanha
 )
+from .placas import normalizar_placa, placa_valida, chave_mercosul
+from . import ultimo_login
+from .autenticacao import claims_do_usuario, papel_do_usuario
+from .campanhas import ErroCampanha, criar_campanha, validar_template
 
 
+# =================== CAMPOS ESPARSOS (?fields= / ?exclude=) ===================
+
+def parse_sparse_params(request):
+    """Lê ?fields=a,b e ?exclude=c,d da requisição (apenas leitura)"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+
+    def _split(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        # Parâmetro vazio (?fields=) vale como ausente: todos os campos
+        return {item.strip() for item in value.split(',') if item.strip()} or None
+
+    return _split('fields'), _split('exclude')
+
+
+def _query_paths(serializer, model):
+    """
+    Percorre o 'source' de cada campo do serializer e devolve o que o
+    queryset precisa carregar: colunas para .only(), caminhos para
+    select_related e relações reversas (com o serializer filho) para prefetch.
+    """
+    only, select, prefetch = set(), set(), {}
+
+    for field in serializer.fields.values():
+        if field.write_only or not field.source_attrs:
+            continue
+
+        current, parts = model, []
+        for i, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break  # property/método: nada a carregar no SQL
+
+            path = LOOKUP_SEP.join(parts + [attr])
+            if model_field.many_to_many or model_field.one_to_many or not model_field.concrete:
+                child = getattr(field, 'child', None)
+                prefetch[path] = (model_field, child if isinstance(child, serializers.BaseSerializer) else None)
+                break
+
+            only.add(path)
+            if model_field.is_relation and i < len(field.source_attrs) - 1:
+                select.add(path)
+                current = model_field.related_model
+            parts.append(attr)
+
+    return only, select, prefetch
+
+
+class SparseFieldsMixin:
+    """
+    Permite ao cliente escolher os campos da resposta:
+        ?fields=idAsso,pessoa_nome   apenas esses campos
+        ?exclude=veiculos            todos, exceto esses
+
+    Campos não pedidos são removidos do serializer (sem custo de serialização)
+    e prune_queryset() remove os joins/prefetches que eles exigiriam.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        exclude = kwargs.pop('exclude', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is None and exclude is None:
+            fields, exclude = parse_sparse_params(self.context.get('request'))
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if exclude is not None:
+            for name in set(self.fields) & set(exclude):
+                self.fields.pop(name)
+
+    @classmethod
+    def prune_queryset(cls, queryset, fields=None, exclude=None):
+        """Refaz select_related/prefetch_related/only só com o que os campos pedidos usam"""
+        only, select, prefetch = _query_paths(cls(fields=fields, exclude=exclude), queryset.model)
+
+        lookups = []
+        for path, (relation, child) in prefetch.items():
+            if child is None:
+                lookups.append(path)
+                continue
+
+            # O prefetch reaproveita a instância pai na FK de volta
+            # (ex.: veiculo.associado), então o que o filho lê através
+            # dela precisa ser carregado no queryset pai.
+            back = relation.field.name
+            prefix = path.split(LOOKUP_SEP)[:-1]
+            child_only, child_select, _ = _query_paths(child, relation.related_model)
+            for child_path in child_only | child_select:
+                head, _, tail = child_path.partition(LOOKUP_SEP)
+                if head == back and tail:
+                    parent_path = LOOKUP_SEP.join(prefix + [tail])
+                    only.add(parent_path)
+                    hops = tail.split(LOOKUP_SEP)[:-1]
+                    for n in range(1, len(hops) + 1):
+                        select.add(LOOKUP_SEP.join(prefix + hops[:n]))
+                        only.add(LOOKUP_SEP.join(prefix + hops[:n]))
+
+            child_only = {p for p in child_only if p.split(LOOKUP_SEP)[0] != back} | {back}
+            child_select = {p for p in child_select if p.split(LOOKUP_SEP)[0] != back}
+            child_queryset = relation.related_model._default_manager.only(*child_only)
+            if child_select:
+                child_queryset = child_queryset.select_related(*child_select)
+            lookups.append(Prefetch(path, queryset=child_queryset))
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*select)
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset.only(*only)
 
 
 # Serializer customizado para JWT Login
@@ -46,13 +172,15 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
                 'Conta de usuário desabilitada.'
             )
         
-        # Define self.user para que super().validate possa acessá-lo
         self.user = user
 
-        # 2. Chama a validação padrão do TokenObtainPairSerializer
-        # Isso irá gerar os tokens 'refresh' e 'access'
-        data = super().validate(attrs)
-        
+        # 2. Gera os tokens 'refresh' e 'access'. O super().validate() não é
+        # chamado: ele repetiria o authenticate() (outro SELECT e outro hash)
+        refresh = self.get_token(self.user)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        if api_settings.UPDATE_LAST_LOGIN:
+            ultimo_login.registrar(self.user)  # gravado em lote, fora do caminho do login
+
         # 3. Adiciona informações extras ao token response (sua lógica original)
         data['user_info'] = {
             'idPess': self.user.idPess,
@@ -62,23 +190,17 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
             'is_staff': self.user.is_staff,
             'is_superuser': self.user.is_superuser,
         }
-        
-        # 4. Verifica se é funcionário ou associado
-        try:
-            funcionario = Funcionario.objects.get(idPessFunc=self.user)
-            data['user_info']['tipo_usuario'] = 'funcionario'
-            data['user_info']['is_gestor'] = funcionario.is_gestor
-            data['user_info']['funcionario_id'] = funcionario.idFunc
-        except Funcionario.DoesNotExist:
-            try:
-                associado = Associado.objects.get(idPessAsso=self.user)
-                data['user_info']['tipo_usuario'] = 'associado'
-                data['user_info']['associado_id'] = associado.idAsso
-            except Associado.DoesNotExist:
-                data['user_info']['tipo_usuario'] = 'admin' # Ou outro tipo padrão se não for nenhum dos dois
-        
+        data['user_info'].update(papel_do_usuario(self.user))
         return data
 
+    @classmethod
+    def get_token(cls, user):
+        # Papel nos claims: o modo JWT_STATELESS autentica sem consultar a Pessoa
+        token = super().get_token(user)
+        for claim, valor in claims_do_usuario(user).items():
+            token[claim] = valor
+        return token
+
 
 class PessoaSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -117,28 +239,28 @@ class PessoaSerializer(serializers.ModelSerializer):
 class EnderecoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Endereco
-        fields = '__all__'
+        exclude = ['updated_at']  # Só versiona o ETag, não faz parte da API
 
 
 class DepartamentoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Departamento
-        fields = '__all__'
+        exclude = ['updated_at']  # Só versiona o ETag, não faz parte da API
 
 
 class CargoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cargo
-        fields = '__all__'
+        exclude = ['updated_at']  # Só versiona o ETag, não faz parte da API
 
 
 class PlanoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Plano
-        fields = '__all__'
+        exclude = ['updated_at']  # Só versiona o ETag, não faz parte da API
 
 
-class VeiculoSerializer(serializers.ModelSerializer):
+class VeiculoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     associado_nome = serializers.CharField(source='associado.idPessAsso.nomePess', read_only=True)
     
     class Meta:
@@ -146,15 +268,22 @@ class VeiculoSerializer(serializers.ModelSerializer):
         fields = ['idVeic', 'nomeVeic', 'anoVeic', 'placaVeic', 'associado', 'associado_nome']
     
     def validate_placaVeic(self, value):
-        """Valida formato da placa brasileira"""
-        import re
-        # Padrão antigo: ABC-1234 ou novo: ABC1D23
-        if not re.match(r'^[A-Z]{3}-?\d{4}$|^[A-Z]{3}\d[A-Z]\d{2}$', value.upper()):
+        """Valida formato da placa brasileira e devolve a forma canônica"""
+        # Padrão antigo: ABC-1234 / ABC1234 ou novo: ABC1D23
+        placa = normalizar_placa(value)
+        if not placa_valida(placa):
             raise serializers.ValidationError("Formato de placa inválido")
-        return value.upper()
 
+        # A mesma placa nas grafias antiga e Mercosul é o mesmo veículo
+        duplicada = Veiculo.objects.filter(placaMercosulVeic=chave_mercosul(placa))
+        if self.instance is not None:
+            duplicada = duplicada.exclude(pk=self.instance.pk)
+        if duplicada.exists():
+            raise serializers.ValidationError("Já existe um veículo com esta placa")
+        return placa
 
-class FuncionarioSerializer(serializers.ModelSerializer):
+
+class FuncionarioSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Campos aninhados para leitura
     pessoa_nome = serializers.CharField(source='idPessFunc.nomePess', read_only=True)
     pessoa_email = serializers.CharField(source='idPessFunc.emailPess', read_only=True)
@@ -176,7 +305,7 @@ class FuncionarioSerializer(serializers.ModelSerializer):
         ]
 
 
-class AssociadoSerializer(serializers.ModelSerializer):
+class AssociadoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Campos aninhados para leitura
     pessoa_nome = serializers.CharField(source='idPessAsso.nomePess', read_only=True)
     pessoa_email = serializers.CharField(source='idPessAsso.emailPess', read_only=True)
@@ -196,7 +325,7 @@ class AssociadoSerializer(serializers.ModelSerializer):
         ]
 
 
-class MensagemWhatsAppSerializer(serializers.ModelSerializer):
+class MensagemWhatsAppSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     associado_nome = serializers.CharField(source='associado.idPessAsso.nomePess', read_only=True)
     associado_telefone = serializers.CharField(source='associado.idPessAsso.telefonePess', read_only=True)
     
@@ -208,6 +337,55 @@ class MensagemWhatsAppSerializer(serializers.ModelSerializer):
         ]
 
 
+class SegmentoSerializer(serializers.Serializer):
+    """Filtros de uma campanha (combinados com E)"""
+    plano = serializers.PrimaryKeyRelatedField(queryset=Plano.objects.all(), required=False)
+    consultor = serializers.PrimaryKeyRelatedField(
+        queryset=Funcionario.objects.filter(is_gestor=False), required=False
+    )
+    inadimplente = serializers.BooleanField(required=False)
+    aniversariantes = serializers.BooleanField(required=False)
+
+    def to_internal_value(self, data):
+        # Guardado em JSON: apenas IDs e booleanos marcados
+        dados = super().to_internal_value(data)
+        return {
+            chave: valor.pk if hasattr(valor, 'pk') else valor
+            for chave, valor in dados.items() if valor not in (None, False)
+        }
+
+    def to_representation(self, instance):
+        return dict(instance)
+
+
+class CampanhaSerializer(serializers.ModelSerializer):
+    segmento = SegmentoSerializer()
+    pendentes = serializers.IntegerField(read_only=True)
+    enviadas = serializers.IntegerField(read_only=True)
+    erros = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Campanha
+        fields = [
+            'idCampanha', 'nome', 'tipoMensagem', 'template', 'segmento',
+            'total', 'dataCriacao', 'pendentes', 'enviadas', 'erros'
+        ]
+        read_only_fields = ['total', 'dataCriacao']
+
+    def validate_template(self, value):
+        try:
+            validar_template(value)
+        except ErroCampanha as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def create(self, validated_data):
+        return criar_campanha(
+            validated_data['nome'], validated_data['tipoMensagem'],
+            validated_data['template'], validated_data['segmento'],
+        )
+
+
 # Serializers para criação completa (Pessoa + Funcionário/Associado em uma transação)
 class FuncionarioCompletoSerializer(serializers.Serializer):
     # Dados da pessoa
@@ -314,4 +492,124 @@ class AssociadoCompletoSerializer(serializers.Serializer):
                 **associado_data
             )
             
-        return associado
\ No newline at end of file
+        return associado
+
+# =================== IMPORTAÇÃO EM LOTE ===================
+
+class VeiculoImportacaoSerializer(serializers.Serializer):
+    nomeVeic = serializers.CharField(max_length=100)
+    anoVeic = serializers.IntegerField(required=False, allow_null=True, min_value=1900, max_value=2100)
+    placaVeic = serializers.CharField(max_length=10)
+
+    def validate_placaVeic(self, value):
+        """Só o formato: a duplicidade é conferida para o lote inteiro de uma vez"""
+        placa = normalizar_placa(value)
+        if not placa_valida(placa):
+            raise serializers.ValidationError("Formato de placa inválido")
+        return placa
+
+
+class AssociadoImportacaoSerializer(AssociadoCompletoSerializer):
+    """
+    Uma linha da importação em lote (Pessoa + Associado + Veículos).
+
+    Plano e consultor chegam como IDs e são conferidos contra os conjuntos
+    carregados uma única vez para o lote (context['planos'] e
+    context['consultores']), em vez de uma consulta por linha.
+    """
+    idPlanAsso = serializers.IntegerField(required=False, allow_null=True)
+    consultor = serializers.IntegerField(required=False, allow_null=True)
+    veiculos = VeiculoImportacaoSerializer(many=True, required=False)
+
+    def validate_idPlanAsso(self, value):
+        if value is not None and value not in self.context['planos']:
+            raise serializers.ValidationError("Plano não encontrado")
+        return value
+
+    def validate_consultor(self, value):
+        if value is not None and value not in self.context['consultores']:
+            raise serializers.ValidationError("Consultor não encontrado")
+        return value
+
+    def create(self, validated_data):
+        """Grava uma linha pelo mesmo caminho do lote (importacao.importar_associados)"""
+        from .importacao import importar_associados
+
+        criados, erros = importar_associados({1: validated_data})
+        if erros:
+            raise serializers.ValidationError(erros[1])
+        return Associado.objects.get(pk=criados[1])
+
+
+# =================== ATUALIZAÇÃO EM LOTE ===================
+
+class AtualizacaoLoteSerializer(serializers.Serializer):
+    """
+    Atualização em lote: seleciona por `ids` ou por `filtro` e aplica
+    `alteracoes` a todas as linhas. As subclasses declaram `filtro` e
+    `alteracoes`; as FKs de destino são PrimaryKeyRelatedField, então cada
+    uma é conferida uma única vez para o lote inteiro.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.ATUALIZACAO_LOTE_MAX_IDS:
+            raise serializers.ValidationError(
+                f"Máximo de {settings.ATUALIZACAO_LOTE_MAX_IDS} IDs por requisição; use o filtro"
+            )
+        return value
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filtro' in attrs):
+            raise serializers.ValidationError("Informe 'ids' ou 'filtro' (apenas um)")
+        if 'filtro' in attrs and not attrs['filtro']:
+            raise serializers.ValidationError({'filtro': "Informe ao menos um critério"})
+        if not attrs['alteracoes']:
+            raise serializers.ValidationError({'alteracoes': "Nenhuma alteração informada"})
+        return attrs
+
+
+class AssociadoFiltroLoteSerializer(serializers.Serializer):
+    consultor = serializers.IntegerField(required=False, allow_null=True)
+    idPlanAsso = serializers.IntegerField(required=False, allow_null=True)
+
+
+class AssociadoAlteracoesLoteSerializer(serializers.Serializer):
+    consultor = serializers.PrimaryKeyRelatedField(
+        queryset=Funcionario.objects.filter(is_gestor=False), required=False, allow_null=True
+    )
+    idPlanAsso = serializers.PrimaryKeyRelatedField(queryset=Plano.objects.all(), required=False, allow_null=True)
+    dataAtivacaoAsso = serializers.DateField(required=False, allow_null=True)
+    dataPagamentoAsso = serializers.DateField(required=False, allow_null=True)
+
+
+class AssociadoLoteSerializer(AtualizacaoLoteSerializer):
+    """Ex.: {"filtro": {"consultor": 7}, "alteracoes": {"consultor": 9}}"""
+    filtro = AssociadoFiltroLoteSerializer(required=False)
+    alteracoes = AssociadoAlteracoesLoteSerializer()
+
+
+class FuncionarioFiltroLoteSerializer(serializers.Serializer):
+    gestor = serializers.IntegerField(required=False, allow_null=True)
+    idDepaFunc = serializers.IntegerField(required=False, allow_null=True)
+    idCargFunc = serializers.IntegerField(required=False, allow_null=True)
+    is_gestor = serializers.BooleanField(required=False)
+
+
+class FuncionarioAlteracoesLoteSerializer(serializers.Serializer):
+    # is_gestor fica de fora: troca de papel passa pelos contadores e pelo cache de usuários (save)
+    gestor = serializers.PrimaryKeyRelatedField(
+        queryset=Funcionario.objects.filter(is_gestor=True), required=False, allow_null=True
+    )
+    idDepaFunc = serializers.PrimaryKeyRelatedField(
+        queryset=Departamento.objects.all(), required=False, allow_null=True
+    )
+    idCargFunc = serializers.PrimaryKeyRelatedField(queryset=Cargo.objects.all(), required=False, allow_null=True)
+    salarioFunc = serializers.FloatField(required=False, allow_null=True)
+    comissaoFunc = serializers.FloatField(required=False, allow_null=True)
+
+
+class FuncionarioLoteSerializer(AtualizacaoLoteSerializer):
+    """Ex.: {"filtro": {"gestor": 3}, "alteracoes": {"gestor": 4}}"""
+    filtro = FuncionarioFiltroLoteSerializer(required=False)
+    alteracoes = FuncionarioAlteracoesLoteSerializer()
@@ -0,0 +1,116 @@
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from membertruck_api import tempos
+
+from . import cache_referencias, conexoes, contadores, hierarquia, ultimo_login
+from .autenticacao import usuarios
+from .models import Associado, Cargo, Departamento, Funcionario, Pessoa, Plano, Veiculo
+
+
+@receiver(post_save, sender=Associado)
+def associado_criado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        contadores.incrementar(associados=1)
+
+
+@receiver(post_delete, sender=Associado)
+def associado_removido(sender, instance, **kwargs):
+    contadores.incrementar(associados=-1)
+
+
+@receiver(post_save, sender=Veiculo)
+def veiculo_criado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        contadores.incrementar(veiculos=1)
+    _tocar_associado(instance)
+
+
+@receiver(post_delete, sender=Veiculo)
+def veiculo_removido(sender, instance, **kwargs):
+    contadores.incrementar(veiculos=-1)
+    _tocar_associado(instance)
+
+
+def _tocar_associado(veiculo):
+    # Os veículos fazem parte da resposta do associado: a exclusão de um
+    # veículo precisa mudar o Last-Modified do associado
+    Associado.objects.filter(pk=veiculo.associado_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Funcionario)
+def funcionario_salvo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    papel, outro = ('gestores', 'consultores') if instance.is_gestor else ('consultores', 'gestores')
+    if created:
+        contadores.incrementar(funcionarios=1, **{papel: 1})
+    elif getattr(instance, '_is_gestor_db', instance.is_gestor) != instance.is_gestor:
+        # Mudou de papel: sai de um contador e entra no outro
+        contadores.incrementar(**{papel: 1, outro: -1})
+    instance._is_gestor_db = instance.is_gestor
+
+
+@receiver(post_delete, sender=Funcionario)
+def funcionario_removido(sender, instance, **kwargs):
+    papel = 'gestores' if instance.is_gestor else 'consultores'
+    contadores.incrementar(funcionarios=-1, **{papel: -1})
+
+
+@receiver(post_save, sender=Plano)
+@receiver(post_save, sender=Cargo)
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Plano)
+@receiver(post_delete, sender=Cargo)
+@receiver(post_delete, sender=Departamento)
+def referencia_alterada(sender, **kwargs):
+    # Só depois do commit: evita que outra requisição regrave o cache com o dado antigo
+    transaction.on_commit(lambda: cache_referencias.invalidar(sender))
+
+
+@receiver(post_save, sender=Pessoa)
+@receiver(post_delete, sender=Pessoa)
+def pessoa_alterada(sender, instance, **kwargs):
+    # Desativação, troca de senha, etc.: o cache de usuários relê a Pessoa
+    pk = instance.pk
+    transaction.on_commit(lambda: usuarios.descartar(pk))
+
+
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+@receiver(post_save, sender=Associado)
+@receiver(post_delete, sender=Associado)
+def papel_alterado(sender, instance, **kwargs):
+    # O usuário em cache traz funcionário/associado junto
+    pk = instance.idPessFunc_id if sender is Funcionario else instance.idPessAsso_id
+    transaction.on_commit(lambda: usuarios.descartar(pk))
+
+
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+@receiver(post_save, sender=Associado)
+@receiver(post_delete, sender=Associado)
+@receiver(post_save, sender=Veiculo)
+@receiver(post_delete, sender=Veiculo)
+def hierarquia_alterada(sender, raw=False, **kwargs):
+    # Estrutura ou contagens da árvore de gestores mudaram
+    if not raw:
+        transaction.on_commit(hierarquia.invalidar)
+
+
+@receiver(connection_created)
+def conexao_aberta(sender, connection, **kwargs):
+    conexoes.registrar_abertura(connection.alias)
+    tempos.instalar(connection)
+
+
+@receiver(request_started)
+def requisicao_iniciada(sender, **kwargs):
+    # last_login em buffer: grava o que passou do intervalo mesmo sem novos logins
+    ultimo_login.descarregar_se_vencido()
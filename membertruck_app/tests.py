@@ -1,3 +1,1806 @@
-from django.test import TestCase
+import base64
+import csv
+import importlib
+import io
+import json
+import tempfile
+import time
+import unittest
+from unittest import mock
+from datetime import date, timedelta
+from http.client import IncompleteRead, RemoteDisconnected
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework.throttling import UserRateThrottle
+
+from membertruck_api import perfil, roteador
+from membertruck_api.middleware.metrics import PerformanceMiddleware
+from membertruck_api.middleware.replicas import ReplicaMiddleware
+from membertruck_api.roteador import RoteadorReplicas
+
+from . import aniversarios, cache_referencias, campanhas, conexoes, contadores, desempenho, fila, hierarquia, importacao, placas, ultimo_login
+from .cobranca import gerar_cobrancas
+from .autenticacao import usuarios
+from .models import (
+    Pessoa, Plano, Funcionario, Associado, Veiculo, MensagemWhatsApp, Campanha, DesempenhoConsultor, Endereco,
+    Contador,
+)
+from .readers import ValuesReader
+from .serializers import AssociadoImportacaoSerializer, AssociadoSerializer, VeiculoSerializer
+from .whatsapp import ErroEnvio, LimiteTaxa, RemetenteCloudAPI, RemetenteFake, obter_remetente
+from .views import (
+    AssociadoExportView, AssociadosPorConsultorView, ConsultoresPorGestorView, DashboardView, GestoresListView,
+)
+
+REMETENTE_FAKE = 'membertruck_app.whatsapp.RemetenteFake'
+migracao_0005 = importlib.import_module('membertruck_app.migrations.0005_veiculo_placamercosulveic')
+
+
+def criar_base(quantidade=6):
+    """Cria associados variados: com/sem plano, consultor, telefone e veículos"""
+    plano = Plano.objects.create(nomePlan='Plano Teste')
+    gestor = Funcionario.objects.create(
+        idPessFunc=Pessoa.objects.create_user('gestor', 'x', nomePess='Gestor'),
+        is_gestor=True,
+    )
+    consultor = Funcionario.objects.create(
+        idPessFunc=Pessoa.objects.create_user('consultor', 'x', nomePess='Consultor'),
+        gestor=gestor,
+    )
+    for i in range(quantidade):
+        pessoa = Pessoa.objects.create_user(
+            f'assoc{i}', 'x', nomePess=f'Associado {i}',
+            emailPess=f'assoc{i}@teste.com',
+            telefonePess=f'1199999{i:04d}' if i % 2 else None,
+        )
+        associado = Associado.objects.create(
+            idPessAsso=pessoa,
+            idPlanAsso=plano if i % 2 else None,
+            consultor=consultor if i % 3 else None,
+            dataPagamentoAsso='2025-01-10' if i % 2 else None,
+        )
+        for v in range(i % 3):
+            Veiculo.objects.create(
+                associado=associado, nomeVeic='Caminhão', anoVeic=2020 + v,
+                placaVeic=f'ABC{i}{v}{v}{v}'[:7],
+            )
+
+
+class KeysetPaginationTest(TestCase):
+    """Paginação por cursor: continuidade com inserções, limite de page_size e cursor adulterado"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        Endereco.objects.bulk_create([
+            Endereco(logadouroEnde=f'Rua {i}', bairroEnde='Centro', cidadeEnde='Cidade') for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_continuidade_com_insercoes(self):
+        vistos = []
+        url = '/api/Endereco/?page_size=2'
+        while url:
+            dados = self.client.get(url).json()
+            vistos += [item['idEnde'] for item in dados['results']]
+            if len(vistos) == 2:
+                # Inserção entre as páginas: entra no fim, sem repetir nem pular linhas
+                Endereco.objects.create(logadouroEnde='Rua Nova', bairroEnde='Centro', cidadeEnde='Cidade')
+            url = dados['next']
+        self.assertEqual(vistos, list(Endereco.objects.order_by('idEnde').values_list('idEnde', flat=True)))
+        self.assertEqual(len(vistos), 6)
+
+    def test_page_size_limitado(self):
+        Endereco.objects.bulk_create([
+            Endereco(logadouroEnde=f'Rua {i}', bairroEnde='Centro', cidadeEnde='Cidade') for i in range(500)
+        ])
+        self.assertEqual(len(self.client.get('/api/Endereco/?page_size=1000').json()['results']), 500)
+        self.assertEqual(len(self.client.get('/api/Endereco/?page_size=3').json()['results']), 3)
+
+    def test_cursor_adulterado(self):
+        proxima = self.client.get('/api/Endereco/?page_size=2').json()['next']
+        cursor = parse_qs(urlsplit(proxima).query)['cursor'][0]
+        for invalido in (cursor[:-2] + 'zz', 'nao-e-base64', base64.b64encode(b'p=x&r=2').decode()):
+            with self.subTest(cursor=invalido):
+                self.assertEqual(self.client.get('/api/Endereco/', {'cursor': invalido}).status_code, 404)
+
+
+class SparseFieldsTest(TestCase):
+    """?fields=/?exclude=: campos da resposta e joins/prefetches do queryset"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def consultar(self, url, consultas):
+        with self.assertNumQueries(consultas), CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'], [consulta['sql'] for consulta in capturadas]
+
+    def test_fields_remove_joins_e_prefetch(self):
+        completo, _ = self.consultar('/api/associados/', 2)  # associados + prefetch dos veículos
+        self.assertIn('veiculos', completo[0])
+
+        linhas, sql = self.consultar('/api/associados/?fields=idAsso,pessoa_nome', 1)
+        self.assertEqual(set(linhas[0]), {'idAsso', 'pessoa_nome'})
+        self.assertEqual(sql[0].count('JOIN'), 1)  # só Pessoa
+        self.assertNotIn('"Plano"', sql[0])
+
+        linhas, _ = self.consultar('/api/associados/?exclude=veiculos', 1)
+        self.assertNotIn('veiculos', linhas[0])
+
+        linhas, sql = self.consultar('/api/funcionarios/?fields=idFunc', 1)
+        self.assertEqual(linhas[0], {'idFunc': linhas[0]['idFunc']})
+        self.assertNotIn('JOIN', sql[0])
+
+    def test_parametro_vazio_vale_todos_os_campos(self):
+        completo, _ = self.consultar('/api/associados/', 2)
+        for url in ('/api/associados/?fields=', '/api/associados/?exclude=', '/api/associados/?fields=,'):
+            with self.subTest(url=url):
+                self.assertEqual(self.consultar(url, 2)[0], completo)
+
+
+class ExportacaoStreamingTest(TestCase):
+    """Exportação em streaming: CSV/NDJSON completos, lidos do banco em lotes de chunk_size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_csv(self):
+        response = self.client.get('/api/export/associados/', {'formato': 'csv', 'fields': 'idAsso,pessoa_nome,veiculos'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="associados.csv"')
+        linhas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(linhas[0], ['idAsso', 'pessoa_nome'])  # listas aninhadas ficam fora do CSV
+        self.assertEqual(linhas[1:], [
+            [str(pk), nome] for pk, nome in Associado.objects.order_by('idAsso').values_list('idAsso', 'idPessAsso__nomePess')
+        ])
+
+    def test_ndjson(self):
+        response = self.client.get('/api/export/associados/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([linha['idAsso'] for linha in linhas], list(Associado.objects.order_by('idAsso').values_list('idAsso', flat=True)))
+        self.assertEqual(sum(len(linha['veiculos']) for linha in linhas), Veiculo.objects.count())
+        self.assertEqual(self.client.get('/api/export/associados/', {'formato': 'xml'}).status_code, 400)
+
+    def test_leitura_em_lotes(self):
+        serializadas = []
+        original = AssociadoSerializer.to_representation
+
+        def contar(serializer, instance):
+            serializadas.append(instance.pk)
+            return original(serializer, instance)
+
+        with mock.patch.object(AssociadoExportView, 'chunk_size', 2), \
+                mock.patch.object(AssociadoSerializer, 'to_representation', contar):
+            conteudo = self.client.get('/api/export/associados/').streaming_content
+            # Nada é lido antes de o corpo ser consumido, e cada linha sai assim que é serializada
+            self.assertEqual(serializadas, [])
+            # 6 associados em lotes de 2: 1 SELECT (iterator) + 1 prefetch de veículos por lote
+            with self.assertNumQueries(4):
+                next(conteudo)
+                self.assertEqual(len(serializadas), 1)
+                restantes = list(conteudo)
+        self.assertEqual(len(restantes), 5)
+
+
+class BuscaTest(TestCase):
+    """Validação do termo da busca (vale em qualquer banco: não chega a consultar)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_termo_curto(self):
+        for termo in ('', 'ab', '  ab  '):
+            with self.subTest(q=termo), self.assertNumQueries(0):
+                response = self.client.get('/api/busca/', {'q': termo})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Termo de busca muito curto')
+
+    def test_exige_autenticacao(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/busca/', {'q': 'silva'}).status_code, 401)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Busca por trigramas é específica do PostgreSQL')
+class BuscaTrigramaTest(TestCase):
+    """Ranking por similaridade e filtros icontains atendidos pelos índices GIN sobre UPPER(coluna)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        Pessoa.objects.create_user('silva', 'x', nomePess='SILVA')
+        Pessoa.objects.create_user('joana', 'x', nomePess='Joana Silva Pereira dos Santos')
+        Pessoa.objects.create_user('cpf', 'x', nomePess='Fulano', documentoPess='12345678901')
+        dono = Associado.objects.create(idPessAsso=Pessoa.objects.create_user('dono', 'x', nomePess='Dono'))
+        Veiculo.objects.create(associado=dono, nomeVeic='Caminhão', anoVeic=2020, placaVeic='ABC1D23')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _buscar(self, termo, **params):
+        response = self.client.get('/api/busca/', {'q': termo, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranking_por_similaridade(self):
+        pessoas = self._buscar('silva')['pessoas']
+        # Minúsculas casam com 'SILVA' (UPPER nos dois lados) e o nome mais parecido vem primeiro
+        self.assertEqual([p['nomePess'] for p in pessoas], ['SILVA', 'Joana Silva Pereira dos Santos'])
+        self.assertGreater(pessoas[0]['rank'], pessoas[1]['rank'])
+
+    def test_limit(self):
+        self.assertEqual(len(self._buscar('silva', limit=1)['pessoas']), 1)
+        self.assertEqual(len(self._buscar('silva', limit=500)['pessoas']), 2)
+
+    def test_cpf_com_pontuacao(self):
+        pessoas = self._buscar('123.456.789-01')['pessoas']
+        self.assertEqual([p['documentoPess'] for p in pessoas], ['12345678901'])
+
+    def test_placa_com_hifen_e_minusculas(self):
+        veiculos = self._buscar('abc-1d2')['veiculos']
+        self.assertEqual([v['placaVeic'] for v in veiculos], ['ABC1D23'])
+        self.assertEqual(veiculos[0]['associado_nome'], 'Dono')
+
+    def test_icontains_usa_indice_trigram(self):
+        queryset = Pessoa.objects.filter(nomePess__icontains='silva')
+        self.assertIn('UPPER(', str(queryset.query))
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            self.assertIn('pessoa_nome_trgm', queryset.explain())
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+
+class PlacasTest(SimpleTestCase):
+    """Forma canônica e chave Mercosul das placas"""
+
+    def test_normalizar(self):
+        for valor, esperado in (('abc-1234', 'ABC1234'), (' abc 1d23 ', 'ABC1D23'), ('ABC1D23', 'ABC1D23'), (None, '')):
+            with self.subTest(valor=valor):
+                self.assertEqual(placas.normalizar_placa(valor), esperado)
+
+    def test_chave_mercosul(self):
+        # 2º dígito vira letra (0=A ... 9=J); a placa Mercosul é a própria chave
+        for placa, chave in (('ABC1234', 'ABC1C34'), ('abc-1034', 'ABC1A34'), ('XYZ9999', 'XYZ9J99'), ('ABC1C34', 'ABC1C34')):
+            with self.subTest(placa=placa):
+                self.assertEqual(placas.chave_mercosul(placa), chave)
+
+    def test_placa_valida(self):
+        self.assertTrue(placas.placa_valida('ABC1234'))
+        self.assertTrue(placas.placa_valida('ABC1D23'))
+        for invalida in ('AB1234', 'ABC12345', 'ABCD123', '1BC1234'):
+            self.assertFalse(placas.placa_valida(invalida))
+
+
+class VeiculoPlacaTest(TestCase):
+    """Veiculo.save grava a forma canônica e a chave; a duplicidade vale entre os dois padrões"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.associado = Associado.objects.create(idPessAsso=Pessoa.objects.create_user('dono', 'x', nomePess='Dono'))
+
+    def _veiculo(self, placa):
+        return Veiculo.objects.create(associado=self.associado, nomeVeic='Caminhão', placaVeic=placa)
+
+    def test_save_normaliza(self):
+        veiculo = self._veiculo('abc-1234')
+        veiculo.refresh_from_db()
+        self.assertEqual((veiculo.placaVeic, veiculo.placaMercosulVeic), ('ABC1234', 'ABC1C34'))
+
+    def test_save_update_fields_atualiza_chave(self):
+        veiculo = self._veiculo('ABC1234')
+        veiculo.placaVeic = 'xyz-9d99'
+        veiculo.save(update_fields=['placaVeic'])
+        veiculo.refresh_from_db()
+        self.assertEqual((veiculo.placaVeic, veiculo.placaMercosulVeic), ('XYZ9D99', 'XYZ9D99'))
+
+    def test_duplicada_entre_padroes(self):
+        self._veiculo('ABC1234')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._veiculo('ABC1C34')
+
+        serializer = VeiculoSerializer(data={
+            'nomeVeic': 'Outro', 'placaVeic': 'abc1c34', 'associado': self.associado.idAsso,
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['placaVeic'], ['Já existe um veículo com esta placa'])
+
+    def test_edicao_mantem_a_propria_placa(self):
+        veiculo = self._veiculo('ABC1234')
+        serializer = VeiculoSerializer(veiculo, data={'placaVeic': 'ABC1C34'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().placaMercosulVeic, 'ABC1C34')
+
+
+class NormalizarPlacasMigracaoTest(TestCase):
+    """
+    Backfill da 0005. A função usa apps.get_model, então roda com o
+    registro atual; bulk_create pula o Veiculo.save e deixa as placas cruas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.associado = Associado.objects.create(idPessAsso=Pessoa.objects.create_user('dono', 'x', nomePess='Dono'))
+
+    def _crus(self, *placas_cruas):
+        Veiculo.objects.bulk_create([
+            Veiculo(associado=self.associado, nomeVeic='Caminhão', placaVeic=placa, placaMercosulVeic=f'tmp{i}')
+            for i, placa in enumerate(placas_cruas)
+        ])
+
+    def test_preenche_forma_canonica_e_chave(self):
+        self._crus('abc-1234', 'xyz 9d99')
+        migracao_0005.normalizar_placas(django_apps, None)
+        self.assertEqual(
+            sorted(Veiculo.objects.values_list('placaVeic', 'placaMercosulVeic')),
+            [('ABC1234', 'ABC1C34'), ('XYZ9D99', 'XYZ9D99')],
+        )
+
+    def test_colisao_nao_altera_nada(self):
+        self._crus('abc-1234', 'ABC1C34', 'DEF5678')
+        with self.assertRaisesMessage(RuntimeError, 'ABC1C34'):
+            migracao_0005.normalizar_placas(django_apps, None)
+        self.assertEqual(
+            sorted(Veiculo.objects.values_list('placaVeic', flat=True)), ['ABC1C34', 'DEF5678', 'abc-1234']
+        )
+
+
+class ContadoresTest(TestCase):
+    """Contadores do dashboard mantidos pelos signals e pelo bulk da importação, aplicados só no commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        contadores.recalcular()
+
+    def assertContadores(self):
+        self.assertEqual(contadores.ler(), contadores.calcular())
+
+    def _associado(self, usuario):
+        return Associado.objects.create(idPessAsso=Pessoa.objects.create_user(usuario, 'x', nomePess=usuario))
+
+    def test_criacao_e_exclusao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            associado = self._associado('novo')
+            veiculo = Veiculo.objects.create(associado=associado, nomeVeic='Caminhão', placaVeic='NOV1234')
+            funcionario = Funcionario.objects.create(
+                idPessFunc=Pessoa.objects.create_user('func', 'x', nomePess='Func'), is_gestor=True,
+            )
+        self.assertContadores()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            veiculo.delete()
+            funcionario.delete()
+        self.assertContadores()
+        # Exclusão em cascata: os veículos do associado também saem do contador
+        with self.captureOnCommitCallbacks(execute=True):
+            Associado.objects.filter(veiculos__isnull=False).distinct().first().delete()
+        self.assertContadores()
+
+    def test_troca_de_papel(self):
+        funcionario = Funcionario.objects.get(is_gestor=False)
+        funcionario.is_gestor = True
+        with self.captureOnCommitCallbacks(execute=True):
+            funcionario.save()
+        valores = contadores.ler()
+        self.assertEqual((valores['gestores'], valores['consultores']), (2, 0))
+        self.assertContadores()
+
+    def test_exclusao_por_queryset(self):
+        # QuerySet.delete() com signals conectados dispara post_delete por linha
+        with self.captureOnCommitCallbacks(execute=True):
+            Veiculo.objects.all().delete()
+            Associado.objects.filter(idPlanAsso__isnull=True).delete()
+        self.assertEqual(contadores.ler()['veiculos'], 0)
+        self.assertContadores()
+
+    def test_bulk_da_importacao(self):
+        consultor = Funcionario.objects.get(is_gestor=False)
+        validas, erros = importacao.validar([
+            {'nomePess': f'Lote {i}', 'usuarioPess': f'lote{i}', 'password': 'segredo', 'consultor': consultor.pk,
+             'veiculos': [{'nomeVeic': 'Caminhão', 'placaVeic': f'LOT{i}A{i}{i}'}]}
+            for i in range(3)
+        ])
+        self.assertEqual(erros, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            importacao.importar_associados(validas)
+        self.assertContadores()
+
+    def test_so_no_commit_e_em_ordem(self):
+        antes = contadores.ler()
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks() as callbacks:
+                contadores.incrementar(veiculos=1, associados=1, gestores=0)
+            # Nada travado na transação de quem chamou
+            self.assertEqual(len(consultas), 0)
+            for callback in callbacks:
+                callback()
+        # Um UPDATE por contador, sempre em ordem de nome (o mesmo para todos os caminhos)
+        self.assertEqual([c['sql'].split("'")[-2] for c in consultas.captured_queries], ['associados', 'veiculos'])
+        depois = contadores.ler()
+        self.assertEqual((depois['associados'], depois['veiculos']), (antes['associados'] + 1, antes['veiculos'] + 1))
+
+    def test_rollback(self):
+        antes = contadores.ler()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                associado = self._associado('desfeito')
+                Veiculo.objects.create(associado=associado, nomeVeic='Caminhão', placaVeic='DES1234')
+                Funcionario.objects.get(is_gestor=False).delete()
+                raise RuntimeError
+        # Os UPDATEs dos contadores ficam para o commit e são descartados junto
+        self.assertEqual(contadores.ler(), antes)
+        self.assertContadores()
+
+    def test_contador_ausente_recalcula(self):
+        Contador.objects.filter(nome='veiculos').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._associado('outro')
+        self.assertContadores()
+
+
+class CacheReferenciasTest(TestCase):
+    """Invalidação do cache das referências só no commit e estatísticas de acerto"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.plano = Plano.objects.create(nomePlan='Básico')
+
+    def setUp(self):
+        cache.clear()
+        cache_referencias._stats.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/Plano/{self.plano.pk}/'
+
+    def test_versao_muda_depois_do_commit(self):
+        antes = cache_referencias.versao(Plano)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Plano.objects.filter(pk=self.plano.pk).get().save()
+            self.assertEqual(cache_referencias.versao(Plano), antes)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(cache_referencias.versao(Plano), antes)
+
+    def test_rollback_nao_invalida(self):
+        antes = cache_referencias.versao(Plano)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Plano.objects.create(nomePlan='Descartado')
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache_referencias.versao(Plano), antes)
+
+    def test_edicao_pela_api_invalida_o_detalhe(self):
+        self.assertEqual(self.client.get(self.url).json()['nomePlan'], 'Básico')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'nomePlan': 'Premium'}, format='json')
+        self.assertEqual(self.client.get(self.url).json()['nomePlan'], 'Premium')
+
+    def test_estatisticas(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        # Com acerto só resta a consulta de versão do ETag (ConditionalGetMixin)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        processo = self.client.get('/api/cache/stats/').json()['processo']
+        self.assertEqual(processo['plano'], {'hits': 3, 'misses': 1, 'hit_rate': 0.75})
+
+    def test_estatisticas_so_para_staff(self):
+        self.client.force_authenticate(Pessoa.objects.create_user('comum', 'x', nomePess='Comum'))
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+
+
+class ConditionalGetTest(TestCase):
+    """ETag/Last-Modified dos detalhes: 304 pela consulta de versão e edições no mesmo segundo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.plano = Plano.objects.create(nomePlan='Básico')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/Plano/{self.plano.pk}/'
+
+    def _tocar(self, quando):
+        Plano.objects.filter(pk=self.plano.pk).update(updated_at=quando)
+
+    def test_if_none_match_sem_carregar_a_linha(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('MAX(', consultas[0]['sql'])
+        self.assertNotIn('nomePlan', consultas[0]['sql'])
+
+    def test_edicoes_no_mesmo_segundo(self):
+        segundo = timezone.now().replace(microsecond=0) - timedelta(minutes=1)
+        self._tocar(segundo.replace(microsecond=100))
+        primeira = self.client.get(self.url)
+        self._tocar(segundo.replace(microsecond=200))
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primeira['ETag'])
+        self.assertEqual(segunda['Last-Modified'], primeira['Last-Modified'])
+
+    def test_last_modified(self):
+        self._tocar(timezone.now() - timedelta(minutes=1))
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Alteração no segundo corrente: sem Last-Modified até o segundo virar
+        agora = timezone.now()
+        self._tocar(agora)
+        with mock.patch('membertruck_app.conditional.time') as relogio:
+            relogio.time.return_value = agora.timestamp()  # sem virar o segundo no meio do teste
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('ETag', response)
+
+    def test_updated_at_fora_da_resposta(self):
+        self.assertNotIn('updated_at', self.client.get(self.url).json())
+
+
+class ValuesReaderParityTest(TestCase):
+    """A leitura rápida deve produzir exatamente o mesmo JSON dos serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_associado_paridade_serializer(self):
+        queryset = Associado.objects.order_by('idAsso')
+        esperado = AssociadoSerializer(
+            queryset.select_related('idPessAsso', 'idPlanAsso', 'consultor__idPessFunc')
+            .prefetch_related('veiculos'),
+            many=True,
+        ).data
+        reader = ValuesReader(AssociadoSerializer(), Associado)
+        obtido = reader.rows(reader.values(queryset))
+        self.assertEqual([dict(item) for item in esperado], obtido)
+        self.assertEqual([list(item) for item in esperado], [list(item) for item in obtido])
+
+    def test_veiculo_paridade_serializer(self):
+        queryset = Veiculo.objects.order_by('idVeic')
+        esperado = VeiculoSerializer(queryset.select_related('associado__idPessAsso'), many=True).data
+        reader = ValuesReader(VeiculoSerializer(), Veiculo)
+        self.assertEqual([dict(item) for item in esperado], reader.rows(reader.values(queryset)))
+
+    def test_endpoints_paridade(self):
+        associado = Associado.objects.first()
+        for url in [
+            '/api/associados/',
+            '/api/associados/?fields=idAsso,pessoa_nome,veiculos',
+            f'/api/associados/{associado.idAsso}/',
+            '/api/Veiculo/',
+        ]:
+            with self.subTest(url=url):
+                normal = self.client.get(url)
+                rapido = self.client.get(url + ('&' if '?' in url else '?') + 'fast=1')
+                self.assertEqual(normal.status_code, 200)
+                self.assertEqual(normal.json(), rapido.json())
+
+
+
+@override_settings(IMPORTACAO_LOTE=2)
+class AssociadoImportacaoTest(TestCase):
+    """Importação em lote: validação antecipada, erros por linha e gravação com bulk_create"""
+
+    url = '/api/associados/importar/'
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base(quantidade=1)
+        cls.plano = Plano.objects.get()
+        cls.consultor = Funcionario.objects.get(is_gestor=False)
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _linha(self, i, **extra):
+        return {
+            'nomePess': f'Motorista {i}', 'usuarioPess': f'motorista{i}', 'password': 'segredo',
+            'emailPess': f'motorista{i}@frota.com', 'idPlanAsso': self.plano.pk,
+            'consultor': self.consultor.pk, **extra,
+        }
+
+    def test_importa_json_em_lotes(self):
+        contadores.recalcular()
+        linhas = [
+            self._linha(i, veiculos=[{'nomeVeic': 'Caminhão', 'placaVeic': f'frt-{i}a{i}{i}'}])
+            for i in range(5)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, linhas, format='json')
+
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertEqual(response.json()['criados'], 5)
+        associado = Associado.objects.get(idPessAsso__usuarioPess='motorista3')
+        self.assertEqual(associado.consultor, self.consultor)
+        self.assertTrue(associado.idPessAsso.check_password('segredo'))
+        self.assertEqual(associado.veiculos.get().placaMercosulVeic, 'FRT3A33')
+        self.assertEqual(contadores.ler(), contadores.calcular())
+
+    def test_erros_por_linha_sem_gravar(self):
+        linhas = [
+            self._linha(1),
+            self._linha(2, usuarioPess='motorista1'),
+            self._linha(3, consultor=999999),
+            self._linha(4, usuarioPess='gestor'),
+            self._linha(5, veiculos=[{'nomeVeic': 'Caminhão', 'placaVeic': 'XX'}]),
+        ]
+        response = self.client.post(self.url, linhas, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([erro['linha'] for erro in response.json()['erros']], [2, 3, 4, 5])
+        self.assertIn('consultor', response.json()['erros'][1]['erros'])
+        self.assertFalse(Pessoa.objects.filter(usuarioPess__startswith='motorista').exists())
+
+        response = self.client.post(self.url + '?parcial=1', linhas, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['linha'] for item in response.json()['associados']], [1])
+
+    def test_importa_csv(self):
+        conteudo = (
+            'nomePess;usuarioPess;password;idPlanAsso;placaVeic;nomeVeic\n'
+            f'Motorista 1;motorista1;segredo;{self.plano.pk};ABC1234;Caminhão\n'
+            'Motorista 2;motorista2;segredo;;ABC1C34;Carreta\n'
+        )
+        arquivo = SimpleUploadedFile('frota.csv', conteudo.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'arquivo': arquivo}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['erros'][0]['linha'], 3)  # mesma placa nas duas grafias
+        self.assertIn('veiculos', response.json()['erros'][0]['erros'])
+
+    def test_senha_com_o_hasher_padrao(self):
+        self.client.post(self.url, [self._linha(1)], format='json')
+        pessoa = Pessoa.objects.get(usuarioPess='motorista1')
+        self.assertEqual(identify_hasher(pessoa.password).algorithm, get_hasher('default').algorithm)
+        self.assertTrue(pessoa.check_password('segredo'))
+
+    @override_settings(IMPORTACAO_WORKERS=2)
+    def test_hash_em_processos_spawn(self):
+        senhas = importacao.hash_senhas(['a', 'b', 'c', 'd'])
+        self.assertEqual(len(set(senhas)), 4)
+        self.assertTrue(all(check_password(senha, hash) for senha, hash in zip('abcd', senhas)))
+        # O pool fica para as próximas importações do processo
+        pool = importacao._pool
+        self.assertIsNotNone(pool)
+        importacao.hash_senhas(['e', 'f', 'g', 'h'])
+        self.assertIs(importacao._pool, pool)
+
+    @override_settings(IMPORTACAO_MAX_LINHAS=1)
+    def test_comando_sem_limite_da_api(self):
+        linhas = [self._linha(1), self._linha(2)]
+        self.assertEqual(self.client.post(self.url, linhas, format='json').status_code, 400)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as arquivo:
+            json.dump(linhas, arquivo)
+            arquivo.flush()
+            saida = io.StringIO()
+            call_command('importar_associados', arquivo.name, stdout=saida)
+        self.assertIn('2 de 2 associados importados', saida.getvalue())
+        self.assertEqual(Pessoa.objects.filter(usuarioPess__startswith='motorista').count(), 2)
+
+    def test_serializer_grava_pela_importacao(self):
+        contexto = {'planos': {self.plano.pk}, 'consultores': {self.consultor.pk}}
+        serializer = AssociadoImportacaoSerializer(
+            data=self._linha(1, veiculos=[{'nomeVeic': 'Caminhão', 'placaVeic': 'imp-1234'}]), context=contexto,
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        associado = serializer.save()
+        self.assertEqual(associado.idPessAsso.usuarioPess, 'motorista1')
+        self.assertEqual(associado.veiculos.get().placaVeic, 'IMP1234')
+
+
+
+@override_settings(ULTIMO_LOGIN_LOTE=1000, ULTIMO_LOGIN_INTERVALO=3600)
+class LoginTest(TestCase):
+    """Login JWT: papel do usuário no mesmo SELECT da autenticação e last_login em lote"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base(quantidade=1)
+
+    def setUp(self):
+        ultimo_login.descarregar()  # buffer é por processo: não herda logins de outro teste
+
+    def _login(self, usuario):
+        return self.client.post('/api/login/', {'usuarioPess': usuario, 'password': 'x'}, content_type='application/json')
+
+    def test_papel_em_uma_consulta(self):
+        esperado = {
+            'gestor': {'tipo_usuario': 'funcionario', 'is_gestor': True},
+            'assoc0': {'tipo_usuario': 'associado'},
+        }
+        for usuario, papel in esperado.items():
+            with self.subTest(usuario=usuario), self.assertNumQueries(1):
+                response = self._login(usuario)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(papel.items(), response.json()['user_info'].items())
+
+    def test_last_login_em_lote(self):
+        self.assertEqual(self._login('consultor').status_code, 200)
+        self.assertIsNone(Pessoa.objects.get(usuarioPess='consultor').last_login)
+
+        self.assertEqual(ultimo_login.descarregar(), 1)
+        self.assertIsNotNone(Pessoa.objects.get(usuarioPess='consultor').last_login)
+
+    def test_last_login_gravado_na_proxima_requisicao(self):
+        self.assertEqual(self._login('consultor').status_code, 200)
+        self.assertIsNone(Pessoa.objects.get(usuarioPess='consultor').last_login)
+
+        # Sem novos logins: passado o intervalo, qualquer requisição grava o buffer
+        with override_settings(ULTIMO_LOGIN_INTERVALO=0):
+            self.client.get('/api/health/')
+        self.assertIsNotNone(Pessoa.objects.get(usuarioPess='consultor').last_login)
+
+
+
+class JWTStatelessTest(TestCase):
+    """Modo JWT_STATELESS: claims de papel no token e nenhuma consulta para autenticar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base(quantidade=1)
+        Pessoa.objects.filter(usuarioPess='gestor').update(is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        usuarios.limpar()
+        response = self.client.post(
+            '/api/login/', {'usuarioPess': 'gestor', 'password': 'x'}, content_type='application/json'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {response.json()["access"]}'}
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url, **self.auth).status_code, 200)
+        return len(consultas)
+
+    def test_uma_consulta_a_menos(self):
+        with override_settings(JWT_STATELESS=True):
+            self._consultas('/api/associados/')  # Primeira requisição carrega a Pessoa no cache
+        for url in ['/api/associados/', '/api/Veiculo/', '/api/funcionarios/']:
+            with self.subTest(url=url):
+                with override_settings(JWT_STATELESS=False):
+                    com_banco = self._consultas(url)
+                with override_settings(JWT_STATELESS=True):
+                    sem_banco = self._consultas(url)
+                self.assertEqual(sem_banco, com_banco - 1)
+
+    @override_settings(JWT_STATELESS=True)
+    def test_claims_e_pessoa_do_cache(self):
+        request = self.client.get('/api/associados/', **self.auth).wsgi_request
+        user = request.user
+        self.assertTrue(user.is_staff)
+        self.assertEqual((user.tipo_usuario, user.is_gestor, user.associado_id), ('funcionario', True, None))
+        with self.assertNumQueries(0):
+            self.assertEqual(user.nomePess, 'Gestor')
+
+    @override_settings(JWT_STATELESS=True)
+    def test_token_recusado_apos_desativar(self):
+        self.assertEqual(self.client.get('/api/associados/', **self.auth).status_code, 200)
+        pessoa = Pessoa.objects.get(usuarioPess='gestor')
+        pessoa.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            pessoa.save()
+        response = self.client.get('/api/associados/', **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+    @override_settings(JWT_STATELESS=True)
+    def test_token_recusado_apos_troca_de_papel(self):
+        self.assertEqual(self.client.get('/api/associados/', **self.auth).status_code, 200)
+        funcionario = Funcionario.objects.get(idPessFunc__usuarioPess='gestor')
+        funcionario.is_gestor = False
+        with self.captureOnCommitCallbacks(execute=True):
+            funcionario.save()
+        response = self.client.get('/api/associados/', **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_changed')
+
+    @override_settings(JWT_STATELESS=True)
+    def test_cache_invalidado_ao_desativar(self):
+        pk = Pessoa.objects.get(usuarioPess='gestor').pk
+        self.assertTrue(usuarios.obter(pk).is_active)
+        pessoa = Pessoa.objects.get(pk=pk)
+        pessoa.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            pessoa.save()
+        self.assertFalse(usuarios.obter(pk).is_active)
+
+    @override_settings(JWT_STATELESS=True)
+    def test_sem_redis_le_do_banco(self):
+        pk = Pessoa.objects.get(usuarioPess='gestor').pk
+        usuarios.obter(pk)
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError('Redis fora')), \
+                self.assertLogs('membertruck_app', 'WARNING'):
+            self.assertGreater(self._consultas('/api/associados/'), 0)
+            # Sem a versão não dá para confiar na entrada do processo
+            with self.assertNumQueries(1):
+                usuarios.obter(pk)
+
+    @override_settings(JWT_STATELESS=True, DB_REPLICAS=['replica1'], DB_PRIMARIO_APOS_ESCRITA=5)
+    def test_releitura_no_primario_apos_invalidar(self):
+        pk = Pessoa.objects.get(usuarioPess='gestor').pk
+        usuarios.descartar(pk)
+        # 'replica1' não existe aqui: ler dela levantaria ConnectionDoesNotExist. Fora da
+        # transação do TestCase, para o roteador não mandar tudo para o primário
+        token = roteador.usar_replica('replica1')
+        try:
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(Plano.objects.all().db, 'replica1')
+                self.assertEqual(usuarios.obter(pk).pk, pk)
+        finally:
+            roteador.restaurar(token)
+
+
+
+@override_settings(CAMPANHA_WORKERS=0, WHATSAPP_TAXA=0, CAMPANHA_LOTE=2, WHATSAPP_REMETENTE=REMETENTE_FAKE)
+class CampanhaTest(TestCase):
+    """Campanha: mensagens geradas num INSERT ... SELECT e enviadas depois pelos workers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        RemetenteFake.limpar()
+
+    def test_cria_e_envia(self):
+        with self.assertNumQueries(5):  # savepoint, campanha, INSERT ... SELECT, total, release
+            campanha = campanhas.criar_campanha(
+                'Cobrança', 'cobranca', 'Olá {nome}, o plano {plano} venceu em {vencimento}', {'inadimplente': True}
+            )
+
+        # Inadimplentes com telefone: associados ímpares (1, 3, 5)
+        self.assertEqual(campanha.total, 3)
+        mensagem = MensagemWhatsApp.objects.get(associado__idPessAsso__usuarioPess='assoc1')
+        self.assertEqual(mensagem.status, 'pendente')
+        self.assertEqual(mensagem.conteudo, 'Olá Associado 1, o plano Plano Teste venceu em 10/01/2025')
+
+        self.assertEqual(fila.drenar(campanha.pk), (3, 0))
+        self.assertEqual(len(RemetenteFake.enviadas), 3)
+        self.assertFalse(campanha.mensagens.exclude(status='enviada').exists())
+
+    def test_api(self):
+        plano = Plano.objects.get()
+        response = self.client.post('/api/campanhas/', {
+            'nome': 'Promo', 'tipoMensagem': 'promocional', 'template': 'Oi {nome}', 'segmento': {'plano': plano.pk},
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['total'], 3)
+        self.assertEqual(Campanha.objects.get().segmento, {'plano': plano.pk})
+
+        detalhe = self.client.get(f'/api/campanhas/{response.json()["idCampanha"]}/').json()
+        self.assertEqual((detalhe['pendentes'], detalhe['enviadas'], detalhe['erros']), (3, 0, 0))
+
+        response = self.client.post('/api/campanhas/', {
+            'nome': 'X', 'tipoMensagem': 'promocional', 'template': 'Oi {apelido}', 'segmento': {},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('template', response.json())
+
+
+
+class RemetenteInstavel(RemetenteFake):
+    """Falha temporária nas primeiras `falhas` chamadas de cada telefone"""
+
+    def __init__(self, falhas):
+        self.falhas, self.chamadas = falhas, {}
+
+    def enviar(self, telefone, conteudo):
+        self.chamadas[telefone] = self.chamadas.get(telefone, 0) + 1
+        if telefone and self.chamadas[telefone] <= self.falhas:
+            raise ErroEnvio('Provedor indisponível')
+        super().enviar(telefone, conteudo)
+
+
+@override_settings(
+    WHATSAPP_TAXA=0, WHATSAPP_MAX_TENTATIVAS=2, WHATSAPP_BACKOFF=30, WHATSAPP_VISIBILIDADE=300,
+    WHATSAPP_REMETENTE=REMETENTE_FAKE,
+)
+class FilaMensagensTest(TestCase):
+    """Fila: reserva com visibilidade, retentativa com backoff e erro após o limite"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base(quantidade=4)
+
+    def setUp(self):
+        RemetenteFake.limpar()
+        # Associados 1 e 3 têm telefone; 0 e 2 não
+        MensagemWhatsApp.objects.bulk_create([
+            MensagemWhatsApp(associado=associado, tipoMensagem='promocional', conteudo='Oi')
+            for associado in Associado.objects.order_by('idAsso')
+        ])
+
+    def _status(self):
+        return dict(MensagemWhatsApp.objects.values('status').annotate(n=Count('pk')).values_list('status', 'n'))
+
+    def test_reserva_esconde_ate_vencer_visibilidade(self):
+        self.assertEqual(len(fila.reservar(10)), 4)
+        self.assertEqual(fila.reservar(10), [])  # reservadas: invisíveis para outros workers
+
+        # Worker caiu sem gravar resultado: vencida a visibilidade, voltam para a fila
+        MensagemWhatsApp.objects.update(proximaTentativa=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([tentativas for *_, tentativas in fila.reservar(10)], [2, 2, 2, 2])
+
+    def test_retentativa_com_backoff_e_erro(self):
+        remetente = RemetenteInstavel(falhas=1)
+        self.assertEqual(fila.drenar(remetente=remetente), (0, 2))  # sem telefone: erro direto
+        self.assertEqual(self._status(), {'pendente': 2, 'erro': 2})
+        espera = MensagemWhatsApp.objects.filter(status='pendente').values_list('proximaTentativa', flat=True)
+        self.assertTrue(all(data > timezone.now() + timedelta(seconds=20) for data in espera))
+
+        MensagemWhatsApp.objects.filter(status='pendente').update(proximaTentativa=timezone.now())
+        self.assertEqual(fila.drenar(remetente=remetente), (2, 0))
+        self.assertEqual(self._status(), {'enviada': 2, 'erro': 2})
+
+        # Falha em todas as tentativas: após WHATSAPP_MAX_TENTATIVAS vai para 'erro'
+        remetente = RemetenteInstavel(falhas=5)
+        MensagemWhatsApp.objects.update(status='pendente', tentativas=0, proximaTentativa=timezone.now())
+        fila.drenar(remetente=remetente)
+        MensagemWhatsApp.objects.filter(status='pendente').update(proximaTentativa=timezone.now())
+        fila.drenar(remetente=remetente)
+        self.assertEqual(self._status(), {'erro': 4})
+
+    def test_erro_inesperado_no_meio_do_lote(self):
+        class RemetenteComBug(RemetenteFake):
+            chamadas = 0
+
+            def enviar(self, telefone, conteudo):
+                RemetenteComBug.chamadas += 1
+                if RemetenteComBug.chamadas == 3:
+                    raise RuntimeError('bug no remetente')
+
+        terceira = MensagemWhatsApp.objects.order_by('idMensagem')[2]
+        with self.assertLogs('membertruck_app', 'ERROR'):
+            self.assertEqual(fila.processar(fila.reservar(10), RemetenteComBug()), (3, 0))
+        # As enviadas antes e depois ficam gravadas; a do erro volta para a fila com backoff
+        self.assertEqual(self._status(), {'enviada': 3, 'pendente': 1})
+        terceira.refresh_from_db()
+        self.assertEqual((terceira.status, terceira.ultimoErro), ('pendente', 'Erro inesperado: bug no remetente'))
+        self.assertGreater(terceira.proximaTentativa, timezone.now() + timedelta(seconds=20))
+
+    def test_enviadas_gravadas_se_o_lote_for_interrompido(self):
+        lote = fila.reservar(10)
+        with mock.patch.object(fila.limite, 'aguardar', side_effect=[None, None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                fila.processar(lote, RemetenteFake())
+        self.assertEqual(self._status(), {'erro': 1, 'enviada': 1, 'pendente': 2})
+
+    def test_worker_sobrevive_a_lote_com_erro(self):
+        with mock.patch.object(fila, 'processar', side_effect=RuntimeError('banco fora')), \
+                self.assertLogs('membertruck_app', 'ERROR'):
+            call_command('processar_mensagens', '--uma-vez', stdout=io.StringIO())
+
+    def test_metricas(self):
+        metricas = fila.metricas()
+        self.assertEqual((metricas['pendentes'], metricas['prontas']), (4, 4))
+        fila.drenar()
+        self.assertEqual(fila.metricas()['pendentes'], 0)
+        self.assertGreater(fila.metricas()['mensagens_por_segundo'], 0)
+
+
+@override_settings(WHATSAPP_NUMERO_ID='123', WHATSAPP_TOKEN='tk', WHATSAPP_API_URL='https://provedor/v1/')
+class RemetenteTest(SimpleTestCase):
+    """Remetente da Cloud API (HTTP simulado no urlopen), RemetenteFake limitado e limite de taxa no Redis"""
+
+    def _erro_http(self, codigo):
+        return HTTPError('https://provedor', codigo, 'erro', {}, io.BytesIO(b'{"error": "x"}'))
+
+    def test_envia_texto(self):
+        with mock.patch('membertruck_app.whatsapp.urlopen') as urlopen:
+            RemetenteCloudAPI().enviar('(11) 99999-0001', 'Oi')
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, 'https://provedor/v1/123/messages')
+        self.assertEqual(request.get_header('Authorization'), 'Bearer tk')
+        self.assertEqual(json.loads(request.data), {
+            'messaging_product': 'whatsapp', 'to': '5511999990001', 'type': 'text', 'text': {'body': 'Oi'},
+        })
+
+    def test_classifica_erros(self):
+        remetente = RemetenteCloudAPI()
+        for erro, permanente in ((self._erro_http(400), True), (self._erro_http(429), False),
+                                 (self._erro_http(503), False), (self._erro_http(401), False),
+                                 (URLError('timeout'), False), (TimeoutError(), False),
+                                 (RemoteDisconnected('fechou'), False), (IncompleteRead(b''), False),
+                                 (ConnectionResetError(), False)):
+            with self.subTest(erro=erro), mock.patch('membertruck_app.whatsapp.urlopen', side_effect=erro):
+                with self.assertRaises(ErroEnvio) as contexto:
+                    remetente.enviar('11999990001', 'Oi')
+                self.assertEqual(contexto.exception.permanente, permanente)
+        with self.assertRaises(ErroEnvio) as contexto:
+            remetente.enviar(None, 'Oi')
+        self.assertTrue(contexto.exception.permanente)
+
+    def test_padrao_exige_credenciais(self):
+        with override_settings(WHATSAPP_REMETENTE='membertruck_app.whatsapp.RemetenteCloudAPI', WHATSAPP_TOKEN=''):
+            with self.assertRaises(ImproperlyConfigured):
+                obter_remetente()
+
+    def test_fake_limitado(self):
+        RemetenteFake.limpar()
+        remetente = RemetenteFake()
+        for i in range(RemetenteFake.LIMITE + 10):
+            remetente.enviar('11999990001', f'm{i}')
+        self.assertEqual(len(RemetenteFake.enviadas), RemetenteFake.LIMITE)
+        self.assertEqual(RemetenteFake.enviadas[-1][1], f'm{RemetenteFake.LIMITE + 9}')
+        RemetenteFake.limpar()
+
+    @override_settings(WHATSAPP_TAXA=2)
+    def test_limite_compartilhado_entre_processos(self):
+        cache.clear()
+        # Duas instâncias fazem o papel de dois processos: dividem a janela pelo Redis
+        processo_a, processo_b = LimiteTaxa(), LimiteTaxa()
+        with mock.patch('membertruck_app.whatsapp.time') as relogio:
+            relogio.time.side_effect = [100.0, 100.0, 100.0, 101.0]
+            processo_a.aguardar()  # 1ª posição da janela: sem espera
+            processo_b.aguardar()  # 2ª: espera 1/taxa
+            processo_a.aguardar()  # janela cheia: espera a próxima e entra nela
+        self.assertEqual([c.args[0] for c in relogio.sleep.call_args_list], [0.5, 1.0])
+
+
+@override_settings(CAMPANHA_WORKERS=0, COBRANCA_ANTECEDENCIA=3, WHATSAPP_REMETENTE=REMETENTE_FAKE)
+class CobrancaTest(TestCase):
+    """Cobrança incremental: cada vencimento gera um aviso e uma cobrança, uma única vez"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()  # associados 1, 3 e 5: plano, telefone e vencimento em 10/01/2025
+
+    def test_incremental_sem_duplicar(self):
+        self.assertEqual(gerar_cobrancas(date(2025, 1, 8)), {'aviso': 3, 'vencido': 0})
+        self.assertEqual(gerar_cobrancas(date(2025, 1, 8)), {'aviso': 0, 'vencido': 0})
+        self.assertEqual(gerar_cobrancas(date(2025, 1, 11)), {'aviso': 0, 'vencido': 3})
+        self.assertEqual(gerar_cobrancas(date(2025, 1, 12)), {'aviso': 0, 'vencido': 0})
+
+        mensagem = MensagemWhatsApp.objects.get(associado__idPessAsso__usuarioPess='assoc1', referencia__startswith='vencido')
+        self.assertEqual(mensagem.referencia, 'vencido:2025-01-10')
+        self.assertIn('venceu em 10/01/2025', mensagem.conteudo)
+        self.assertEqual(Campanha.objects.count(), 2)  # execuções sem mensagens não deixam campanha vazia
+
+        # Pagou: novo vencimento entra no aviso quando chegar a janela
+        associado = Associado.objects.get(idPessAsso__usuarioPess='assoc1')
+        associado.dataPagamentoAsso = date(2025, 2, 10)
+        associado.save()
+        self.assertEqual(gerar_cobrancas(date(2025, 2, 8)), {'aviso': 1, 'vencido': 0})
+
+        # Reprocessar tudo não repete nenhuma cobrança
+        self.assertEqual(gerar_cobrancas(date(2025, 2, 8), completo=True), {'aviso': 0, 'vencido': 0})
+        self.assertEqual(MensagemWhatsApp.objects.count(), 7)
+
+    @override_settings(CAMPANHA_WORKERS=4)
+    def test_comando_so_enfileira(self):
+        with mock.patch('threading.Thread.start') as start, self.captureOnCommitCallbacks(execute=True):
+            call_command('gerar_cobrancas', '--data=2025-01-08', stdout=io.StringIO())
+        start.assert_not_called()
+        self.assertEqual(MensagemWhatsApp.objects.filter(status='pendente').count(), 3)
+
+    def test_alterado_depois_da_execucao(self):
+        gerar_cobrancas(date(2025, 1, 20))
+        self.assertEqual(MensagemWhatsApp.objects.count(), 3)
+
+        # Vencimento retroativo fora da faixa incremental: entra por updated_at
+        associado = Associado.objects.get(idPessAsso__usuarioPess='assoc1')
+        associado.dataPagamentoAsso = date(2024, 12, 10)
+        associado.save()
+        self.assertEqual(gerar_cobrancas(date(2025, 1, 21)), {'aviso': 0, 'vencido': 1})
+
+
+@override_settings(CAMPANHA_WORKERS=0, ANIVERSARIO_TEMPLATE='Parabéns, {nome}!', WHATSAPP_REMETENTE=REMETENTE_FAKE)
+class AniversarioTest(TestCase):
+    """Aniversariantes pelo (mês, dia) do nascimento, com 29/02 em 28/02 nos anos não bissextos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base(quantidade=4)  # associados 1 e 3 têm telefone
+        nascimentos = {'assoc0': date(1990, 3, 15), 'assoc1': date(1985, 3, 15), 'assoc3': date(1992, 2, 29)}
+        for usuario, nascimento in nascimentos.items():
+            Pessoa.objects.filter(usuarioPess=usuario).update(nascimentoPess=nascimento)
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin', nascimentoPess=date(1980, 3, 15))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _nomes(self, data):
+        return [associado['nome'] for associado in aniversarios.aniversariantes(data)]
+
+    def test_29_de_fevereiro(self):
+        self.assertEqual(self._nomes(date(2025, 2, 28)), ['Associado 3'])  # não bissexto
+        self.assertEqual(self._nomes(date(2024, 2, 28)), [])
+        self.assertEqual(self._nomes(date(2024, 2, 29)), ['Associado 3'])
+        self.assertEqual(self._nomes(date(2025, 3, 1)), [])
+
+    def test_api(self):
+        response = self.client.get('/api/aniversariantes/', {'data': '2025-03-15'})
+        self.assertEqual(response.status_code, 200)
+        # O admin não é associado: não aparece
+        self.assertEqual(response.json()['total'], 2)
+        primeiro = response.json()['aniversariantes'][0]
+        self.assertEqual((primeiro['nome'], primeiro['idade']), ('Associado 0', 35))
+
+        response = self.client.get('/api/aniversariantes/', {'data': '15/03/2025'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_job_uma_mensagem_por_ano(self):
+        # Só quem tem telefone recebe: associado 1
+        self.assertEqual(aniversarios.gerar_comemorativas(date(2025, 3, 15)), 1)
+        self.assertEqual(aniversarios.gerar_comemorativas(date(2025, 3, 15)), 0)
+        mensagem = MensagemWhatsApp.objects.get()
+        self.assertEqual((mensagem.tipoMensagem, mensagem.conteudo), ('comemorativa', 'Parabéns, Associado 1!'))
+        self.assertEqual(mensagem.referencia, 'aniversario:2025')
+
+        self.assertEqual(aniversarios.gerar_comemorativas(date(2025, 2, 28)), 1)  # nascido em 29/02
+        self.assertEqual(aniversarios.gerar_comemorativas(date(2026, 3, 15)), 1)
+        self.assertEqual(Campanha.objects.count(), 3)
+
+    @override_settings(CAMPANHA_WORKERS=4)
+    def test_comando_so_enfileira(self):
+        with mock.patch('threading.Thread.start') as start, self.captureOnCommitCallbacks(execute=True):
+            call_command('enviar_aniversarios', '--data=2025-03-15', stdout=io.StringIO())
+        start.assert_not_called()
+        self.assertEqual(MensagemWhatsApp.objects.filter(status='pendente').count(), 1)
+
+
+class AtualizacaoLoteTest(TestCase):
+    """PATCH em lote: FKs conferidas uma vez e um único UPDATE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()  # associados 1, 2, 4 e 5 com o consultor
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.consultor = Funcionario.objects.get(is_gestor=False)
+        cls.novo = Funcionario.objects.create(
+            idPessFunc=Pessoa.objects.create_user('novo', 'x', nomePess='Novo Consultor'),
+            gestor=cls.consultor.gestor,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_reatribui_por_filtro(self):
+        antes = Associado.objects.get(idPessAsso__usuarioPess='assoc1').updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch('/api/associados/lote/', {
+                'filtro': {'consultor': self.consultor.pk}, 'alteracoes': {'consultor': self.novo.pk},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'atualizados': 4})
+        self.assertEqual([q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']], ['SELECT', 'UPDATE'])
+        self.assertEqual(Associado.objects.filter(consultor=self.novo).count(), 4)
+        self.assertGreater(Associado.objects.get(idPessAsso__usuarioPess='assoc1').updated_at, antes)
+
+    def test_por_ids_e_sem_plano(self):
+        ids = list(Associado.objects.filter(idPlanAsso__isnull=False).values_list('pk', flat=True)[:2])
+        response = self.client.patch('/api/associados/lote/', {
+            'ids': ids, 'alteracoes': {'idPlanAsso': None},
+        }, format='json')
+        self.assertEqual(response.json(), {'atualizados': 2})
+        self.assertEqual(Associado.objects.filter(idPlanAsso__isnull=False).count(), 1)
+
+    def test_validacao(self):
+        gestor = self.consultor.gestor
+        casos = [
+            {'alteracoes': {'consultor': self.novo.pk}},  # sem seleção
+            {'ids': [1], 'filtro': {'consultor': 1}, 'alteracoes': {'consultor': self.novo.pk}},
+            {'filtro': {}, 'alteracoes': {'consultor': self.novo.pk}},  # tabela inteira
+            {'ids': [1], 'alteracoes': {}},
+            {'ids': [1], 'alteracoes': {'consultor': gestor.pk}},  # gestor não é consultor
+            {'ids': [1], 'alteracoes': {'idPlanAsso': 999}},
+        ]
+        for dados in casos:
+            with self.subTest(dados=dados):
+                response = self.client.patch('/api/associados/lote/', dados, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Associado.objects.filter(consultor=self.novo).exists())
+
+    def test_funcionarios_e_permissao(self):
+        novo_gestor = Funcionario.objects.create(
+            idPessFunc=Pessoa.objects.create_user('gestor2', 'x', nomePess='Gestor 2'), is_gestor=True,
+        )
+        response = self.client.patch('/api/funcionarios/lote/', {
+            'filtro': {'gestor': self.consultor.gestor_id}, 'alteracoes': {'gestor': novo_gestor.pk},
+        }, format='json')
+        self.assertEqual(response.json(), {'atualizados': 2})
+
+        self.client.force_authenticate(Pessoa.objects.get(usuarioPess='assoc1'))
+        response = self.client.patch('/api/funcionarios/lote/', {
+            'ids': [self.novo.pk], 'alteracoes': {'gestor': None},
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class HierarquiaTest(TestCase):
+    """Árvore de gestores em uma consulta, com contagens e cache invalidado pelas alterações"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()  # gestor -> consultor com os associados 1, 2, 4 e 5 (6 veículos)
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.gestor = Funcionario.objects.get(is_gestor=True)
+        cls.subgestor = Funcionario.objects.create(
+            idPessFunc=Pessoa.objects.create_user('subgestor', 'x', nomePess='Subgestor'),
+            gestor=cls.gestor, is_gestor=True,
+        )
+        cls.consultor2 = Funcionario.objects.create(
+            idPessFunc=Pessoa.objects.create_user('consultor2', 'x', nomePess='Consultor 2'),
+            gestor=cls.subgestor,
+        )
+        Associado.objects.filter(idPessAsso__usuarioPess='assoc3').update(consultor=cls.consultor2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_arvore_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            arvore = hierarquia.calcular(self.gestor.pk)
+
+        self.assertEqual((arvore['total_associados'], arvore['total_veiculos']), (5, 6))
+        self.assertEqual([no['nome'] for no in arvore['subordinados']], ['Consultor', 'Subgestor'])
+        consultor, subgestor = arvore['subordinados']
+        self.assertEqual((consultor['associados'], consultor['veiculos']), (4, 6))
+        self.assertEqual((subgestor['associados'], subgestor['total_associados']), (0, 1))
+        self.assertEqual(subgestor['subordinados'][0]['idFunc'], self.consultor2.pk)
+        self.assertEqual(subgestor['subordinados'][0]['nivel'], 2)
+
+    def test_ciclo_nao_repete_nos(self):
+        Funcionario.objects.filter(pk=self.gestor.pk).update(gestor=self.consultor2)
+        arvore = hierarquia.calcular(self.gestor.pk)
+        self.assertEqual(arvore['total_associados'], 5)
+
+    def test_api_com_cache(self):
+        url = f'/api/gestores/{self.gestor.pk}/hierarquia/'
+        self.assertEqual(self.client.get(url).json()['total_associados'], 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Novo associado sob o consultor 2: o commit invalida a árvore
+        with self.captureOnCommitCallbacks(execute=True):
+            Associado.objects.create(
+                idPessAsso=Pessoa.objects.create_user('novo', 'x', nomePess='Novo'), consultor=self.consultor2,
+            )
+        self.assertEqual(self.client.get(url).json()['total_associados'], 6)
+
+        self.assertEqual(self.client.get('/api/gestores/9999/hierarquia/').status_code, 404)
+
+    def test_permissao_pela_propria_arvore(self):
+        url = '/api/gestores/{}/hierarquia/'.format
+        gestor, subgestor = self.gestor.idPessFunc, self.subgestor.idPessFunc
+        casos = (
+            (gestor, self.gestor.pk, 200),
+            (gestor, self.consultor2.pk, 200),  # abaixo dele, dois níveis
+            (subgestor, self.subgestor.pk, 200),
+            (subgestor, self.gestor.pk, 403),  # acima dele
+            (self.consultor2.idPessFunc, self.subgestor.pk, 403),
+            (subgestor, 9999, 403),
+            (Pessoa.objects.get(usuarioPess='assoc1'), self.gestor.pk, 403),
+        )
+        for usuario, gestor_id, esperado in casos:
+            with self.subTest(usuario=usuario.usuarioPess, gestor_id=gestor_id):
+                self.client.force_authenticate(usuario)
+                self.assertEqual(self.client.get(url(gestor_id)).status_code, esperado)
+
+
+class RelatorioConsultoresTest(TestCase):
+    """Relatório de consultores: período atual por GROUP BY e passado pelas fotos diárias"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()  # consultor com os associados 1, 2, 4 e 5; 1 e 5 pagos até 10/01/2025
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.consultor = Funcionario.objects.get(is_gestor=False)
+        Funcionario.objects.filter(pk=cls.consultor.pk).update(comissaoFunc=10)
+        Associado.objects.filter(idPessAsso__usuarioPess='assoc1').update(dataAtivacaoAsso=date(2025, 1, 3))
+        Associado.objects.filter(idPessAsso__usuarioPess='assoc2').update(dataAtivacaoAsso=date(2024, 12, 20))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_calculo_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            linhas = desempenho.calcular(date(2025, 1, 1), date(2025, 1, 31), hoje=date(2025, 1, 5))
+        self.assertEqual(linhas, [{
+            'idFunc': self.consultor.pk, 'nome': 'Consultor', 'idGestor': self.consultor.gestor_id,
+            'associados': 4, 'em_dia': 2, 'vencidos': 0, 'novos': 1, 'comissao': 20.0,
+        }])
+        vencido = desempenho.calcular(date(2025, 1, 1), date(2025, 1, 31), hoje=date(2025, 1, 15))[0]
+        self.assertEqual((vencido['em_dia'], vencido['vencidos'], vencido['comissao']), (0, 2, 0))
+
+    def test_historico_igual_ao_calculo(self):
+        for dia in (date(2025, 1, 3), date(2025, 1, 5), date(2025, 1, 5)):  # regravar não duplica
+            desempenho.gravar_snapshot(dia)
+        self.assertEqual(DesempenhoConsultor.objects.count(), 2)
+
+        inicio, fim = date(2025, 1, 1), date(2025, 1, 5)
+        self.assertEqual(desempenho.historico(inicio, fim), desempenho.calcular(inicio, fim, hoje=fim))
+
+    def test_api(self):
+        desempenho.gravar_snapshot(date(2025, 1, 5))
+        response = self.client.get('/api/relatorios/consultores/', {'inicio': '2025-01-01', 'fim': '2025-01-05'})
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados['fonte'], 'snapshot')
+        self.assertEqual(dados['consultores'][0]['posicao'], 1)
+        self.assertEqual(dados['totais']['associados'], 4)
+
+        response = self.client.get('/api/relatorios/consultores/', {'gestor': self.consultor.gestor_id})
+        self.assertEqual((response.json()['fonte'], len(response.json()['consultores'])), ('atual', 1))
+        response = self.client.get('/api/relatorios/consultores/', {'gestor': 9999})
+        self.assertEqual(response.json()['consultores'], [])
+
+        self.assertEqual(self.client.get('/api/relatorios/consultores/', {'fim': '2025-01-06'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/relatorios/consultores/', {'fim': '06/01/2025'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/relatorios/consultores/', {
+            'inicio': '2025-02-01', 'fim': '2025-01-05',
+        }).status_code, 400)
+
+
+class UmaPorMinuto(UserRateThrottle):
+    rate = '1/min'
+
+
+class ViewsAssincronasTest(TestCase):
+    """Views assíncronas: mesmas respostas, autenticação e validadores das views DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_health_e_dashboard(self):
+        response = APIClient().get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['database'], 'healthy')
+
+        self.assertEqual(APIClient().get('/api/dashboard/').status_code, 401)
+        dados = self.client.get('/api/dashboard/').json()
+        self.assertEqual((dados['total_associados'], dados['total_consultores']), (6, 1))
+
+    def test_dashboard_sem_redis(self):
+        erro = ConnectionError('Redis fora')
+        with mock.patch.object(cache, 'aget', side_effect=erro), mock.patch.object(cache, 'aset', side_effect=erro), \
+                self.assertLogs('membertruck_app', 'WARNING'):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_associados'], 6)
+
+        # Erro inesperado: detalhe só no log, não na resposta
+        with mock.patch('membertruck_app.contadores.ler', side_effect=RuntimeError('senha=segredo')), \
+                self.assertLogs('membertruck_app', 'ERROR'):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn('segredo', response.content.decode())
+
+    def test_referencias_condicional_e_metodos(self):
+        response = self.client.get('/api/Plano/')
+        self.assertEqual((response.status_code, len(response.json()['results'])), (200, 1))
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/Plano/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/Plano/').json(), response.json())  # do cache
+
+        # Escrita segue para a view DRF e muda o ETag
+        self.assertEqual(self.client.post('/api/Plano/', {'nomePlan': 'Novo'}, format='json').status_code, 201)
+        self.assertNotEqual(self.client.get('/api/Plano/')['ETag'], etag)
+        self.assertEqual(self.client.put('/api/Departamento/').status_code, 405)
+
+    def test_enviar_mensagem(self):
+        com_telefone = Associado.objects.get(idPessAsso__usuarioPess='assoc1')
+        response = self.client.post('/api/mensagens/enviar/', {
+            'associado_id': com_telefone.pk, 'tipo_mensagem': 'outros', 'conteudo': 'Olá',
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        # Fica na fila: só conta como enviada quando o worker entregar
+        self.assertEqual(MensagemWhatsApp.objects.get(pk=response.json()['mensagem_id']).status, 'pendente')
+        with override_settings(WHATSAPP_REMETENTE=REMETENTE_FAKE, WHATSAPP_TAXA=0):
+            self.assertEqual(fila.drenar(), (1, 0))
+        self.assertEqual(self.client.post('/api/mensagens/enviar/', {
+            'associado_id': 9999, 'tipo_mensagem': 'outros', 'conteudo': 'Olá',
+        }, format='json').status_code, 404)
+        self.assertEqual(self.client.get('/api/mensagens/enviar/').status_code, 405)
+
+    def test_throttling(self):
+        with mock.patch.object(DashboardView, 'throttle_classes', [UmaPorMinuto]):
+            self.assertEqual(self.client.get('/api/dashboard/').status_code, 200)
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertIn('detail', response.json())
+
+    def test_negociacao_de_conteudo(self):
+        self.assertEqual(self.client.get('/api/dashboard/', {'format': 'json'}).status_code, 200)
+        response = self.client.get('/api/dashboard/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(self.client.get('/api/dashboard/', {'format': 'xml'}).status_code, 404)
+
+
+class ConexoesTest(TestCase):
+    """Modo de conexão com o banco e métricas do pool"""
+
+    def test_resumo_pool(self):
+        resumo = conexoes.resumo_pool({
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 8, 'pool_available': 2,
+            'requests_num': 500, 'requests_queued': 4, 'requests_wait_ms': 30, 'requests_errors': 1,
+        })
+        self.assertEqual((resumo['em_uso'], resumo['saturacao']), (6, 0.6))
+        self.assertEqual((resumo['espera_media_ms'], resumo['timeouts']), (7.5, 1))
+        self.assertEqual(conexoes.resumo_pool({})['saturacao'], None)
+
+    def test_api(self):
+        admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        config = connection.settings_dict
+        for conn_max_age, modo in ((0, 'por_requisicao'), (60, 'persistente'), (None, 'persistente')):
+            with mock.patch.dict(config, {'CONN_MAX_AGE': conn_max_age}):
+                dados = client.get('/api/banco/stats/').json()['default']
+            self.assertEqual((dados['modo'], dados['pool']), (modo, None))
+
+        client.force_authenticate(None)
+        self.assertEqual(client.get('/api/banco/stats/').status_code, 401)
+
+
+@override_settings(DB_REPLICAS=['replica1'], DB_PRIMARIO_APOS_ESCRITA=5)
+class ReplicasTest(SimpleTestCase):
+    """Roteamento de leituras para a réplica e read-your-writes pelo cookie/header"""
+
+    def requisitar(self, request, status_code=200):
+        """Passa a requisição pelo ReplicaMiddleware e devolve (banco das leituras na view, response)"""
+        bancos = []
+
+        def view(request):
+            bancos.append(Plano.objects.all().db)
+            return HttpResponse(status=status_code)
+
+        response = ReplicaMiddleware(view)(request)
+        return bancos[0], response
+
+    def test_leituras_e_escritas(self):
+        factory = RequestFactory()
+        self.assertEqual(self.requisitar(factory.get('/api/Plano/'))[0], 'replica1')
+        self.assertEqual(Plano.objects.all().db, 'default')  # fora da requisição
+
+        banco, response = self.requisitar(factory.post('/api/Plano/'), 201)
+        self.assertEqual(banco, 'default')
+        ate = response['X-Primario-Ate']
+        self.assertEqual(response.cookies['primario_ate'].value, ate)
+
+        # Falha de validação não escreveu: sem fixar no primário
+        self.assertNotIn('X-Primario-Ate', self.requisitar(factory.post('/api/Plano/'), 400)[1])
+
+    def test_fixado_no_primario(self):
+        factory = RequestFactory()
+        ate = str(int(time.time()) + 5)
+        self.assertEqual(self.requisitar(factory.get('/', HTTP_X_PRIMARIO_ATE=ate))[0], 'default')
+        request = factory.get('/')
+        request.COOKIES['primario_ate'] = ate
+        self.assertEqual(self.requisitar(request)[0], 'default')
+
+        # Vencido, além da janela ou inválido: volta para a réplica
+        for valor in (str(int(time.time()) - 1), str(int(time.time()) + 3600), 'x'):
+            self.assertEqual(self.requisitar(factory.get('/', HTTP_X_PRIMARIO_ATE=valor))[0], 'replica1')
+
+    def test_streaming_na_replica(self):
+        bancos = []
+
+        def conteudo():
+            bancos.append(Plano.objects.all().db)
+            yield b'ok'
+
+        response = ReplicaMiddleware(lambda request: StreamingHttpResponse(conteudo()))(RequestFactory().get('/'))
+        self.assertEqual(Plano.objects.all().db, 'default')
+        self.assertEqual(b''.join(response), b'ok')
+        self.assertEqual(bancos, ['replica1'])
+        self.assertEqual(Plano.objects.all().db, 'default')
+
+    async def test_assincrono(self):
+        bancos = []
+
+        async def conteudo():
+            bancos.append(Plano.objects.all().db)
+            yield b'ok'
+
+        async def view(request):
+            bancos.append(Plano.objects.all().db)
+            return StreamingHttpResponse(conteudo())
+
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(Plano.objects.all().db, 'default')
+        self.assertEqual(b''.join([parte async for parte in response]), b'ok')
+        self.assertEqual(bancos, ['replica1', 'replica1'])
+        self.assertEqual(Plano.objects.all().db, 'default')
+
+    def test_transacao_e_escrita_no_primario(self):
+        token = roteador.usar_replica('replica1')
+        try:
+            self.assertEqual(Plano.objects.all().db, 'replica1')
+            self.assertEqual(RoteadorReplicas().db_for_write(Plano), 'default')
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                self.assertEqual(Plano.objects.all().db, 'default')
+        finally:
+            roteador.restaurar(token)
+
+
+class MetricasTest(TestCase):
+    """PerformanceMiddleware e /metrics: séries por rota (nome da URL), status e SQL"""
+    ROTA = 'membertruck_app:Plano_detail'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+        cls.plano = Plano.objects.create(nomePlan='Plano Teste')
+
+    def amostra(self, nome, **labels):
+        return REGISTRY.get_sample_value(nome, labels) or 0
+
+    def test_series_por_rota(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        antes = self.amostra('membertruck_http_responses_total', method='GET', route=self.ROTA, status='200')
+        consultas = self.amostra('membertruck_db_queries_per_request_sum', route=self.ROTA)
+
+        response = client.get(f'/api/Plano/{self.plano.pk}/')
+        self.assertIn('X-Response-Time', response)
+        client.get('/api/Plano/9999/')
+        client.get('/api/nao-existe/')
+
+        self.assertEqual(self.amostra(
+            'membertruck_http_responses_total', method='GET', route=self.ROTA, status='200'
+        ), antes + 1)
+        self.assertGreaterEqual(self.amostra('membertruck_http_responses_total', method='GET', route=self.ROTA, status='404'), 1)
+        self.assertGreaterEqual(self.amostra('membertruck_http_responses_total', method='GET', route='nao_encontrada', status='404'), 1)
+        self.assertGreater(self.amostra('membertruck_db_queries_per_request_sum', route=self.ROTA), consultas)
+        self.assertGreater(self.amostra('membertruck_http_response_size_bytes_count', route=self.ROTA), 0)
+
+        texto = self.client.get('/metrics').content.decode()
+        self.assertIn('membertruck_http_request_duration_seconds_bucket{le="0.005",method="GET",route="membertruck_app:Plano_detail"}', texto)
+
+    def test_acesso(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+        with override_settings(METRICAS_TOKEN='segredo'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+
+
+    @override_settings(DB_POOL=True)
+    def test_pool_lido_so_na_coleta(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        estatisticas = {'default': {'pool': {'em_uso': 1, 'livres': 3, 'aguardando': 0, 'maximo': 4}}}
+        with mock.patch('membertruck_app.conexoes.estatisticas', return_value=estatisticas) as ler:
+            client.get(f'/api/Plano/{self.plano.pk}/')
+            ler.assert_not_called()
+            self.client.get('/metrics')
+            ler.assert_called_once()
+        self.assertEqual(self.amostra('membertruck_db_pool_connections', database='default', state='idle'), 3)
+
+class ServerTimingTest(TestCase):
+    """Header Server-Timing e ?profile=1 (SQL, duplicadas e cProfile) para staff"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        Pessoa.objects.create_superuser('admin', 'x', nomePess='Admin')
+
+    def token(self, usuario):
+        response = self.client.post('/api/login/', {'usuarioPess': usuario, 'password': 'x'}, content_type='application/json')
+        return f"Bearer {response.json()['access']}"
+
+    def etapas(self, response):
+        return {parte.split(';')[0] for parte in response['Server-Timing'].split(', ')}
+
+    def test_server_timing(self):
+        response = self.client.get('/api/Plano/', HTTP_AUTHORIZATION=self.token('admin'))
+        self.assertEqual(self.etapas(response), {'auth', 'db', 'serialize', 'render', 'total'})
+        response = self.client.get('/api/dashboard/', HTTP_AUTHORIZATION=self.token('admin'))  # view assíncrona
+        self.assertEqual(self.etapas(response), {'auth', 'db', 'serialize', 'render', 'total'})
+
+        with override_settings(SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/api/Plano/', HTTP_AUTHORIZATION=self.token('admin')))
+
+        # Tempos do backend não vão para anônimos nem para quem não é staff
+        self.assertNotIn('Server-Timing', self.client.get('/api/health/'))
+        self.assertNotIn('Server-Timing', self.client.get('/api/Plano/', HTTP_AUTHORIZATION=self.token('consultor')))
+
+    def test_profile(self):
+        admin = self.token('admin')
+        dados = self.client.get('/api/associados/', {'profile': '1'}, HTTP_AUTHORIZATION=admin).json()
+        self.assertEqual(dados['status'], 200)
+        self.assertEqual(dados['sql']['total'], len(dados['sql']['consultas']))
+        self.assertGreater(dados['sql']['total'], 0)
+        self.assertTrue(dados['perfil'])
+
+        # Streaming: o corpo é consumido dentro da medição (as consultas da exportação entram)
+        dados = self.client.get('/api/export/associados/', {'profile': '1'}, HTTP_AUTHORIZATION=admin).json()
+        self.assertEqual(dados['status'], 200)
+        self.assertTrue(any('Associado' in consulta['sql'] for consulta in dados['sql']['consultas']))
+
+        # Escrita roda normalmente, sem relatório
+        response = self.client.post(
+            '/api/Plano/?profile=1', {'nomePlan': 'Perfilado'}, content_type='application/json', HTTP_AUTHORIZATION=admin,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('perfil', response.json())
+
+        # Não staff (ou sem token): resposta normal
+        for autorizacao in (self.token('consultor'), ''):
+            response = self.client.get('/api/Plano/', {'profile': '1'}, HTTP_AUTHORIZATION=autorizacao)
+            self.assertNotIn('perfil', response.json())
+
+    async def test_cadeia_assincrona(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = PerformanceMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_view))
+        self.assertTrue(iscoroutinefunction(middleware.process_template_response))
+        self.assertFalse(iscoroutinefunction(PerformanceMiddleware(lambda request: HttpResponse())))
+
+        # Pelo handler ASGI: Server-Timing e ?profile=1 também na cadeia assíncrona
+        login = await self.async_client.post(
+            '/api/login/', {'usuarioPess': 'admin', 'password': 'x'}, content_type='application/json',
+        )
+        admin = {'Authorization': f"Bearer {login.json()['access']}"}
+        for caminho in ('/api/Plano/', '/api/dashboard/'):
+            response = await self.async_client.get(caminho, headers=admin)
+            self.assertEqual(self.etapas(response), {'auth', 'db', 'serialize', 'render', 'total'})
+        # O ORM roda nas threads do sync_to_async e ainda assim é contado
+        self.assertNotIn('(0 consultas)', (await self.async_client.get('/api/Plano/', headers=admin))['Server-Timing'])
+
+        dados = (await self.async_client.get('/api/associados/', {'profile': '1'}, headers=admin)).json()
+        self.assertEqual(dados['status'], 200)
+        self.assertGreater(dados['sql']['total'], 0)
+        self.assertTrue(dados['perfil'])
+
+    def test_duplicadas(self):
+        consultas = [
+            {'sql': 'SELECT * FROM pessoa WHERE id = %s', 'params': (1,), 'tempo_ms': 1.0},
+            {'sql': 'SELECT * FROM pessoa WHERE id = %s', 'params': (2,), 'tempo_ms': 1.0},
+            {'sql': 'SELECT * FROM pessoa WHERE id = %s', 'params': (1,), 'tempo_ms': 1.0},
+            {'sql': 'SELECT * FROM plano', 'params': (), 'tempo_ms': 5.0},
+        ]
+        self.assertEqual(perfil.duplicadas(consultas), [{
+            'sql': 'SELECT * FROM pessoa WHERE id = %s', 'vezes': 3, 'parametros_distintos': 2, 'tempo_ms': 3.0,
+        }])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN dos índices é específico do PostgreSQL')
+class IndicesExplainTest(TestCase):
+    """
+    As consultas quentes devem usar índice. Com poucas linhas o planner
+    prefere Seq Scan, então ele é desligado: o teste confere se existe
+    um plano por índice, não o custo.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_base()
+        cls.gestor = Funcionario.objects.get(is_gestor=True)
+        cls.consultor = Funcionario.objects.get(is_gestor=False)
+        MensagemWhatsApp.objects.create(
+            associado=Associado.objects.first(), tipoMensagem='cobranca',
+            conteudo='Teste', status='enviada',
+        )
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def _view_queryset(self, view_class, **kwargs):
+        view = view_class()
+        view.request, view.kwargs = None, kwargs
+        return view.get_queryset()
+
+    def assertUsaIndice(self, queryset):
+        plano = queryset.explain()
+        self.assertIn('Index', plano)
+        self.assertNotIn('Seq Scan', plano)
+
+    def test_dashboard_mensagens_enviadas_hoje(self):
+        inicio = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assertUsaIndice(MensagemWhatsApp.objects.filter(
+            status='enviada', dataEnvio__gte=inicio, dataEnvio__lt=inicio + timedelta(days=1)
+        ))
+
+    def test_associados_por_consultor(self):
+        queryset = self._view_queryset(AssociadosPorConsultorView, consultor_id=self.consultor.idFunc)
+        self.assertUsaIndice(queryset.order_by('idAsso')[:50])
+
+    def test_cobranca_por_consultor(self):
+        self.assertUsaIndice(Associado.objects.filter(
+            consultor_id=self.consultor.idFunc, dataPagamentoAsso__lt=timezone.localdate()
+        ))
+
+    def test_consultores_por_gestor(self):
+        queryset = self._view_queryset(ConsultoresPorGestorView, gestor_id=self.gestor.idFunc)
+        self.assertUsaIndice(queryset.order_by('idFunc')[:50])
+
+    def test_gestores(self):
+        self.assertUsaIndice(self._view_queryset(GestoresListView).order_by('idFunc')[:50])
+
+    def test_aniversariantes(self):
+        plano = aniversarios.aniversariantes(date(2025, 2, 28)).explain()
+        self.assertIn('pessoa_aniversario_idx', plano)
+        self.assertNotIn('Seq Scan', plano)
@@ -0,0 +1,72 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import Pessoa
+
+logger = logging.getLogger('membertruck_app')
+
+# Buffer por processo: {idPess: último login}. O last_login é informativo,
+# então perder alguns segundos dele numa queda do worker é aceitável.
+_pendentes = {}
+_lock = threading.Lock()
+_ultima_descarga = time.monotonic()
+
+
+def registrar(user):
+    """
+    Marca o login do usuário sem UPDATE imediato. O buffer é gravado quando
+    junta ULTIMO_LOGIN_LOTE usuários ou passa ULTIMO_LOGIN_INTERVALO segundos
+    desde a última gravação (conferido a cada login, no início de cada
+    requisição e na saída do processo).
+    """
+    agora = timezone.now()
+    user.last_login = agora
+    with _lock:
+        _pendentes[user.pk] = agora
+        cheio = len(_pendentes) >= settings.ULTIMO_LOGIN_LOTE
+        vencido = time.monotonic() - _ultima_descarga >= settings.ULTIMO_LOGIN_INTERVALO
+    if cheio or vencido:
+        descarregar()
+
+
+def descarregar_se_vencido():
+    """
+    Chamado no início de cada requisição (signals.py): grava o buffer que passou do intervalo
+    mesmo sem novos logins. A checagem sem lock basta (no pior caso a
+    gravação fica para a próxima requisição).
+    """
+    if _pendentes and time.monotonic() - _ultima_descarga >= settings.ULTIMO_LOGIN_INTERVALO:
+        descarregar()
+
+
+def descarregar():
+    """Grava o buffer com um único UPDATE (bulk_update) e o esvazia"""
+    global _ultima_descarga
+    with _lock:
+        pendentes = dict(_pendentes)
+        _pendentes.clear()
+        _ultima_descarga = time.monotonic()
+    if not pendentes:
+        return 0
+    try:
+        Pessoa.objects.bulk_update(
+            [Pessoa(pk=pk, last_login=data) for pk, data in pendentes.items()],
+            ['last_login'],
+        )
+    except DatabaseError:
+        logger.exception('Falha ao gravar last_login de %d usuário(s)', len(pendentes))
+        with _lock:
+            # Devolve ao buffer sem sobrescrever logins mais novos
+            for pk, data in pendentes.items():
+                _pendentes.setdefault(pk, data)
+        return 0
+    return len(pendentes)
+
+
+atexit.register(descarregar)
@@ -6,13 +6,18 @@ from rest_framework_simplejwt.views import (
 
 from .views import (
     PessoaCreateView, PessoaListView, PessoaDetailView,
-    FuncionarioListView, FuncionarioDetailView,
-    AssociadoListView, AssociadoDetailView,
+    FuncionarioListView, FuncionarioDetailView, FuncionarioLoteView, HierarquiaView,
+    RelatorioConsultoresView,
+    AssociadoListView, AssociadoDetailView, AssociadoImportacaoView, AssociadoLoteView,
+    AniversariantesView,
     EnderecoListView, EnderecoDetailView,
-    DepartamentoListView, DepartamentoDetailView,
-    CargoListView, CargoDetailView,
-    PlanoListView, PlanoDetailView,
-    VeiculoListView, VeiculoDetailView
+    DepartamentoListAsyncView, DepartamentoDetailView,
+    CargoListAsyncView, CargoDetailView,
+    PlanoListAsyncView, PlanoDetailView,
+    VeiculoListView, VeiculoDetailView,
+    AssociadoExportView, VeiculoExportView, MensagemWhatsAppExportView,
+    BuscaView, VeiculoPorPlacaView, DashboardView, HealthCheckView, CacheStatsView, BancoStatsView,
+    CampanhaListView, CampanhaDetailView, FilaMensagensView, EnviarMensagemWhatsAppView
 )
 
 app_name = 'membertruck_app' # Mantenha o app_name
@@ -22,6 +27,10 @@ urlpatterns = [
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
+    # Dashboard e saúde do sistema
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('health/', HealthCheckView.as_view(), name='health'),
+
     # Rotas para Pessoa (Seu usuário principal)
     path('pessoas/register/', PessoaCreateView.as_view(), name='pessoa_register'), # Para criar novos usuários
     path('pessoas/', PessoaListView.as_view(), name='pessoa_list'),
@@ -30,28 +39,53 @@ urlpatterns = [
     # Rotas para Funcionario
     path('funcionarios/', FuncionarioListView.as_view(), name='funcionario_list'),
     path('funcionarios/<int:idFunc>/', FuncionarioDetailView.as_view(), name='funcionario_detail'),
+    path('funcionarios/lote/', FuncionarioLoteView.as_view(), name='funcionario_lote'),
+    path('gestores/<int:gestor_id>/hierarquia/', HierarquiaView.as_view(), name='gestor_hierarquia'),
+    path('relatorios/consultores/', RelatorioConsultoresView.as_view(), name='relatorio_consultores'),
 
     # Rotas para Associado
     path('associados/', AssociadoListView.as_view(), name='associado_list'),
     path('associados/<int:idAsso>/', AssociadoDetailView.as_view(), name='associado_detail'),
+    path('associados/importar/', AssociadoImportacaoView.as_view(), name='associado_importar'),
+    path('associados/lote/', AssociadoLoteView.as_view(), name='associado_lote'),
+    path('aniversariantes/', AniversariantesView.as_view(), name='aniversariantes'),
     
     # Rotas para Endereco
     path('Endereco/', EnderecoListView.as_view(), name='Endereco_list'),
     path('Endereco/<int:idEnde>/', EnderecoDetailView.as_view(), name='Endereco_detail'),
 
     # Rotas para Departamento
-    path('Departamento/', DepartamentoListView.as_view(), name='Departamento_list'),
+    path('Departamento/', DepartamentoListAsyncView.as_view(), name='Departamento_list'),
     path('Departamento/<int:idDepa>/', DepartamentoDetailView.as_view(), name='Departamento_detail'),
 
     # Rotas para Cargo
-    path('Cargo/', CargoListView.as_view(), name='Cargo_list'),
+    path('Cargo/', CargoListAsyncView.as_view(), name='Cargo_list'),
     path('Cargo/<int:idCarg>/', CargoDetailView.as_view(), name='Cargo_detail'),
 
     # Rotas para Plano
-    path('Plano/', PlanoListView.as_view(), name='Plano_list'),
+    path('Plano/', PlanoListAsyncView.as_view(), name='Plano_list'),
     path('Plano/<int:idPlan>/', PlanoDetailView.as_view(), name='Plano_detail'),
 
+    # Estatísticas do cache (staff)
+    path('cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('banco/stats/', BancoStatsView.as_view(), name='banco_stats'),
+
     # Rotas para Veiculo
     path('Veiculo/', VeiculoListView.as_view(), name='Veiculo_list'),
     path('Veiculo/<int:idVeic>/', VeiculoDetailView.as_view(), name='Veiculo_detail'),
+    path('veiculos/placa/<str:placa>/', VeiculoPorPlacaView.as_view(), name='veiculo_por_placa'),
+
+    # Campanhas de mensagens WhatsApp (envio em segundo plano)
+    path('campanhas/', CampanhaListView.as_view(), name='campanha_list'),
+    path('campanhas/<int:idCampanha>/', CampanhaDetailView.as_view(), name='campanha_detail'),
+    path('mensagens/fila/', FilaMensagensView.as_view(), name='mensagem_fila'),
+    path('mensagens/enviar/', EnviarMensagemWhatsAppView.as_view(), name='enviar_mensagem'),
+
+    # Busca (nome, documento, e-mail, placa)
+    path('busca/', BuscaView.as_view(), name='busca'),
+
+    # Exportação em streaming (?formato=ndjson|csv)
+    path('export/associados/', AssociadoExportView.as_view(), name='associado_export'),
+    path('export/veiculos/', VeiculoExportView.as_view(), name='veiculo_export'),
+    path('export/mensagens/', MensagemWhatsAppExportView.as_view(), name='mensagem_export'),
 ]
\ No newline at end of file
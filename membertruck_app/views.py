@@ -1,72 +1,162 @@
+import asyncio
+import csv
+import json
+import logging
+import re
+import shutil
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.db import transaction
 from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from django.db import connection
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.contrib.postgres.search import TrigramSimilarity
 from django.core.cache import cache
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 import redis
 
 from .models import (
     Pessoa, Endereco, Departamento, Cargo, Plano, 
-    Veiculo, Funcionario, Associado, MensagemWhatsApp
+    Veiculo, Funcionario, Associado, MensagemWhatsApp, Campanha, DesempenhoConsultor
 )
 from .serializers import (
     PessoaSerializer, EnderecoSerializer, DepartamentoSerializer, 
     CargoSerializer, PlanoSerializer, VeiculoSerializer, 
     FuncionarioSerializer, AssociadoSerializer, MensagemWhatsAppSerializer,
     MyTokenObtainPairSerializer, FuncionarioCompletoSerializer, 
-    AssociadoCompletoSerializer
+    AssociadoCompletoSerializer, CampanhaSerializer, AssociadoLoteSerializer,
+    FuncionarioLoteSerializer, parse_sparse_params
 )
+from . import aniversarios, cache_referencias, conexoes, contadores, desempenho, fila, hierarquia, importacao
+from .assincrono import AsyncAPIView
+from .autenticacao import papel_do_usuario
+from .cache_referencias import ReferenceCacheMixin
+from .conditional import ConditionalGetMixin, aplicar_validadores, aversao, caminhos_de_versao, validadores
+from .readers import ValuesReader
+from .placas import normalizar_placa, placa_valida, chave_mercosul
+
+logger = logging.getLogger('membertruck_app')
+
+
+class SparseFieldsetMixin:
+    """Ajusta o queryset ao ?fields=/?exclude= do serializer (joins, prefetch e colunas)"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, exclude = parse_sparse_params(self.request)
+        if fields is None and exclude is None:
+            return queryset
+        return self.get_serializer_class().prune_queryset(queryset, fields, exclude)
+
+
+class ValuesReadMixin:
+    """
+    Leitura rápida opcional (?fast=1, ou API_FAST_READ=True por padrão):
+    lista/detalhe montados com .values() pelo ValuesReader, mesmo JSON
+    do serializer, sem instanciar modelos nem campos do DRF por linha.
+    """
+
+    def use_values_read(self):
+        if self.request.method != 'GET':
+            return False
+        flag = self.request.query_params.get('fast')
+        if flag is None:
+            return settings.API_FAST_READ
+        return flag.lower() in ('1', 'true')
+
+    def get_values_reader(self):
+        return ValuesReader(self.get_serializer(), self.get_queryset().model)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_read():
+            return super().list(request, *args, **kwargs)
+
+        reader = self.get_values_reader()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.rows(page))
+        return Response(reader.rows(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_values_read():
+            return super().retrieve(request, *args, **kwargs)
+
+        reader = self.get_values_reader()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        rows = reader.rows(reader.values(queryset)[:1])
+        if not rows:
+            raise Http404
+        return Response(rows[0])
+
 
 # =================== VIEWS DE AUTENTICAÇÃO ===================
 
-class HealthCheckView(APIView):
-    """Endpoint para verificar saúde do sistema"""
+class HealthCheckView(AsyncAPIView):
+    """
+    Endpoint para verificar saúde do sistema.
+
+    Assíncrona: banco, cache e disco são verificados em paralelo e a
+    espera não prende um worker no modo ASGI.
+    """
     permission_classes = [AllowAny]
 
-    def get(self, request):
+    async def get(self, request):
+        banco, cache_, disco = await asyncio.gather(self._banco(), self._cache(), asyncio.to_thread(self._disco))
         health_status = {
-            'status': 'healthy',
+            'status': 'healthy' if banco == 'healthy' else 'unhealthy',
             'timestamp': timezone.now().isoformat(),
-            'checks': {}
+            'checks': {'database': banco, 'cache': cache_, 'disk': disco},
         }
+        status_code = 200 if health_status['status'] == 'healthy' else 503
+        return self.responder(health_status, status_code)
 
-        # Verificar banco de dados
+    async def _banco(self):
         try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-            health_status['checks']['database'] = 'healthy'
+            await sync_to_async(self._select_1)()
+            return 'healthy'
         except Exception as e:
-            health_status['checks']['database'] = f'unhealthy: {str(e)}'
-            health_status['status'] = 'unhealthy'
+            return f'unhealthy: {str(e)}'
 
-        # Verificar cache (se configurado)
+    def _select_1(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    async def _cache(self):
+        # Cache fora não derruba o health check (a API funciona sem ele)
         try:
-            cache.set('health_check', 'ok', 30)
-            cache.get('health_check')
-            health_status['checks']['cache'] = 'healthy'
+            await cache.aset('health_check', 'ok', 30)
+            await cache.aget('health_check')
+            return 'healthy'
         except Exception as e:
-            health_status['checks']['cache'] = f'unhealthy: {str(e)}'
+            return f'unhealthy: {str(e)}'
 
-        # Verificar espaço em disco
-        import shutil
+    def _disco(self):
         try:
             total, used, free = shutil.disk_usage('/')
             free_percent = (free / total) * 100
             if free_percent < 10:
-                health_status['checks']['disk'] = f'warning: {free_percent:.1f}% free'
-            else:
-                health_status['checks']['disk'] = 'healthy'
+                return f'warning: {free_percent:.1f}% free'
+            return 'healthy'
         except Exception as e:
-            health_status['checks']['disk'] = f'error: {str(e)}'
-        
-        status_code = 200 if health_status['status'] == 'healthy' else 503
-        return Response(health_status, status=status_code)
+            return f'error: {str(e)}'
 
 
 # =================== VIEWS DE AUTENTICAÇÃO ===================
@@ -156,7 +246,7 @@ class PessoaListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class PessoaDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PessoaDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Pessoa.objects.all()
     serializer_class = PessoaSerializer
     permission_classes = [IsAuthenticated]
@@ -165,7 +255,7 @@ class PessoaDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # =================== VIEWS DE FUNCIONÁRIO ===================
 
-class FuncionarioListView(generics.ListCreateAPIView):
+class FuncionarioListView(SparseFieldsetMixin, generics.ListCreateAPIView):
     queryset = Funcionario.objects.select_related(
         'idPessFunc', 'idDepaFunc', 'idCargFunc', 'gestor__idPessFunc'
     ).all()
@@ -173,7 +263,7 @@ class FuncionarioListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class FuncionarioDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FuncionarioDetailView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Funcionario.objects.select_related(
         'idPessFunc', 'idDepaFunc', 'idCargFunc', 'gestor__idPessFunc'
     ).all()
@@ -201,14 +291,50 @@ class FuncionarioCompletoCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class GestoresListView(generics.ListAPIView):
+class AtualizacaoLoteView(APIView):
+    """
+    PATCH com {"ids": [...]} ou {"filtro": {...}} e {"alteracoes": {...}}:
+    um único UPDATE ... WHERE em transação, sem carregar as linhas. Devolve
+    quantas foram atualizadas.
+
+    O UPDATE não passa pelo save(): updated_at é gravado aqui (ETag e
+    cobrança incremental) e o cache da hierarquia é invalidado. Os campos
+    alteráveis não mudam o papel do usuário, então o cache de usuários não
+    precisa ser descartado.
+    """
+    permission_classes = [IsAdminUser]
+    model = None
+    serializer_class = None
+
+    def patch(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        dados = serializer.validated_data
+        selecao = {'pk__in': dados['ids']} if 'ids' in dados else dados['filtro']
+        with transaction.atomic():
+            atualizados = self.model.objects.filter(**selecao).update(
+                **dados['alteracoes'], updated_at=timezone.now()
+            )
+            transaction.on_commit(hierarquia.invalidar)
+        return Response({'atualizados': atualizados}, status=status.HTTP_200_OK)
+
+
+class FuncionarioLoteView(AtualizacaoLoteView):
+    """Ex.: transferir todos os consultores de um gestor para outro"""
+    model = Funcionario
+    serializer_class = FuncionarioLoteSerializer
+
+
+class GestoresListView(SparseFieldsetMixin, generics.ListAPIView):
     """Lista apenas funcionários que são gestores"""
     queryset = Funcionario.objects.filter(is_gestor=True).select_related('idPessFunc')
     serializer_class = FuncionarioSerializer
     permission_classes = [IsAuthenticated]
 
 
-class ConsultoresPorGestorView(generics.ListAPIView):
+class ConsultoresPorGestorView(SparseFieldsetMixin, generics.ListAPIView):
     """Lista consultores de um gestor específico"""
     serializer_class = FuncionarioSerializer
     permission_classes = [IsAuthenticated]
@@ -221,9 +347,96 @@ class ConsultoresPorGestorView(generics.ListAPIView):
         ).select_related('idPessFunc')
 
 
+class HierarquiaView(APIView):
+    """
+    Árvore completa abaixo de um gestor (consultores e gestores subordinados,
+    em qualquer profundidade) com associados e veículos por nó e totais por
+    subárvore. Uma consulta (CTE recursivo), em cache até a hierarquia mudar.
+
+    Staff consulta qualquer gestor; os demais funcionários, só a própria
+    árvore (eles mesmos ou alguém abaixo deles).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, gestor_id):
+        if not request.user.is_staff and not self._na_propria_arvore(request.user, gestor_id):
+            return Response({
+                'error': 'Acesso negado',
+                'message': 'Só é possível consultar a hierarquia abaixo de você'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        arvore = hierarquia.arvore(gestor_id)
+        if arvore is None:
+            return Response({
+                'error': 'Funcionário não encontrado',
+                'message': f'Não existe funcionário com id {gestor_id}'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(arvore, status=status.HTTP_200_OK)
+
+    def _na_propria_arvore(self, user, gestor_id):
+        funcionario_id = papel_do_usuario(user).get('funcionario_id')
+        if funcionario_id is None:
+            return False
+        return funcionario_id == gestor_id or hierarquia.contem(hierarquia.arvore(funcionario_id), gestor_id)
+
+
+class RelatorioConsultoresView(APIView):
+    """
+    Ranking de consultores (?inicio=&fim= AAAA-MM-DD, ?gestor=): novos
+    associados no período, indicados ativos, em dia, vencidos e comissão.
+
+    Períodos que terminam antes de hoje são lidos das fotos diárias
+    (DesempenhoConsultor); o período corrente é calculado na hora. Nos
+    dois casos é uma agregação com GROUP BY.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        hoje = timezone.localdate()
+        try:
+            fim = self._data(request, 'fim') or hoje
+            inicio = self._data(request, 'inicio') or fim.replace(day=1)
+            gestor = request.query_params.get('gestor')
+            gestor = int(gestor) if gestor else None
+        except ValueError:
+            return Response({
+                'error': 'Parâmetros inválidos',
+                'message': 'inicio e fim no formato AAAA-MM-DD; gestor deve ser o id do funcionário'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if inicio > fim or fim > hoje:
+            return Response({
+                'error': 'Período inválido',
+                'message': 'inicio deve ser anterior a fim, e fim não pode passar de hoje'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if fim < hoje:
+            if not DesempenhoConsultor.objects.filter(data=fim).exists():
+                return Response({
+                    'error': 'Sem dados para o período',
+                    'message': f'Não há foto do desempenho em {fim:%d/%m/%Y} (manage.py snapshot_desempenho)'
+                }, status=status.HTTP_404_NOT_FOUND)
+            fonte, linhas = 'snapshot', desempenho.historico(inicio, fim, gestor)
+        else:
+            fonte, linhas = 'atual', desempenho.calcular(inicio, fim, gestor, hoje)
+
+        linhas = desempenho.ranking(linhas)
+        return Response({
+            'inicio': inicio,
+            'fim': fim,
+            'gestor': gestor,
+            'fonte': fonte,
+            'totais': desempenho.totais(linhas),
+            'consultores': linhas,
+        }, status=status.HTTP_200_OK)
+
+    def _data(self, request, nome):
+        valor = request.query_params.get(nome)
+        return date.fromisoformat(valor) if valor else None
+
+
 # =================== VIEWS DE ASSOCIADO ===================
 
-class AssociadoListView(generics.ListCreateAPIView):
+class AssociadoListView(ValuesReadMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
     queryset = Associado.objects.select_related(
         'idPessAsso', 'idPlanAsso', 'consultor__idPessFunc'
     ).prefetch_related('veiculos').all()
@@ -231,7 +444,7 @@ class AssociadoListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class AssociadoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AssociadoDetailView(ConditionalGetMixin, ValuesReadMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Associado.objects.select_related(
         'idPessAsso', 'idPlanAsso', 'consultor__idPessFunc'
     ).prefetch_related('veiculos').all()
@@ -259,7 +472,47 @@ class AssociadoCompletoCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class AssociadosPorConsultorView(generics.ListAPIView):
+class AssociadoImportacaoView(APIView):
+    """
+    Importação em lote de associados (Pessoa + Associado + Veículos).
+
+    Recebe uma lista JSON ou um CSV no campo 'arquivo' (multipart). Todas
+    as linhas são validadas antes de gravar; havendo erros nada é gravado,
+    a menos que ?parcial=1 peça para importar as linhas válidas mesmo assim.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        try:
+            linhas, primeira = importacao.ler_linhas(request)
+        except importacao.ErroImportacao as e:
+            return Response({
+                'error': 'Importação inválida',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        validas, erros = importacao.validar(linhas, primeira)
+        parcial = request.query_params.get('parcial') in ('1', 'true', 'True')
+        criados = {}
+        if validas and (parcial or not erros):
+            criados, erros_gravacao = importacao.importar_associados(validas)
+            erros.update(erros_gravacao)
+
+        return Response({
+            'total': len(linhas),
+            'criados': len(criados),
+            'associados': [{'linha': numero, 'idAsso': pk} for numero, pk in sorted(criados.items())],
+            'erros': [{'linha': numero, 'erros': erros[numero]} for numero in sorted(erros)],
+        }, status=status.HTTP_201_CREATED if criados else status.HTTP_400_BAD_REQUEST)
+
+
+class AssociadoLoteView(AtualizacaoLoteView):
+    """Ex.: reatribuir os associados de um consultor que saiu, ou migrar um plano descontinuado"""
+    model = Associado
+    serializer_class = AssociadoLoteSerializer
+
+
+class AssociadosPorConsultorView(ValuesReadMixin, SparseFieldsetMixin, generics.ListAPIView):
     """Lista associados de um consultor específico"""
     serializer_class = AssociadoSerializer
     permission_classes = [IsAuthenticated]
@@ -271,76 +524,189 @@ class AssociadosPorConsultorView(generics.ListAPIView):
         ).prefetch_related('veiculos')
 
 
+class AniversariantesView(APIView):
+    """
+    Associados que fazem aniversário na data (?data=AAAA-MM-DD, padrão hoje).
+    Em ano não bissexto, os nascidos em 29/02 aparecem em 28/02.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        data = request.query_params.get('data')
+        try:
+            data = date.fromisoformat(data) if data else timezone.localdate()
+        except ValueError:
+            return Response({
+                'error': 'Data inválida',
+                'message': 'Informe a data no formato AAAA-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado = list(aniversarios.aniversariantes(data))
+        for associado in resultado:
+            associado['idade'] = data.year - associado['nascimento'].year
+        return Response({
+            'data': data,
+            'total': len(resultado),
+            'aniversariantes': resultado,
+        }, status=status.HTTP_200_OK)
+
+
 # =================== VIEWS AUXILIARES (ComboBox) ===================
 
-class EnderecoListView(generics.ListCreateAPIView):
+class EnderecoListView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Endereco.objects.all()
     serializer_class = EnderecoSerializer
     permission_classes = [IsAuthenticated]
 
 
-class EnderecoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class EnderecoDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Endereco.objects.all()
     serializer_class = EnderecoSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idEnde'
 
 
-class DepartamentoListView(generics.ListCreateAPIView):
+class DepartamentoListView(ConditionalGetMixin, ReferenceCacheMixin, generics.ListCreateAPIView):
     queryset = Departamento.objects.all()
     serializer_class = DepartamentoSerializer
     permission_classes = [IsAuthenticated]
 
 
-class DepartamentoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DepartamentoDetailView(ConditionalGetMixin, ReferenceCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Departamento.objects.all()
     serializer_class = DepartamentoSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idDepa'
 
 
-class CargoListView(generics.ListCreateAPIView):
+class CargoListView(ConditionalGetMixin, ReferenceCacheMixin, generics.ListCreateAPIView):
     queryset = Cargo.objects.all()
     serializer_class = CargoSerializer
     permission_classes = [IsAuthenticated]
 
 
-class CargoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CargoDetailView(ConditionalGetMixin, ReferenceCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Cargo.objects.all()
     serializer_class = CargoSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idCarg'
 
 
-class PlanoListView(generics.ListCreateAPIView):
+class PlanoListView(ConditionalGetMixin, ReferenceCacheMixin, generics.ListCreateAPIView):
     queryset = Plano.objects.all()
     serializer_class = PlanoSerializer
     permission_classes = [IsAuthenticated]
 
 
-class PlanoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PlanoDetailView(ConditionalGetMixin, ReferenceCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Plano.objects.all()
     serializer_class = PlanoSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idPlan'
 
 
+class ReferenciaListAsyncView(AsyncAPIView):
+    """
+    GET assíncrono das listas de referência: versão (ETag, 304) pelo
+    aggregate assíncrono e corpo pelo cache assíncrono, sem usar thread
+    quando o cache acerta. Sem o cache, e no POST, repassa para a view DRF
+    (sync_view), que calcula a resposta e grava o cache.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, *args, **kwargs):
+        model = self.sync_view.queryset.model
+        url = request.build_absolute_uri()
+        total, modificado = await aversao(
+            model.objects.all(), caminhos_de_versao(self.sync_view.serializer_class(), model)
+        )
+        etag, _ = validadores(url, self.renderer.format, total, modificado, with_last_modified=False)
+
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            dados = await cache_referencias.aobter(model, url)
+            if dados is None:
+                return await sync_to_async(self.sync_view.as_view())(request._request, *args, **kwargs)
+            response = self.responder(dados)
+        return aplicar_validadores(response, etag, None)
+
+
+class DepartamentoListAsyncView(ReferenciaListAsyncView):
+    sync_view = DepartamentoListView
+
+
+class CargoListAsyncView(ReferenciaListAsyncView):
+    sync_view = CargoListView
+
+
+class PlanoListAsyncView(ReferenciaListAsyncView):
+    sync_view = PlanoListView
+
+
+class CacheStatsView(APIView):
+    """Taxa de acerto do cache: por tabela neste processo e global no servidor Redis"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        data = {'processo': cache_referencias.estatisticas(), 'redis': None}
+        try:
+            info = cache._cache.get_client().info('stats')
+            hits, misses = info.get('keyspace_hits', 0), info.get('keyspace_misses', 0)
+            data['redis'] = {
+                'keyspace_hits': hits,
+                'keyspace_misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+        except Exception as e:
+            data['redis'] = f'indisponível: {str(e)}'
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class BancoStatsView(APIView):
+    """Conexões com o banco neste processo: modo (por requisição, persistente ou pool), saturação e espera do pool"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(conexoes.estatisticas(), status=status.HTTP_200_OK)
+
+
 # =================== VIEWS DE VEÍCULO ===================
 
-class VeiculoListView(generics.ListCreateAPIView):
+class VeiculoListView(ValuesReadMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
     queryset = Veiculo.objects.select_related('associado__idPessAsso').all()
     serializer_class = VeiculoSerializer
     permission_classes = [IsAuthenticated]
 
 
-class VeiculoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class VeiculoDetailView(ConditionalGetMixin, ValuesReadMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Veiculo.objects.select_related('associado__idPessAsso').all()
     serializer_class = VeiculoSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idVeic'
 
 
-class VeiculosPorAssociadoView(generics.ListAPIView):
+class VeiculoPorPlacaView(generics.RetrieveAPIView):
+    """
+    Busca exata por placa em qualquer grafia (ABC-1234, abc1234, ABC1C34).
+
+    Resolve pela chave Mercosul única: uma consulta com índice (e os JOINs
+    do serializer), sem tentar variações da placa.
+    """
+    queryset = Veiculo.objects.select_related('associado__idPessAsso')
+    serializer_class = VeiculoSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        placa = normalizar_placa(self.kwargs['placa'])
+        if not placa_valida(placa):
+            raise serializers.ValidationError({'error': 'Formato de placa inválido'})
+        try:
+            return self.get_queryset().get(placaMercosulVeic=chave_mercosul(placa))
+        except Veiculo.DoesNotExist:
+            raise Http404
+
+
+class VeiculosPorAssociadoView(ValuesReadMixin, SparseFieldsetMixin, generics.ListAPIView):
     """Lista veículos de um associado específico"""
     serializer_class = VeiculoSerializer
     permission_classes = [IsAuthenticated]
@@ -350,105 +716,337 @@ class VeiculosPorAssociadoView(generics.ListAPIView):
         return Veiculo.objects.filter(associado_id=associado_id)
 
 
+# =================== VIEWS DE BUSCA ===================
+
+class BuscaView(APIView):
+    """
+    Busca por nome parcial, CPF/documento, e-mail ou placa (?q=, ?limit=).
+
+    Os filtros icontains são atendidos pelos índices GIN trigram sobre
+    UPPER(coluna) (migração 0004), e o resultado é ordenado pela
+    similaridade do pg_trgm, sem varrer as tabelas.
+    """
+    permission_classes = [IsAuthenticated]
+    min_length = 3  # trigramas: termos menores não usam o índice
+    default_limit = 20
+    max_limit = 50
+
+    def get(self, request):
+        termo = (request.query_params.get('q') or '').strip()
+        if len(termo) < self.min_length:
+            return Response({
+                'error': 'Termo de busca muito curto',
+                'message': f'Informe ao menos {self.min_length} caracteres em q'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        return Response({
+            'q': termo,
+            'pessoas': self._buscar_pessoas(termo, limit),
+            'veiculos': self._buscar_veiculos(termo, limit),
+        }, status=status.HTTP_200_OK)
+
+    def _buscar_pessoas(self, termo, limit):
+        filtro = Q(nomePess__icontains=termo) | Q(documentoPess__icontains=termo) | Q(emailPess__icontains=termo)
+
+        # CPF digitado com ou sem pontuação
+        digitos = re.sub(r'\D', '', termo)
+        if len(digitos) >= self.min_length and digitos != termo:
+            filtro |= Q(documentoPess__icontains=digitos)
+
+        pessoas = Pessoa.objects.filter(filtro).annotate(
+            rank=Greatest(
+                TrigramSimilarity('nomePess', termo),
+                TrigramSimilarity('documentoPess', termo),
+                TrigramSimilarity('emailPess', termo),
+            )
+        ).order_by('-rank', 'idPess').values(
+            'idPess', 'nomePess', 'documentoPess', 'emailPess', 'telefonePess', 'rank',
+            associado_id=F('associado__idAsso'),
+            funcionario_id=F('funcionario__idFunc'),
+        )[:limit]
+        return [self._arredondar(pessoa) for pessoa in pessoas]
+
+    def _buscar_veiculos(self, termo, limit):
+        placa = re.sub(r'[^A-Za-z0-9]', '', termo).upper()
+        if len(placa) < self.min_length:
+            return []
+
+        veiculos = Veiculo.objects.filter(placaVeic__icontains=placa).annotate(
+            rank=TrigramSimilarity('placaVeic', placa)
+        ).order_by('-rank', 'idVeic').values(
+            'idVeic', 'placaVeic', 'nomeVeic', 'anoVeic', 'associado', 'rank',
+            associado_nome=F('associado__idPessAsso__nomePess'),
+        )[:limit]
+        return [self._arredondar(veiculo) for veiculo in veiculos]
+
+    def _arredondar(self, row):
+        row['rank'] = round(row['rank'] or 0, 3)
+        return row
+
+
 # =================== VIEWS DE MENSAGEM WHATSAPP ===================
 
-class MensagemWhatsAppListView(generics.ListCreateAPIView):
+class MensagemWhatsAppListView(SparseFieldsetMixin, generics.ListCreateAPIView):
     queryset = MensagemWhatsApp.objects.select_related('associado__idPessAsso').all()
     serializer_class = MensagemWhatsAppSerializer
     permission_classes = [IsAuthenticated]
 
 
-class MensagemWhatsAppDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MensagemWhatsAppDetailView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = MensagemWhatsApp.objects.select_related('associado__idPessAsso').all()
     serializer_class = MensagemWhatsAppSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'idMensagem'
 
 
-class EnviarMensagemWhatsAppView(APIView):
-    """View para enviar mensagens via WhatsApp"""
+class EnviarMensagemWhatsAppView(AsyncAPIView):
+    """
+    Enfileira uma mensagem de WhatsApp e volta 202 (assíncrona: ORM
+    assíncrono); a entrega é do worker processar_mensagens
+    """
     permission_classes = [IsAuthenticated]
-    
-    def post(self, request):
+
+    async def post(self, request):
         try:
             associado_id = request.data.get('associado_id')
             tipo_mensagem = request.data.get('tipo_mensagem')
             conteudo = request.data.get('conteudo')
-            
+
             if not all([associado_id, tipo_mensagem, conteudo]):
-                return Response({
+                return self.responder({
                     'error': 'Dados obrigatórios: associado_id, tipo_mensagem, conteudo'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
+                }, status.HTTP_400_BAD_REQUEST)
+
             # Buscar associado
             try:
-                associado = Associado.objects.select_related('idPessAsso').get(
+                associado = await Associado.objects.select_related('idPessAsso').aget(
                     idAsso=associado_id
                 )
             except Associado.DoesNotExist:
-                return Response({
+                return self.responder({
                     'error': 'Associado não encontrado'
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-            # Criar registro da mensagem
-            mensagem = MensagemWhatsApp.objects.create(
+                }, status.HTTP_404_NOT_FOUND)
+
+            # Com telefone, entra na fila como 'pendente' e o processar_mensagens entrega
+            # (limite de taxa e retentativas); sem telefone, já nasce em 'erro'
+            telefone = associado.idPessAsso.telefonePess
+            mensagem = await MensagemWhatsApp.objects.acreate(
                 associado=associado,
                 tipoMensagem=tipo_mensagem,
                 conteudo=conteudo,
-                status='pendente'
+                status='pendente' if telefone else 'erro'
             )
-            
-            # Aqui você implementaria o envio via PyWhatsKit
-            # Por enquanto, simular sucesso
-            telefone = associado.idPessAsso.telefonePess
+
             if telefone:
-                # TODO: Implementar PyWhatsKit aqui
-                # pywhatkit.sendwhatmsg(f"+55{telefone}", conteudo, hora, minuto)
-                mensagem.status = 'enviada'
-                mensagem.save()
-                
-                return Response({
-                    'message': 'Mensagem enviada com sucesso',
+                return self.responder({
+                    'message': 'Mensagem na fila de envio',
                     'mensagem_id': mensagem.idMensagem
-                }, status=status.HTTP_200_OK)
-            else:
-                mensagem.status = 'erro'
-                mensagem.save()
-                return Response({
-                    'error': 'Associado não possui telefone cadastrado'
-                }, status=status.HTTP_400_BAD_REQUEST)
-                
+                }, status.HTTP_202_ACCEPTED)
+            return self.responder({
+                'error': 'Associado não possui telefone cadastrado'
+            }, status.HTTP_400_BAD_REQUEST)
+
         except Exception as e:
-            return Response({
+            return self.responder({
                 'error': 'Erro ao enviar mensagem',
                 'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-# =================== VIEWS DE DASHBOARD/RELATÓRIOS ===================
+# =================== VIEWS DE CAMPANHAS ===================
+
+def _campanhas_com_progresso():
+    return Campanha.objects.annotate(
+        pendentes=Count('mensagens', filter=Q(mensagens__status='pendente')),
+        enviadas=Count('mensagens', filter=Q(mensagens__status='enviada')),
+        erros=Count('mensagens', filter=Q(mensagens__status='erro')),
+    )
+
 
-class DashboardView(APIView):
-    """View para dados do dashboard"""
+class CampanhaListView(generics.ListCreateAPIView):
+    """
+    Lista campanhas com o progresso do envio e cria novas. A criação gera
+    todas as mensagens 'pendente' de uma vez e volta 202: o envio segue em
+    segundo plano, no ritmo de WHATSAPP_TAXA mensagens por segundo.
+    """
+    serializer_class = CampanhaSerializer
     permission_classes = [IsAuthenticated]
-    
+    ordering = '-idCampanha'
+
+    def get_queryset(self):
+        return _campanhas_com_progresso()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        campanha = serializer.save()
+        return Response({
+            'idCampanha': campanha.idCampanha,
+            'total': campanha.total,
+            'message': f'{campanha.total} mensagens na fila de envio'
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class FilaMensagensView(APIView):
+    """Métricas da fila de envio: profundidade, pendente mais antiga e mensagens/segundo"""
+    permission_classes = [IsAdminUser]
+
     def get(self, request):
-        try:
-            data = {
-                'total_associados': Associado.objects.count(),
-                'total_funcionarios': Funcionario.objects.count(),
-                'total_gestores': Funcionario.objects.filter(is_gestor=True).count(),
-                'total_consultores': Funcionario.objects.filter(is_gestor=False).count(),
-                'total_veiculos': Veiculo.objects.count(),
-                'mensagens_enviadas_hoje': MensagemWhatsApp.objects.filter(
-                    dataEnvio__date=timezone.now().date(),
-                    status='enviada'
-                ).count()
-            }
-            return Response(data, status=status.HTTP_200_OK)
-        except Exception as e:
+        return Response(fila.metricas(), status=status.HTTP_200_OK)
+
+
+class CampanhaDetailView(generics.RetrieveAPIView):
+    """Campanha com contagem de pendentes, enviadas e erros"""
+    serializer_class = CampanhaSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'idCampanha'
+
+    def get_queryset(self):
+        return _campanhas_com_progresso()
+
+
+# =================== VIEWS DE EXPORTAÇÃO (STREAMING) ===================
+
+class _Echo:
+    """Buffer para o csv.writer: devolve a linha formatada em vez de guardá-la"""
+    def write(self, value):
+        return value
+
+
+class ExportacaoStreamingView(APIView):
+    """
+    Exporta a tabela inteira em NDJSON (padrão) ou CSV, linha a linha.
+
+    Lê o banco com .iterator(chunk_size=...) e envia cada linha assim que é
+    serializada, então a memória fica constante com 1 mil ou 1 milhão de
+    linhas. Aceita ?formato=ndjson|csv e ?fields=/?exclude=.
+    """
+    permission_classes = [IsAuthenticated]
+    queryset = None
+    serializer_class = None
+    nome_arquivo = 'exportacao'
+    chunk_size = 2000
+
+    def get(self, request):
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'csv'):
             return Response({
-                'error': 'Erro ao buscar dados do dashboard',
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'Formato inválido',
+                'message': 'Use formato=ndjson ou formato=csv'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fields, exclude = parse_sparse_params(request)
+        serializer = self.serializer_class(fields=fields, exclude=exclude)
+        if formato == 'csv':
+            # Listas aninhadas (ex.: veiculos) não cabem em uma linha de CSV
+            for name, field in list(serializer.fields.items()):
+                if isinstance(field, serializers.ListSerializer):
+                    serializer.fields.pop(name)
+
+        queryset = self.serializer_class.prune_queryset(
+            self.queryset.all(), fields=set(serializer.fields)
+        )
+        queryset = queryset.order_by(queryset.model._meta.pk.name)
+        rows = (
+            serializer.to_representation(obj)
+            for obj in queryset.iterator(chunk_size=self.chunk_size)
+        )
+
+        if formato == 'csv':
+            content = self._csv(rows, list(serializer.fields))
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content = (json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n' for row in rows)
+            content_type = 'application/x-ndjson; charset=utf-8'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.nome_arquivo}.{formato}"'
+        response['X-Accel-Buffering'] = 'no'  # Nginx: repassa os bytes sem bufferizar
+        return response
+
+    def _csv(self, rows, columns):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([row.get(column) for column in columns])
+
+
+class AssociadoExportView(ExportacaoStreamingView):
+    queryset = Associado.objects.all()
+    serializer_class = AssociadoSerializer
+    nome_arquivo = 'associados'
+
+
+class VeiculoExportView(ExportacaoStreamingView):
+    queryset = Veiculo.objects.all()
+    serializer_class = VeiculoSerializer
+    nome_arquivo = 'veiculos'
+
+
+class MensagemWhatsAppExportView(ExportacaoStreamingView):
+    queryset = MensagemWhatsApp.objects.all()
+    serializer_class = MensagemWhatsAppSerializer
+    nome_arquivo = 'mensagens'
 
 
+# =================== VIEWS DE DASHBOARD/RELATÓRIOS ===================
+
+class DashboardView(AsyncAPIView):
+    """
+    View para dados do dashboard.
+
+    Os totais vêm da tabela Contador (mantida pelos signals, uma consulta
+    pela PK) e as mensagens do dia de um filtro por intervalo em dataEnvio,
+    que usa índice. O resultado fica em cache por DASHBOARD_CACHE_TTL segundos.
+    Assíncrona: cache e ORM assíncronos, sem prender worker no modo ASGI.
+    """
+    permission_classes = [IsAuthenticated]
+    cache_key = 'dashboard:totais'
+
+    async def get(self, request):
+        # Com o Redis fora o dashboard continua: calcula direto do banco, sem cache
+        try:
+            data = await cache.aget(self.cache_key)
+        except Exception as e:
+            logger.warning(f"Cache indisponível para o dashboard: {e}")
+            data, usar_cache = None, False
+        else:
+            usar_cache = True
+
+        if data is None:
+            try:
+                data = await self._calcular()
+            except Exception:
+                logger.exception('Erro ao calcular os dados do dashboard')
+                return self.responder({
+                    'error': 'Erro ao buscar dados do dashboard',
+                    'message': 'Tente novamente em instantes'
+                }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+            if usar_cache:
+                try:
+                    await cache.aset(self.cache_key, data, settings.DASHBOARD_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"Falha ao gravar o cache do dashboard: {e}")
+        return self.responder(data, status.HTTP_200_OK)
+
+    async def _calcular(self):
+        totais = await sync_to_async(contadores.ler)()
+        inicio = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        return {
+            'total_associados': totais['associados'],
+            'total_funcionarios': totais['funcionarios'],
+            'total_gestores': totais['gestores'],
+            'total_consultores': totais['consultores'],
+            'total_veiculos': totais['veiculos'],
+            'mensagens_enviadas_hoje': await MensagemWhatsApp.objects.filter(
+                status='enviada',
+                dataEnvio__gte=inicio,
+                dataEnvio__lt=inicio + timedelta(days=1),
+            ).acount()
+        }
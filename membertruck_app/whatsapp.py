@@ -0,0 +1,179 @@
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from http.client import HTTPException
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('membertruck_app')
+
+
+class ErroEnvio(Exception):
+    """
+    Falha ao entregar uma mensagem. Temporárias (provedor fora, limite
+    estourado) são retentadas com backoff; permanentes (sem telefone,
+    número inválido) vão direto para 'erro'.
+    """
+
+    def __init__(self, mensagem, permanente=False):
+        super().__init__(mensagem)
+        self.permanente = permanente
+
+
+class Remetente:
+    """
+    Interface de envio. A implementação usada vem de WHATSAPP_REMETENTE
+    (caminho pontuado); basta implementar enviar() e levantar ErroEnvio
+    quando a mensagem não puder ser entregue.
+    """
+
+    def enviar(self, telefone, conteudo):
+        raise NotImplementedError
+
+
+class RemetenteCloudAPI(Remetente):
+    """
+    Envio pela WhatsApp Cloud API (Meta): POST de uma mensagem de texto em
+    {WHATSAPP_API_URL}/{WHATSAPP_NUMERO_ID}/messages com WHATSAPP_TOKEN.
+
+    429, 5xx, falha de rede e token recusado (401/403) são temporários;
+    os demais 4xx (número inválido, etc.) são permanentes.
+    """
+
+    def __init__(self):
+        if not settings.WHATSAPP_NUMERO_ID or not settings.WHATSAPP_TOKEN:
+            raise ImproperlyConfigured(
+                'Defina WHATSAPP_NUMERO_ID e WHATSAPP_TOKEN '
+                '(ou WHATSAPP_REMETENTE=membertruck_app.whatsapp.RemetenteFake fora de produção)'
+            )
+        self.url = f"{settings.WHATSAPP_API_URL.rstrip('/')}/{settings.WHATSAPP_NUMERO_ID}/messages"
+
+    def destino(self, telefone):
+        """Só dígitos, com o DDI (WHATSAPP_DDI) quando o número vem só com DDD"""
+        digitos = re.sub(r'\D', '', telefone or '')
+        if len(digitos) in (10, 11):
+            digitos = settings.WHATSAPP_DDI + digitos
+        return digitos
+
+    def enviar(self, telefone, conteudo):
+        destino = self.destino(telefone)
+        if not destino:
+            raise ErroEnvio('Associado não possui telefone cadastrado', permanente=True)
+        corpo = json.dumps({
+            'messaging_product': 'whatsapp',
+            'to': destino,
+            'type': 'text',
+            'text': {'body': conteudo},
+        }).encode()
+        request = Request(self.url, data=corpo, method='POST', headers={
+            'Authorization': f'Bearer {settings.WHATSAPP_TOKEN}',
+            'Content-Type': 'application/json',
+        })
+        try:
+            with urlopen(request, timeout=settings.WHATSAPP_TIMEOUT):
+                pass
+        except HTTPError as e:
+            detalhe = e.read().decode(errors='replace')[:200]
+            permanente = 400 <= e.code < 500 and e.code not in (401, 403, 408, 429)
+            raise ErroEnvio(f'Provedor respondeu {e.code}: {detalhe}', permanente=permanente)
+        except (HTTPException, OSError) as e:
+            # URLError, timeout, conexão derrubada (RemoteDisconnected, ConnectionResetError, IncompleteRead)
+            raise ErroEnvio(f'Provedor indisponível: {e!r}')
+
+
+class RemetenteFake(Remetente):
+    """
+    Não envia nada: guarda as últimas LIMITE mensagens na memória do
+    processo (testes e desenvolvimento, via WHATSAPP_REMETENTE)
+    """
+
+    LIMITE = 1000
+    enviadas = deque(maxlen=LIMITE)
+    _lock = threading.Lock()
+
+    def enviar(self, telefone, conteudo):
+        if not telefone:
+            raise ErroEnvio('Associado não possui telefone cadastrado', permanente=True)
+        with self._lock:
+            self.enviadas.append((telefone, conteudo))
+
+    @classmethod
+    def limpar(cls):
+        with cls._lock:
+            cls.enviadas.clear()
+
+
+def obter_remetente():
+    return import_string(settings.WHATSAPP_REMETENTE)()
+
+
+class _LimiteLocal:
+    """Limite só deste processo: cada chamada reserva o próximo horário livre e dorme até ele"""
+
+    def __init__(self):
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self, taxa):
+        with self._lock:
+            agora = time.monotonic()
+            self._proximo = max(self._proximo, agora)
+            espera = self._proximo - agora
+            self._proximo += 1 / taxa
+        if espera > 0:
+            time.sleep(espera)
+
+
+class LimiteTaxa:
+    """
+    Limite de envios por segundo (WHATSAPP_TAXA, 0 = sem limite) para a
+    aplicação inteira: todos os processos e threads (workers do gunicorn,
+    processar_mensagens, crons) dividem um contador no Redis.
+
+    O tempo é cortado em janelas de 1 s (ou 1/taxa, se a taxa for menor que
+    1). Cada envio faz INCR no contador da janela e recebe a sua posição n:
+    espera até início + (n - 1) / taxa, o que espalha os envios pela janela;
+    passou da capacidade, tenta a próxima. Usa o relógio do sistema, então
+    as máquinas precisam estar sincronizadas (NTP).
+
+    Com o Redis fora, cai no limite local (por processo), com aviso no log.
+    """
+
+    def __init__(self):
+        self._local = _LimiteLocal()
+
+    def aguardar(self):
+        taxa = settings.WHATSAPP_TAXA
+        if taxa <= 0:
+            return
+        periodo = max(1.0, 1 / taxa)
+        capacidade = taxa * periodo
+        while True:
+            agora = time.time()
+            inicio = agora // periodo * periodo
+            chave = f'whatsapp:taxa:{int(inicio * 1000)}'
+            try:
+                cache.add(chave, 0, math.ceil(periodo) + 5)
+                posicao = cache.incr(chave)
+            except Exception as e:
+                logger.warning(f"Redis indisponível para o limite de envio, usando o limite do processo: {e}")
+                self._local.aguardar(taxa)
+                return
+            if posicao <= capacidade:
+                espera = inicio + (posicao - 1) / taxa - agora
+                if espera > 0:
+                    time.sleep(espera)
+                return
+            time.sleep(max(0.0, inicio + periodo - agora))
+
+
+limite = LimiteTaxa()